@@ -0,0 +1,89 @@
+"""
+app/compression.py — zstd Codec for Cold Consultation Columns
+Medical Scribe Enterprise v3.0
+Transcript, dialog, SOAP and documents are stored as zstd frames compressed
+with a dictionary trained on our own transcripts (clinical Portuguese
+repeats the same phrases across consultations, which is exactly what a
+shared dictionary captures). Every frame records its dictionary ID, so
+dictionaries can be retrained without rewriting old rows.
+
+Dictionaries live in the compression_dictionaries table; the registry here
+only holds the ones loaded so far (see app/services/cold_storage.py).
+"""
+
+import json
+import os
+
+import zstandard
+
+LEVEL = int(os.getenv("COLD_ZSTD_LEVEL", "3"))
+
+# Cold column → payload kind ("text" is stored as UTF-8, "json" as compact JSON)
+COLD_COLUMNS = {
+    "texto_transcrito": "text",
+    "dialog_json": "json",
+    "soap_json": "json",
+    "documents_json": "json",
+}
+
+
+class ColdCodec:
+    """Compresses with the newest loaded dictionary, decompresses with any loaded one."""
+
+    def __init__(self, level: int = LEVEL):
+        self.level = level
+        self._dicts: dict[int, zstandard.ZstdCompressionDict] = {}
+        self._decompressors: dict[int | None, zstandard.ZstdDecompressor] = {None: zstandard.ZstdDecompressor()}
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self.active_dict_id: int | None = None
+
+    def register(self, dict_id: int, data: bytes, activate: bool = False) -> None:
+        zdict = zstandard.ZstdCompressionDict(data)
+        self._dicts[dict_id] = zdict
+        self._decompressors[dict_id] = zstandard.ZstdDecompressor(dict_data=zdict)
+        if activate:
+            self.active_dict_id = dict_id
+            self._compressor = zstandard.ZstdCompressor(level=self.level, dict_data=zdict)
+
+    def knows(self, dict_id: int | None) -> bool:
+        return dict_id in self._decompressors
+
+    # ── Encode ──
+
+    @staticmethod
+    def serialize(column: str, value) -> bytes | None:
+        if value is None:
+            return None
+        if COLD_COLUMNS[column] == "text":
+            return value.encode()
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def compress_row(self, payloads: dict) -> dict:
+        """Cold column values → ConsultationColdData column dict (blobs + dict_id)."""
+        row = {"dict_id": self.active_dict_id}
+        for column in COLD_COLUMNS:
+            raw = self.serialize(column, payloads.get(column))
+            row[column] = self._compressor.compress(raw) if raw is not None else None
+        return row
+
+    # ── Decode ──
+
+    def decompress(self, dict_id: int | None, blob: bytes | None) -> bytes | None:
+        if blob is None:
+            return None
+        try:
+            decompressor = self._decompressors[dict_id]
+        except KeyError:
+            raise LookupError(f"zstd dictionary {dict_id} not loaded") from None
+        return decompressor.decompress(blob)
+
+    def decode(self, column: str, dict_id: int | None, blob: bytes | None):
+        raw = self.decompress(dict_id, blob)
+        if raw is None:
+            return None
+        if COLD_COLUMNS[column] == "text":
+            return raw.decode()
+        return json.loads(raw)
+
+
+cold_codec = ColdCodec()
@@ -10,12 +10,21 @@ import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.database import init_db
+from app.database import init_db, pool_stats, warm_pool
 from app.routers.analyze import router as analyze_router
 from app.routers.consultations import router as consultations_router
 from app.routers.bi import router as bi_router
 from app.routers.transcription import router as transcription_router
 from app.routers.llm_settings import router as llm_settings_router
+from app.routers.cid import router as cid_router
+from app.routers.export import router as export_router
+from app.services.archive_service import consultation_archive
+from app.services.bi_live_service import bi_live_hub
+from app.services.cold_storage import ColdStorage
+from app.services.partition_service import partition_maintenance
+from app.services.write_behind import write_behind
+from services.analysis_executor import analysis_executor
+from services.result_cache import analysis_cache
 
 
 # ── Logging ──
@@ -28,9 +37,23 @@ logger = logging.getLogger("medical-scribe")
 async def lifespan(app: FastAPI):
     logger.info("🚀 Medical Scribe Enterprise starting...")
     await init_db()
-    logger.info("✅ Database tables created/verified")
+    logger.info("✅ Database migrations applied")
+    await consultation_archive.start()
+    await partition_maintenance.start()
+    dict_id = await ColdStorage.load_dictionaries()
+    logger.info(f"✅ Cold column compression: {f'zstd dictionary {dict_id}' if dict_id else 'zstd, no dictionary yet'}")
+    warmed = await warm_pool()
+    if warmed:
+        logger.info(f"✅ Database pool warmed ({warmed} connections)")
+    await analysis_executor.start()
+    await bi_live_hub.start()
+    await write_behind.start()
     yield
     logger.info("🛑 Medical Scribe Enterprise shutting down")
+    await write_behind.stop()
+    await bi_live_hub.stop()
+    await partition_maintenance.stop()
+    analysis_executor.shutdown()
 
 
 # ══════════════════════════════════════════════════════════════
@@ -58,6 +81,8 @@ app.include_router(consultations_router)
 app.include_router(bi_router)
 app.include_router(transcription_router)
 app.include_router(llm_settings_router)
+app.include_router(cid_router)
+app.include_router(export_router)
 
 
 # ══════════════════════════════════════════════════════════════
@@ -67,3 +92,18 @@ app.include_router(llm_settings_router)
 @app.get("/api/health")
 async def health():
     return {"status": "healthy", "version": "3.0", "engine": "enterprise"}
+
+
+@app.get("/api/metrics")
+async def metrics():
+    """Runtime counters for capacity planning."""
+    return {
+        "status": "success",
+        "result_cache": analysis_cache.stats(),
+        "analysis_executor": analysis_executor.stats(),
+        "db_pool": pool_stats(),
+        "bi_live": bi_live_hub.metrics(),
+        "write_behind": write_behind.stats(),
+        "partitions": partition_maintenance.stats(),
+        "archive": consultation_archive.stats(),
+    }
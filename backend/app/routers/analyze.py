@@ -2,20 +2,31 @@
 app/routers/analyze.py — Analyze Endpoint
 Medical Scribe Enterprise v3.0
 POST /api/analyze: text → SOAP + documents + DB persistence
+    (or the write-behind outbox when WRITE_BEHIND=true)
+POST /api/analyze/batch: many transcripts → one bulk insert + one commit
 """
 
+import asyncio
 import os
 from datetime import datetime, timezone
+from typing import Literal, NamedTuple
 from openai import AsyncOpenAI
 from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from sqlalchemy import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
-from app.database import get_db, ConsultationRecord, BIRecord
+from app.compression import cold_codec
+from app.database import get_db, ConsultationRecord, ConsultationColdData, BIRecord
+from app.services.bi_live_service import BILiveHub
+from app.services.bi_rollup_service import BIRollupService
+from app.services.bi_service import BIService
+from app.services.write_behind import write_behind
 from core.security import process_patient_input
-from services.soap_engine import process as soap_process
-from services.documents import generate_all
+from services.analysis_executor import ExecutorBusy, soap_process
+from services.dialog_spans import materialize
+from services.result_cache import generate_documents, transcript_key
 
 logger = logging.getLogger("medical-scribe")
 
@@ -136,6 +147,8 @@ class AnalyzeRequest(BaseModel):
     idade: int = 0
     cenario_atendimento: str = "PS"
     texto_transcrito: str
+    # "spans": dialog as offsets into the normalized transcript (dialogSpans) instead of text
+    dialog_format: Literal["text", "spans"] = "text"
 
 
 class AnalyzeResponse(BaseModel):
@@ -145,12 +158,143 @@ class AnalyzeResponse(BaseModel):
     clinicalData: dict | None = None
     jsonUniversal: dict | None = None
     dialog: list[dict] = []
+    dialogSpans: dict | None = None
     metadata: dict | None = None
     documents: dict | None = None
     consultation_id: int | None = None
     errors: list[str] | None = None
 
 
+class AnalyzeBatchRequest(BaseModel):
+    items: list[AnalyzeRequest] = Field(..., min_length=1, max_length=200)
+
+
+class AnalyzeBatchItem(BaseModel):
+    index: int
+    success: bool
+    consultation_id: int | None = None
+    cid_principal: str | None = None
+    gravidade: str | None = None
+    errors: list[str] | None = None
+
+
+class AnalyzeBatchResponse(BaseModel):
+    success: bool
+    total: int
+    saved: int
+    failed: int
+    results: list[AnalyzeBatchItem]
+
+
+# ══════════════════════════════════════════════════════════════
+# Pipeline (shared by single + batch)
+# ══════════════════════════════════════════════════════════════
+
+class _PipelineResult(NamedTuple):
+    patient_data: dict | None = None
+    soap_result: dict | None = None
+    documents: dict | None = None
+    errors: list[str] | None = None
+
+
+async def _run_pipeline(request: AnalyzeRequest) -> _PipelineResult:
+    """
+    LGPD → SOAP → documents for one transcript. Validation and processing
+    failures come back in `errors`; ExecutorBusy propagates to the caller.
+    """
+    # 1. LGPD compliance (identity fields only: microseconds, stays on the loop)
+    try:
+        lgpd_result = process_patient_input({
+            "nome_completo": request.nome_completo,
+            "idade": request.idade,
+            "cenario_atendimento": request.cenario_atendimento,
+            "texto_transcrito": request.texto_transcrito,
+        })
+    except Exception as e:
+        logger.error(f"LGPD processing failed: {e}", exc_info=True)
+        return _PipelineResult(errors=[f"Erro interno de conformidade LGPD: {str(e)}"])
+
+    if not lgpd_result.get("success"):
+        return _PipelineResult(errors=lgpd_result.get("errors", ["Erro na validação LGPD"]))
+
+    patient_data = lgpd_result["data"]
+    logger.info(f"LGPD ✅ {patient_data['iniciais']} ({patient_data['paciente_id']})")
+
+    # 2. SOAP processing (content-addressed cache: retries/re-clicks are free;
+    #    misses run on the analysis executor, off the event loop)
+    cache_key = transcript_key(request.texto_transcrito)
+    try:
+        soap_result = await soap_process(request.texto_transcrito, cache_key)
+    except ExecutorBusy:
+        raise
+    except Exception as e:
+        logger.error(f"SOAP processing failed: {e}", exc_info=True)
+        return _PipelineResult(errors=[f"Erro no processamento clínico (SOAP): {str(e)}"])
+
+    if not soap_result.get("success"):
+        return _PipelineResult(errors=[soap_result.get("error", "Erro no processamento SOAP")])
+
+    logger.info(
+        f"SOAP ✅ CID={soap_result['clinicalData']['cid_principal']['code']}, "
+        f"Gravidade={soap_result['clinicalData']['gravidade']}"
+    )
+
+    # 3. Document generation (template fill, constant time)
+    try:
+        documents = generate_documents(soap_result, patient_data, cache_key)
+        logger.info(f"Docs ✅ {len(documents)} documentos gerados")
+    except Exception as e:
+        logger.error(f"Document generation failed: {e}", exc_info=True)
+        documents = {}  # Fallback
+
+    return _PipelineResult(patient_data, soap_result, documents)
+
+
+def _consultation_row(result: _PipelineResult) -> dict:
+    patient_data, soap_result = result.patient_data, result.soap_result
+    return {
+        "iniciais": patient_data["iniciais"],
+        "paciente_id": patient_data["paciente_id"],
+        "idade": patient_data["idade"],
+        "cenario_atendimento": patient_data["cenario_atendimento"],
+        "cid_principal_code": soap_result["clinicalData"]["cid_principal"]["code"],
+        "cid_principal_desc": soap_result["clinicalData"]["cid_principal"]["desc"],
+        "gravidade": soap_result["clinicalData"]["gravidade"],
+        "sinais_vitais": soap_result["clinicalData"]["sinais_vitais"],
+        "json_universal": soap_result["jsonUniversal"],
+        "clinical_data_json": soap_result["clinicalData"],
+        "total_falas": soap_result["metadata"]["total_falas"],
+        "falas_medico": soap_result["metadata"]["falas_medico"],
+        "falas_paciente": soap_result["metadata"]["falas_paciente"],
+    }
+
+
+def _cold_payloads(result: _PipelineResult, texto_transcrito: str) -> dict:
+    """Uncompressed values for consultation_cold (see app/compression.py)."""
+    return {
+        "texto_transcrito": texto_transcrito,
+        # Encoded spans; offsets point into dialog_spans.normalize(texto_transcrito)
+        "dialog_json": result.soap_result["dialog"],
+        "soap_json": result.soap_result["soap"],
+        "documents_json": result.documents,
+    }
+
+
+def _bi_row(result: _PipelineResult, now: datetime) -> dict:
+    patient_data, soap_result = result.patient_data, result.soap_result
+    return {
+        "iniciais": patient_data["iniciais"],
+        "cenario": patient_data["cenario_atendimento"],
+        "cid_principal": soap_result["clinicalData"]["cid_principal"]["code"],
+        "cid_desc": soap_result["clinicalData"]["cid_principal"]["desc"],
+        "gravidade_estimada": soap_result["clinicalData"]["gravidade"],
+        "sinais_vitais": soap_result["clinicalData"]["sinais_vitais"],
+        "hora": now.hour,
+        "dia_semana": now.strftime("%A"),
+        "timestamp": now.replace(tzinfo=None),
+    }
+
+
 # ══════════════════════════════════════════════════════════════
 # POST /api/analyze — Full pipeline
 # ══════════════════════════════════════════════════════════════
@@ -162,97 +306,45 @@ async def analyze(request: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
     1. LGPD: sanitize patient identity
     2. SOAP: process transcription → structured clinical data
     3. Documents: generate prescription, attestation, exams, patient guide
-    4. Persist to PostgreSQL
+    4. Persist to PostgreSQL (directly, or via the write-behind outbox)
     """
     try:
         logger.info(f"Analyze request received. Length: {len(request.texto_transcrito)}")
 
-        # 1. LGPD compliance
-        try:
-            lgpd_result = process_patient_input({
-                "nome_completo": request.nome_completo,
-                "idade": request.idade,
-                "cenario_atendimento": request.cenario_atendimento,
-                "texto_transcrito": request.texto_transcrito,
-            })
-        except Exception as e:
-            logger.error(f"LGPD processing failed: {e}", exc_info=True)
-            return AnalyzeResponse(success=False, errors=[f"Erro interno de conformidade LGPD: {str(e)}"])
-
-        if not lgpd_result.get("success"):
-            return AnalyzeResponse(
-                success=False,
-                errors=lgpd_result.get("errors", ["Erro na validação LGPD"]),
-            )
-
-        patient_data = lgpd_result["data"]
-        logger.info(f"LGPD ✅ {patient_data['iniciais']} ({patient_data['paciente_id']})")
-
-        # 2. SOAP processing
         try:
-            soap_result = soap_process(request.texto_transcrito)
-        except Exception as e:
-            logger.error(f"SOAP processing failed: {e}", exc_info=True)
-            return AnalyzeResponse(success=False, errors=[f"Erro no processamento clínico (SOAP): {str(e)}"])
+            result = await _run_pipeline(request)
+        except ExecutorBusy as e:
+            logger.warning(f"SOAP processing rejected: {e}")
+            raise HTTPException(status_code=503, detail=str(e))
 
-        if not soap_result.get("success"):
-            return AnalyzeResponse(
-                success=False,
-                errors=[soap_result.get("error", "Erro no processamento SOAP")],
-            )
-
-        logger.info(
-            f"SOAP ✅ CID={soap_result['clinicalData']['cid_principal']['code']}, "
-            f"Gravidade={soap_result['clinicalData']['gravidade']}"
-        )
+        if result.errors:
+            return AnalyzeResponse(success=False, errors=result.errors)
 
-        # 3. Document generation
-        try:
-            documents = generate_all(soap_result, patient_data)
-            logger.info(f"Docs ✅ {len(documents)} documentos gerados")
-        except Exception as e:
-            logger.error(f"Document generation failed: {e}", exc_info=True)
-            documents = {}  # Fallback
+        patient_data, soap_result, documents = result.patient_data, result.soap_result, result.documents
 
         # 4. Persist to PostgreSQL
         try:
-            consultation = ConsultationRecord(
-                iniciais=patient_data["iniciais"],
-                paciente_id=patient_data["paciente_id"],
-                idade=patient_data["idade"],
-                cenario_atendimento=patient_data["cenario_atendimento"],
-                cid_principal_code=soap_result["clinicalData"]["cid_principal"]["code"],
-                cid_principal_desc=soap_result["clinicalData"]["cid_principal"]["desc"],
-                gravidade=soap_result["clinicalData"]["gravidade"],
-                sinais_vitais=soap_result["clinicalData"]["sinais_vitais"],
-                soap_json=soap_result["soap"],
-                json_universal=soap_result["jsonUniversal"],
-                clinical_data_json=soap_result["clinicalData"],
-                dialog_json=soap_result["dialog"],
-                total_falas=soap_result["metadata"]["total_falas"],
-                falas_medico=soap_result["metadata"]["falas_medico"],
-                falas_paciente=soap_result["metadata"]["falas_paciente"],
-                documents_json=documents,
-                texto_transcrito=request.texto_transcrito,
-            )
-            db.add(consultation)
-
-            bi_record = BIRecord(
-                iniciais=patient_data["iniciais"],
-                cenario=patient_data["cenario_atendimento"],
-                cid_principal=soap_result["clinicalData"]["cid_principal"]["code"],
-                cid_desc=soap_result["clinicalData"]["cid_principal"]["desc"],
-                gravidade_estimada=soap_result["clinicalData"]["gravidade"],
-                sinais_vitais=soap_result["clinicalData"]["sinais_vitais"],
-                hora=datetime.now(timezone.utc).hour,
-                dia_semana=datetime.now(timezone.utc).strftime("%A"),
-            )
-            db.add(bi_record)
-
-            await db.commit()
-            await db.refresh(consultation)
-
-            logger.info(f"DB ✅ consultation_id={consultation.id}")
+            consultation_row = _consultation_row(result)
+            cold_payloads = _cold_payloads(result, request.texto_transcrito)
+            bi_row = _bi_row(result, datetime.now(timezone.utc))
+            if write_behind.enabled:
+                # Durable in the local outbox; the background writer group-commits it
+                consultation_id = await write_behind.submit(consultation_row, cold_payloads, bi_row)
+                logger.info(f"Outbox ✅ consultation_id={consultation_id}")
+            else:
+                consultation = ConsultationRecord(**consultation_row)
+                consultation.cold = ConsultationColdData(**cold_codec.compress_row(cold_payloads))
+                db.add(consultation)
+                db.add(BIRecord(**bi_row))
+                await BIRollupService.apply(db, [bi_row])
+                await BILiveHub.notify(db, [bi_row])
+
+                await db.commit()
+                BIService.invalidate_stats()
+                await db.refresh(consultation)
+                consultation_id = consultation.id
+
+                logger.info(f"DB ✅ consultation_id={consultation_id}")
 
         except Exception as e:
             logger.error(f"Database persistence failed: {e}", exc_info=True)
@@ -266,12 +358,104 @@ async def analyze(request: AnalyzeRequest, db: AsyncSession = Depends(get_db)):
             soap=soap_result["soap"],
             clinicalData=soap_result["clinicalData"],
             jsonUniversal=soap_result["jsonUniversal"],
-            dialog=soap_result["dialog"],
+            dialog=(
+                materialize(soap_result["dialog"], request.texto_transcrito)
+                if request.dialog_format == "text" else []
+            ),
+            dialogSpans=soap_result["dialog"] if request.dialog_format == "spans" else None,
             metadata=soap_result["metadata"],
             documents=documents,
-            consultation_id=consultation.id,
+            consultation_id=consultation_id,
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Analyze logic error: {e}", exc_info=True)
         return AnalyzeResponse(success=False, errors=[f"Erro fatal no servidor: {str(e)}"])
+
+
+# ══════════════════════════════════════════════════════════════
+# POST /api/analyze/batch — Offline sync
+# ══════════════════════════════════════════════════════════════
+
+async def _run_batch_item(request: AnalyzeRequest) -> _PipelineResult:
+    try:
+        return await _run_pipeline(request)
+    except ExecutorBusy as e:
+        return _PipelineResult(errors=[str(e)])
+    except Exception as e:
+        logger.error(f"❌ Batch item error: {e}", exc_info=True)
+        return _PipelineResult(errors=[f"Erro fatal no servidor: {str(e)}"])
+
+
+@router.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_batch(batch: AnalyzeBatchRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Same pipeline as /api/analyze for many transcripts at once.
+    Items are processed concurrently (bounded by the analysis executor), then
+    every successful item is written with one multi-row INSERT … RETURNING id
+    per table (plus the BI rollup upserts) and a single commit. Failures are
+    reported per item.
+    """
+    logger.info(f"Analyze batch received. Items: {len(batch.items)}")
+
+    results = await asyncio.gather(*(_run_batch_item(item) for item in batch.items))
+    items = [
+        AnalyzeBatchItem(index=i, success=False, errors=r.errors)
+        for i, r in enumerate(results)
+    ]
+    ok = [i for i, r in enumerate(results) if not r.errors]
+
+    if ok:
+        now = datetime.now(timezone.utc)
+        try:
+            # sort_by_parameter_order: RETURNING rows line up with the input rows
+            keys = (await db.execute(
+                insert(ConsultationRecord).returning(
+                    ConsultationRecord.id, ConsultationRecord.created_at, sort_by_parameter_order=True
+                ),
+                [_consultation_row(results[i]) for i in ok],
+            )).all()
+            ids = [consultation_id for consultation_id, _ in keys]
+            await db.execute(insert(ConsultationColdData), [
+                {
+                    "consultation_id": consultation_id,
+                    "created_at": created_at,
+                    **cold_codec.compress_row(_cold_payloads(results[i], batch.items[i].texto_transcrito)),
+                }
+                for i, (consultation_id, created_at) in zip(ok, keys)
+            ])
+            bi_rows = [_bi_row(results[i], now) for i in ok]
+            await db.execute(insert(BIRecord), bi_rows)
+            await BIRollupService.apply(db, bi_rows)
+            await BILiveHub.notify(db, bi_rows)
+            await db.commit()
+            BIService.invalidate_stats()
+        except Exception as e:
+            logger.error(f"Batch persistence failed: {e}", exc_info=True)
+            await db.rollback()
+            for i in ok:
+                items[i].errors = [f"Erro ao salvar no banco de dados: {str(e)}"]
+            ids = []
+
+        for i, consultation_id in zip(ok, ids):
+            clinical = results[i].soap_result["clinicalData"]
+            items[i] = AnalyzeBatchItem(
+                index=i,
+                success=True,
+                consultation_id=consultation_id,
+                cid_principal=clinical["cid_principal"]["code"],
+                gravidade=clinical["gravidade"],
+            )
+
+    saved = sum(item.success for item in items)
+    logger.info(f"DB ✅ batch saved={saved}/{len(items)}")
+
+    return AnalyzeBatchResponse(
+        success=saved == len(items),
+        total=len(items),
+        saved=saved,
+        failed=len(items) - saved,
+        results=items,
+    )
@@ -1,14 +1,21 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import json
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db
+from app.services.bi_live_service import bi_live_hub, bi_record_payload
+from app.services.bi_rollup_service import BIRollupService
 from app.services.bi_service import BIService
 
 router = APIRouter(prefix="/api/bi", tags=["bi"])
 
 @router.get("/stats")
-async def bi_stats(db: AsyncSession = Depends(get_db)):
-    """BI dashboard statistics."""
-    data = await BIService.get_stats(db)
+async def bi_stats():
+    """BI dashboard statistics (cached for BI_STATS_TTL, refreshed on new analyses)."""
+    data = await BIService.get_stats_cached()
     
     records = data["records"]
     stats = data["stats"]
@@ -16,18 +23,85 @@ async def bi_stats(db: AsyncSession = Depends(get_db)):
     return {
         "status": "success",
         "stats": stats,
-        "records": [
-            {
-                "iniciais": r.iniciais,
-                "cenario": r.cenario,
-                "cid_principal": r.cid_principal,
-                "cid_desc": r.cid_desc,
-                "gravidade_estimada": r.gravidade_estimada,
-                "sinais_vitais": r.sinais_vitais,
-                "hora": r.hora,
-                "dia_semana": r.dia_semana,
-                "timestamp": r.timestamp.isoformat() if r.timestamp else None,
-            }
-            for r in records
-        ],
+        "records": [bi_record_payload(r) for r in records],
     }
+
+
+# ── Rollup-backed views (constant cost regardless of history size) ──
+
+@router.get("/timeseries")
+async def bi_timeseries(
+    granularity: Literal["day", "hour"] = "day",
+    days: int = Query(30, ge=1, le=3650),
+    cenario: str | None = None,
+    gravidade: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Consultations (and severe ones) per day or hour."""
+    data = await BIRollupService.timeseries(db, granularity, days, cenario, gravidade)
+    return {"status": "success", "granularity": granularity, "data": data}
+
+
+@router.get("/heatmap")
+async def bi_heatmap(
+    cenario: str | None = None,
+    gravidade: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Consultations by weekday × hour (UTC)."""
+    data = await BIRollupService.heatmap(db, cenario, gravidade)
+    return {"status": "success", "data": data}
+
+
+@router.get("/top-cids")
+async def bi_top_cids(
+    limit: int = Query(10, ge=1, le=100),
+    days: int = Query(30, ge=1, le=3650),
+    cenario: str | None = None,
+    gravidade: str | None = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """Most frequent principal CIDs in the window."""
+    data = await BIRollupService.top_cids(db, limit, days, cenario, gravidade)
+    return {"status": "success", "data": data}
+
+
+# ── Live dashboard (Server-Sent Events) ──
+
+_HEARTBEAT_SECONDS = 15
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+@router.get("/live")
+async def bi_live():
+    """
+    SSE stream: a `snapshot` event, then one `bi_record` event (record +
+    counter deltas + updated counters) per committed BI record, from any worker.
+    """
+    if not bi_live_hub.listening:
+        raise HTTPException(status_code=503, detail="BI ao vivo indisponível")
+
+    async def events():
+        queue = bi_live_hub.subscribe()
+        try:
+            yield _sse(await bi_live_hub.snapshot())
+            while bi_live_hub.is_subscribed(queue) or not queue.empty():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _sse(event)
+            # Dropped for falling behind: the browser's EventSource reconnects
+            yield _sse({"type": "resync"})
+        finally:
+            bi_live_hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Query
+from app.services.cid_search_service import CidSearchService
+
+router = APIRouter(prefix="/api/cid", tags=["cid"])
+
+@router.get("/search")
+async def search_cid(
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """CID-10 autocomplete: code/description prefix + accent-insensitive substring."""
+    results = CidSearchService.search(q, limit)
+
+    return {
+        "status": "success",
+        "count": len(results),
+        "data": results,
+    }
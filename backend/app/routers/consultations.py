@@ -1,24 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
+from app.database import get_db, ConsultationRecord
 from app.services.consultation_service import ConsultationService
+from services.dialog_spans import is_encoded, materialize
 
 router = APIRouter(prefix="/api/consultations", tags=["consultations"])
 
 @router.get("")
 async def list_consultations(
-    limit: int = 20,
-    offset: int = 0,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, description="Legacy paging; prefer cursor"),
     cenario: str | None = None,
     gravidade: str | None = None,
+    cursor: str | None = Query(None, description="next_cursor from the previous page"),
+    with_total: bool = Query(False, description="Include an approximate total (planner estimate)"),
     db: AsyncSession = Depends(get_db),
 ):
-    """List consultations with optional filters."""
-    records = await ConsultationService.get_consultations(db, limit, offset, cenario, gravidade)
+    """List consultations with optional filters, newest first (keyset pagination)."""
+    try:
+        records, next_cursor = await ConsultationService.get_consultations(
+            db, limit, offset, cenario, gravidade, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    return {
+    response = {
         "status": "success",
         "count": len(records),
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
+    if with_total:
+        response["approx_total"] = await ConsultationService.approximate_count(db, cenario, gravidade)
+
+    return {
+        **response,
         "data": [
             {
                 "id": r.id,
@@ -36,10 +54,53 @@ async def list_consultations(
         ],
     }
 
+# Detail sections: response key → (deferred column group, attribute)
+DETAIL_FIELDS = {
+    "soap": ("soap", "soap_json"),
+    "jsonUniversal": ("universal", "json_universal"),
+    "clinicalData": ("clinical", "clinical_data_json"),
+    "dialog": ("dialog", "dialog_json"),
+    "documents": ("documents", "documents_json"),
+}
+
+DialogFormat = Literal["text", "spans"]
+_DIALOG_FORMAT = Query("text", description="text: speaker + sentence; spans: offsets into the normalized transcript")
+
+
+def _dialog(record: ConsultationRecord, dialog_format: DialogFormat):
+    """Stored spans cut out of the transcript on request (older rows store text already)."""
+    stored = record.dialog_json
+    if not is_encoded(stored) or dialog_format == "spans":
+        return stored or []
+    return materialize(stored, record.texto_transcrito)
+
+
+def _dialog_groups(dialog_format: DialogFormat) -> tuple:
+    return ("dialog", "transcript") if dialog_format == "text" else ("dialog",)
+
+
 @router.get("/{consultation_id}")
-async def get_consultation(consultation_id: int, db: AsyncSession = Depends(get_db)):
-    """Get full consultation detail."""
-    record = await ConsultationService.get_consultation_by_id(db, consultation_id)
+async def get_consultation(
+    consultation_id: int,
+    fields: str | None = Query(
+        None, description=f"Comma-separated sections to include: {', '.join(DETAIL_FIELDS)} (default: all)"
+    ),
+    dialog_format: DialogFormat = _DIALOG_FORMAT,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get consultation detail; `fields` limits which heavy sections are loaded."""
+    if fields is None:
+        selected = list(DETAIL_FIELDS)
+    else:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in selected if f not in DETAIL_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(unknown)}")
+
+    groups = [DETAIL_FIELDS[f][0] for f in selected if f != "dialog"]
+    if "dialog" in selected:
+        groups.extend(_dialog_groups(dialog_format))
+    record = await ConsultationService.get_consultation_by_id(db, consultation_id, groups)
 
     if not record:
         raise HTTPException(status_code=404, detail="Consulta não encontrada")
@@ -55,11 +116,10 @@ async def get_consultation(consultation_id: int, db: AsyncSession = Depends(get_
             "cid_principal": {"code": record.cid_principal_code, "desc": record.cid_principal_desc},
             "gravidade": record.gravidade,
             "sinais_vitais": record.sinais_vitais,
-            "soap": record.soap_json,
-            "jsonUniversal": record.json_universal,
-            "clinicalData": record.clinical_data_json,
-            "dialog": record.dialog_json,
-            "documents": record.documents_json,
+            **{
+                f: _dialog(record, dialog_format) if f == "dialog" else getattr(record, DETAIL_FIELDS[f][1])
+                for f in selected
+            },
             "metadata": {
                 "total_falas": record.total_falas,
                 "falas_medico": record.falas_medico,
@@ -68,3 +128,56 @@ async def get_consultation(consultation_id: int, db: AsyncSession = Depends(get_
             "created_at": record.created_at.isoformat() if record.created_at else None,
         },
     }
+
+
+# ══════════════════════════════════════════════════════════════
+# Sub-resources — one deferred column group each
+# ══════════════════════════════════════════════════════════════
+
+async def _section(db: AsyncSession, consultation_id: int, groups: str | tuple, *columns):
+    record = await ConsultationService.get_consultation_section(db, consultation_id, groups, *columns)
+    if not record:
+        raise HTTPException(status_code=404, detail="Consulta não encontrada")
+    return record
+
+
+@router.get("/{consultation_id}/soap")
+async def get_consultation_soap(consultation_id: int, db: AsyncSession = Depends(get_db)):
+    record = await _section(db, consultation_id, "soap")
+    return {"status": "success", "id": record.id, "data": record.soap_json}
+
+
+@router.get("/{consultation_id}/dialog")
+async def get_consultation_dialog(
+    consultation_id: int,
+    dialog_format: DialogFormat = _DIALOG_FORMAT,
+    db: AsyncSession = Depends(get_db),
+):
+    record = await _section(
+        db, consultation_id, _dialog_groups(dialog_format),
+        ConsultationRecord.total_falas, ConsultationRecord.falas_medico, ConsultationRecord.falas_paciente,
+    )
+    data = _dialog(record, dialog_format)
+    return {
+        "status": "success",
+        "id": record.id,
+        "format": "spans" if is_encoded(data) else "text",
+        "data": data,
+        "metadata": {
+            "total_falas": record.total_falas,
+            "falas_medico": record.falas_medico,
+            "falas_paciente": record.falas_paciente,
+        },
+    }
+
+
+@router.get("/{consultation_id}/documents")
+async def get_consultation_documents(consultation_id: int, db: AsyncSession = Depends(get_db)):
+    record = await _section(db, consultation_id, "documents")
+    return {"status": "success", "id": record.id, "data": record.documents_json}
+
+
+@router.get("/{consultation_id}/clinical")
+async def get_consultation_clinical(consultation_id: int, db: AsyncSession = Depends(get_db)):
+    record = await _section(db, consultation_id, "clinical")
+    return {"status": "success", "id": record.id, "data": record.clinical_data_json}
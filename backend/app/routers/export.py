@@ -0,0 +1,54 @@
+"""
+app/routers/export.py — Research Export Endpoints
+Medical Scribe Enterprise v3.0
+GET /api/export/bi-records, /api/export/consultations → NDJSON | CSV | Parquet, streamed
+"""
+
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.export_service import FORMATS, ExportService
+
+router = APIRouter(prefix="/api/export", tags=["export"])
+
+ExportFormat = Literal["ndjson", "csv", "parquet"]
+
+
+def _response(name: str, fmt: str, factory, since, until, cenario) -> StreamingResponse:
+    try:
+        body = factory(fmt, since, until, cenario)
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Exportação Parquet indisponível (pyarrow não instalado)")
+
+    media_type, extension = FORMATS[fmt]
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}-{stamp}.{extension}"'},
+    )
+
+
+@router.get("/bi-records")
+async def export_bi_records(
+    format: ExportFormat = "ndjson",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cenario: str | None = None,
+):
+    """Every BI record in the window (no initials), oldest first."""
+    return _response("bi-records", format, ExportService.bi_records, since, until, cenario)
+
+
+@router.get("/consultations")
+async def export_consultations(
+    format: ExportFormat = "ndjson",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cenario: str | None = None,
+):
+    """Anonymized consultations: clinical fields only — no initials, IDs, transcript or documents."""
+    return _response("consultations", format, ExportService.consultations, since, until, cenario)
@@ -0,0 +1,478 @@
+"""
+app/services/archive_service.py — Parquet Archive Tier
+Medical Scribe Enterprise v3.0
+Consultations older than ARCHIVE_AFTER_MONTHS leave Postgres a month at a
+time: the month is written to zstd Parquet, one file per cenario,
+
+    ARCHIVE_DIR/consultations/month=2025-01/cenario=<cenario>/part-0.parquet
+
+and its consultations / consultation_cold partitions are dropped in the same
+(partition maintenance) transaction. The files are staged in month=….tmp and
+only renamed into place once that transaction has committed; a staged month
+left behind by a crash is published on the next round if its partition is
+gone, discarded otherwise. Each file is sorted by id, with the cold payloads
+stored decompressed.
+
+Reads fall through to the archive: ConsultationArchive keeps every archived
+id in two parallel sorted arrays (8 bytes per consultation) pointing at its
+file, and the file is read for just that row (row-group statistics on id).
+The research export streams archived months ahead of the Postgres rows.
+
+    python -m app.services.archive_service run       # one maintenance round (archive + retention)
+    python -m app.services.archive_service stats
+    python -m app.services.archive_service get 123
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import threading
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime, timezone
+from heapq import merge
+from itertools import repeat
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+from urllib.parse import quote
+
+from sqlalchemy import Text, and_, cast, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.compression import COLD_COLUMNS, cold_codec
+from app.database import ConsultationColdData, ConsultationRecord
+from app.services.cold_storage import ColdStorage
+from app.services.partition_service import RETENTION_MONTHS, PartitionService, add_months, month_start
+
+logger = logging.getLogger("medical-scribe")
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", Path(__file__).resolve().parents[2] / "data" / "archive"))
+# Whole months older than this are archived; 0 keeps everything in Postgres
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "0"))
+ROW_GROUP_ROWS = int(os.getenv("ARCHIVE_ROW_GROUP_ROWS", "5000"))
+
+# Archived column → arrow type ("json" columns are stored as JSON text)
+ARCHIVE_COLUMNS = {
+    "id": "int", "iniciais": "str", "paciente_id": "str", "idade": "int", "cenario_atendimento": "str",
+    "cid_principal_code": "str", "cid_principal_desc": "str", "gravidade": "str",
+    "sinais_vitais": "json", "json_universal": "json", "clinical_data_json": "json",
+    "total_falas": "int", "falas_medico": "int", "falas_paciente": "int", "lgpd_conformidade": "bool",
+    "created_at": "timestamp", "updated_at": "timestamp",
+    "texto_transcrito": "str", "dialog_json": "json", "soap_json": "json", "documents_json": "json",
+}
+ARCHIVE_JSON_COLUMNS = {name for name, kind in ARCHIVE_COLUMNS.items() if kind == "json"}
+
+# ConsultationRecord deferred groups (see consultation_service) → archived column
+GROUP_COLUMNS = {
+    "soap": "soap_json", "universal": "json_universal", "clinical": "clinical_data_json",
+    "dialog": "dialog_json", "documents": "documents_json", "transcript": "texto_transcrito",
+}
+# Read for every archived lookup; the heavy columns only when their group is asked for
+SCALAR_COLUMNS = [name for name in ARCHIVE_COLUMNS if name not in GROUP_COLUMNS.values()]
+
+_MONTH_PREFIX = "month="
+_CENARIO_PREFIX = "cenario="
+
+
+def _month_dir(root: Path, month: date) -> Path:
+    return root / f"{_MONTH_PREFIX}{month:%Y-%m}"
+
+
+def _month_bounds(month: date) -> tuple[datetime, datetime]:
+    end = add_months(month, 1)
+    return datetime(month.year, month.month, 1), datetime(end.year, end.month, 1)
+
+
+def naive_utc(value: datetime | None) -> datetime | None:
+    """Aware datetimes → naive UTC, to compare with TIMESTAMP WITHOUT TIME ZONE columns."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class ArchivedConsultation:
+    """
+    Read-only stand-in for a ConsultationRecord that lives in the archive:
+    same attribute names, heavy sections present only if they were requested.
+    """
+
+    archived = True
+
+    def __init__(self, row: dict):
+        for name, value in row.items():
+            setattr(self, name, json.loads(value) if name in ARCHIVE_JSON_COLUMNS and value is not None else value)
+
+
+# ══════════════════════════════════════════════════════════════
+# READ SIDE — id → file index + read-through
+# ══════════════════════════════════════════════════════════════
+
+class ConsultationArchive:
+    """
+    Sorted id array + parallel file-number array over every archived file.
+    Months archived (or expired) by another worker are picked up on the next
+    index miss, which rescans the month directories.
+    """
+
+    def __init__(self, directory: Path = ARCHIVE_DIR):
+        self.root = directory / "consultations"
+        # (sorted ids, file number per id, files): swapped as one tuple on reload
+        self._index: tuple[array, array, list[Path]] = (array("i"), array("I"), [])
+        self._months: frozenset[str] = frozenset()
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.reloads = 0
+
+    def _scan_months(self) -> frozenset[str]:
+        try:
+            return frozenset(
+                entry.name for entry in os.scandir(self.root)
+                # month=YYYY-MM only: not the .tmp staging or .old swap directories
+                if entry.is_dir() and entry.name.startswith(_MONTH_PREFIX) and "." not in entry.name
+            )
+        except FileNotFoundError:
+            return frozenset()
+
+    def months(self) -> list[date]:
+        """Archived months on disk, oldest first."""
+        return sorted(date.fromisoformat(name[len(_MONTH_PREFIX):] + "-01") for name in self._scan_months())
+
+    def load(self) -> int:
+        """(Re)builds the index from the files on disk. Returns the number of archived ids."""
+        with self._lock:
+            months = self._scan_months()
+            files = sorted(path for month in months for path in (self.root / month).glob("*/*.parquet"))
+            runs = []
+            if files:
+                import pyarrow.parquet as pq
+
+                for number, path in enumerate(files):
+                    ids = pq.read_table(path, columns=["id"]).column("id").to_pylist()
+                    runs.append(zip(ids, repeat(number)))
+            ids, file_numbers = array("i"), array("I")
+            for consultation_id, number in merge(*runs):
+                ids.append(consultation_id)
+                file_numbers.append(number)
+            self._index, self._months = (ids, file_numbers, files), months
+            self.reloads += 1
+            return len(ids)
+
+    async def start(self) -> None:
+        count = await asyncio.to_thread(self.load)
+        if count:
+            logger.info(f"✅ Archive index: {count} consultations in {len(self._index[2])} Parquet files")
+
+    def locate(self, consultation_id: int) -> Path | None:
+        ids, file_numbers, files = self._index
+        i = bisect_left(ids, consultation_id)
+        if i < len(ids) and ids[i] == consultation_id:
+            return files[file_numbers[i]]
+        return None
+
+    def _read(self, consultation_id: int, columns: list[str]) -> dict | None:
+        import pyarrow.parquet as pq
+
+        path = self.locate(consultation_id)
+        if path is None and self._scan_months() != self._months:
+            self.load()
+            path = self.locate(consultation_id)
+        if path is None:
+            return None
+        try:
+            rows = pq.read_table(path, columns=columns, filters=[("id", "=", consultation_id)]).to_pylist()
+        except FileNotFoundError:
+            # Expired by retention (possibly in another worker)
+            self.load()
+            return None
+        return rows[0] if rows else None
+
+    async def get(self, consultation_id: int, groups=()) -> ArchivedConsultation | None:
+        """The archived consultation with the given deferred groups loaded, or None."""
+        columns = SCALAR_COLUMNS + [GROUP_COLUMNS[g] for g in groups if g in GROUP_COLUMNS]
+        self.lookups += 1
+        row = await asyncio.to_thread(self._read, consultation_id, columns)
+        if row is None:
+            return None
+        self.hits += 1
+        return ArchivedConsultation(row)
+
+    def _scan(self, columns: list[str], since, until, cenario) -> Iterator[list[dict]]:
+        import pyarrow.parquet as pq
+
+        since, until = naive_utc(since), naive_utc(until)
+        pattern = f"{_CENARIO_PREFIX}{quote(cenario, safe='')}/*.parquet" if cenario else "*/*.parquet"
+        for month in self.months():
+            start, end = _month_bounds(month)
+            if (since and end <= since) or (until and start >= until):
+                continue
+            for path in sorted(_month_dir(self.root, month).glob(pattern)):
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=ROW_GROUP_ROWS, columns=columns):
+                    rows = [
+                        row for row in batch.to_pylist()
+                        if (not since or row["created_at"] >= since) and (not until or row["created_at"] < until)
+                    ]
+                    if rows:
+                        yield rows
+
+    async def scan(self, columns: list[str], since=None, until=None, cenario=None) -> AsyncIterator[list[dict]]:
+        """Archived rows (just `columns`, JSON still as text) in the window, one batch at a time."""
+        if "created_at" not in columns:
+            columns = [*columns, "created_at"]
+        batches = self._scan(columns, since, until, cenario)
+        while (rows := await asyncio.to_thread(next, batches, None)) is not None:
+            yield rows
+
+    def stats(self) -> dict:
+        ids, file_numbers, files = self._index
+        return {
+            "directory": str(self.root),
+            "archive_after_months": ARCHIVE_AFTER_MONTHS,
+            "months": len(self._months),
+            "files": len(files),
+            "consultations": len(ids),
+            "index_bytes": ids.itemsize * len(ids) + file_numbers.itemsize * len(file_numbers),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "reloads": self.reloads,
+        }
+
+
+consultation_archive = ConsultationArchive()
+
+
+# ══════════════════════════════════════════════════════════════
+# WRITE SIDE — archive whole months, expire them with retention
+# ══════════════════════════════════════════════════════════════
+
+class _MonthWriter:
+    """One ParquetWriter per cenario under a temporary month directory."""
+
+    def __init__(self, directory: Path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "int": pa.int32(), "str": pa.string(), "json": pa.string(),
+            "bool": pa.bool_(), "timestamp": pa.timestamp("us"),
+        }
+        self._pa, self._pq = pa, pq
+        self.schema = pa.schema([(name, types[kind]) for name, kind in ARCHIVE_COLUMNS.items()])
+        self.directory = directory
+        self._writers = {}
+        self.rows = 0
+
+    def write(self, rows: list[dict]) -> None:
+        by_cenario: dict[str, list[dict]] = {}
+        for row in rows:
+            by_cenario.setdefault(row["cenario_atendimento"], []).append(row)
+        for cenario, group in by_cenario.items():
+            writer = self._writers.get(cenario)
+            if writer is None:
+                path = self.directory / f"{_CENARIO_PREFIX}{quote(cenario, safe='')}" / "part-0.parquet"
+                path.parent.mkdir(parents=True, exist_ok=True)
+                writer = self._writers[cenario] = self._pq.ParquetWriter(path, self.schema, compression="zstd")
+            writer.write_table(self._pa.Table.from_pylist(group, schema=self.schema), row_group_size=ROW_GROUP_ROWS)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+
+
+class StagedMonth:
+    """A month fully written to its .tmp directory, waiting for the DROP to commit."""
+
+    def __init__(self, month: date, staging: Path, final: Path, rows: int):
+        self.month = month
+        self.staging = staging
+        self.final = final
+        self.rows = rows
+
+    def __str__(self) -> str:
+        return f"{self.month:%Y-%m} ({self.rows})"
+
+    def publish(self) -> None:
+        """Swaps the staged files in. An empty write never replaces what is already archived."""
+        if not any(self.staging.glob("*/*.parquet")):
+            self.discard()
+            return
+        previous = self.final.with_name(self.final.name + ".old")
+        shutil.rmtree(previous, ignore_errors=True)
+        if self.final.exists():
+            self.final.rename(previous)
+        self.staging.rename(self.final)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def discard(self) -> None:
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+
+class ArchiveService:
+
+    @staticmethod
+    def _month_query(month: date):
+        """Every column of one month, cold payloads joined (still compressed), JSON as text, by id."""
+        hot = [
+            cast(getattr(ConsultationRecord, name), Text).label(name) if name in ARCHIVE_JSON_COLUMNS
+            else getattr(ConsultationRecord, name)
+            for name in ARCHIVE_COLUMNS if name not in COLD_COLUMNS
+        ]
+        cold = [getattr(ConsultationColdData, name) for name in COLD_COLUMNS]
+        start, end = _month_bounds(month)
+        return (
+            select(*hot, ConsultationColdData.dict_id, *cold)
+            .outerjoin(ConsultationColdData, and_(
+                ConsultationColdData.consultation_id == ConsultationRecord.id,
+                ConsultationColdData.created_at == ConsultationRecord.created_at,
+            ))
+            .where(ConsultationRecord.created_at >= start, ConsultationRecord.created_at < end)
+            .order_by(ConsultationRecord.id)
+        )
+
+    @staticmethod
+    def _shape(row) -> dict:
+        data = dict(row._mapping)
+        dict_id = data.pop("dict_id")
+        for name in COLD_COLUMNS:
+            raw = cold_codec.decompress(dict_id, data[name])
+            data[name] = raw.decode() if raw is not None else None
+        return data
+
+    @staticmethod
+    async def write_month(conn: AsyncConnection, month: date, root: Path | None = None) -> StagedMonth:
+        """
+        Writes one month to its .tmp staging directory (replacing a previous
+        attempt). Nothing is visible to readers until StagedMonth.publish(),
+        which the caller runs once the partition DROP has committed.
+        """
+        root = root or consultation_archive.root
+        final = _month_dir(root, month)
+        staging = final.with_name(final.name + ".tmp")
+        await asyncio.to_thread(shutil.rmtree, staging, True)
+
+        start, end = _month_bounds(month)
+        dict_ids = (await conn.execute(
+            select(ConsultationColdData.dict_id).distinct()
+            .where(ConsultationColdData.created_at >= start, ConsultationColdData.created_at < end)
+        )).scalars().all()
+        await ColdStorage.ensure_dictionaries(conn, dict_ids)
+
+        # Keyset batches rather than a server-side cursor: an open cursor would
+        # keep the partition from being dropped later in this transaction
+        writer = _MonthWriter(staging)
+        query = ArchiveService._month_query(month).limit(ROW_GROUP_ROWS)
+        last_id = 0
+        try:
+            while rows := (await conn.execute(query.where(ConsultationRecord.id > last_id))).all():
+                await asyncio.to_thread(writer.write, [ArchiveService._shape(row) for row in rows])
+                last_id = rows[-1].id
+        except BaseException:
+            await asyncio.to_thread(writer.close)
+            await asyncio.to_thread(shutil.rmtree, staging, True)
+            raise
+        await asyncio.to_thread(writer.close)
+        return StagedMonth(month, staging, final, writer.rows)
+
+    @staticmethod
+    async def recover_staged(conn: AsyncConnection) -> list[str]:
+        """
+        Settles staged months left by an earlier round that did not publish
+        (crash after the DROP commit, or a commit whose outcome was unknown):
+        published if the month's partition is gone (the files are the only
+        copy), discarded if it still exists (it gets archived again).
+        """
+        root = consultation_archive.root
+        try:
+            staged = [path for path in root.iterdir() if path.is_dir() and path.name.endswith(".tmp")]
+        except FileNotFoundError:
+            return []
+        if not staged:
+            return []
+        live = {p["start"] for p in await PartitionService.partitions(conn, "consultations")}
+        recovered = []
+        for path in staged:
+            month = date.fromisoformat(path.name[len(_MONTH_PREFIX):-len(".tmp")] + "-01")
+            pending = StagedMonth(month, path, _month_dir(root, month), 0)
+            if month in live:
+                await asyncio.to_thread(pending.discard)
+            else:
+                await asyncio.to_thread(pending.publish)
+                recovered.append(f"{month:%Y-%m}")
+        return recovered
+
+    @staticmethod
+    async def archive(conn: AsyncConnection, today: date | None = None) -> list[StagedMonth]:
+        """
+        Stages every consultations partition older than ARCHIVE_AFTER_MONTHS
+        and drops it (with its consultation_cold partition) on `conn`. The
+        caller publishes the returned months after its transaction commits,
+        or discards them if it fails.
+        """
+        if ARCHIVE_AFTER_MONTHS <= 0:
+            return []
+        cutoff = add_months(month_start(today or datetime.now(timezone.utc).date()), -ARCHIVE_AFTER_MONTHS)
+        archived = []
+        try:
+            for partition in await PartitionService.partitions(conn, "consultations"):
+                if partition["end"] > cutoff:
+                    break
+                archived.append(await ArchiveService.write_month(conn, partition["start"]))
+        except BaseException:
+            for staged in archived:
+                await asyncio.to_thread(staged.discard)
+            raise
+        if archived:
+            await PartitionService.drop_before(conn, "consultations", cutoff)
+            await PartitionService.drop_before(conn, "consultation_cold", cutoff)
+        return archived
+
+    @staticmethod
+    async def apply_retention(today: date | None = None) -> list[str]:
+        """Deletes archived months past CONSULTATION_RETENTION_MONTHS (same rule as the partitions)."""
+        months = RETENTION_MONTHS["consultations"]
+        if months <= 0:
+            return []
+        cutoff = add_months(month_start(today or datetime.now(timezone.utc).date()), -months)
+        expired = []
+        for month in consultation_archive.months():
+            if add_months(month, 1) <= cutoff:
+                await asyncio.to_thread(shutil.rmtree, _month_dir(consultation_archive.root, month), True)
+                expired.append(f"{month:%Y-%m}")
+        return expired
+
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+async def _run(args):
+    from app.database import init_db
+
+    if args.command == "run":
+        await init_db()
+        print(f"✅ {await PartitionService.maintain()}")
+        return
+    await asyncio.to_thread(consultation_archive.load)
+    if args.command == "stats":
+        print(consultation_archive.stats())
+    else:
+        record = await consultation_archive.get(args.id, GROUP_COLUMNS)
+        print(vars(record) if record else f"❌ {args.id} is not archived")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.archive_service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("run", help="partition maintenance round: archive old months, apply retention")
+    sub.add_parser("stats", help="archive index statistics")
+    get = sub.add_parser("get", help="print one archived consultation")
+    get.add_argument("id", type=int)
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+app/services/bi_live_service.py — Live BI Fan-out
+Medical Scribe Enterprise v3.0
+New BI records travel as Postgres NOTIFY payloads (sent inside the inserting
+transaction, so only committed rows are announced). Every worker LISTENs on
+one dedicated connection and fans events out to its SSE subscribers.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime
+
+import asyncpg
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal, BIRollupDaily, engine
+from app.services.bi_service import BIService
+
+logger = logging.getLogger("medical-scribe")
+
+CHANNEL = "bi_live"
+ENABLED = os.getenv("BI_LIVE_ENABLED", "true").lower() == "true"
+# Postgres caps NOTIFY payloads at 8000 bytes
+_MAX_PAYLOAD = 7500
+_RECORD_FIELDS = (
+    "iniciais", "cenario", "cid_principal", "cid_desc", "gravidade_estimada",
+    "sinais_vitais", "hora", "dia_semana", "timestamp",
+)
+
+
+def bi_record_payload(record) -> dict:
+    """Same shape as the records of /api/bi/stats; accepts a BIRecord or a row dict."""
+    get = record.get if isinstance(record, dict) else lambda name: getattr(record, name)
+    payload = {name: get(name) for name in _RECORD_FIELDS}
+    if isinstance(payload["timestamp"], datetime):
+        payload["timestamp"] = payload["timestamp"].isoformat()
+    return payload
+
+
+class BILiveHub:
+    """In-process fan-out: one LISTEN connection, many subscriber queues."""
+
+    def __init__(self, queue_size: int = 256):
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._listener: asyncpg.Connection | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        self._closing = False
+        self.stats: dict | None = None
+        self._cenarios: set[str] = set()
+        self._cids: set[str] = set()
+
+    # ── Publishing (request side) ──
+
+    @staticmethod
+    async def notify(db: AsyncSession, bi_rows: list[dict]) -> None:
+        """Queue NOTIFYs in the caller's transaction; Postgres delivers them on commit."""
+        if not ENABLED or not bi_rows:
+            return
+        chunk: list[str] = []
+        size = 0
+        for row in bi_rows:
+            encoded = json.dumps(bi_record_payload(row), ensure_ascii=False)
+            if chunk and size + len(encoded.encode()) > _MAX_PAYLOAD:
+                await db.execute(select(func.pg_notify(CHANNEL, f"[{','.join(chunk)}]")))
+                chunk, size = [], 0
+            chunk.append(encoded)
+            size += len(encoded.encode()) + 1
+        await db.execute(select(func.pg_notify(CHANNEL, f"[{','.join(chunk)}]")))
+
+    # ── Lifecycle ──
+
+    async def start(self) -> None:
+        if not ENABLED:
+            return
+        self._closing = False
+        await self._seed_stats()
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._closing = True
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
+        self._listener = None
+
+    @property
+    def listening(self) -> bool:
+        return self._listener is not None and not self._listener.is_closed()
+
+    async def _connect(self) -> None:
+        url = engine.url.set(drivername="postgresql")
+        self._listener = await asyncpg.connect(url.render_as_string(hide_password=False), ssl="disable")
+        await self._listener.add_listener(CHANNEL, self._on_notify)
+        self._listener.add_termination_listener(self._on_terminated)
+        logger.info(f"📡 BI live: listening on '{CHANNEL}'")
+
+    def _on_terminated(self, _connection) -> None:
+        if not self._closing and (self._reconnect_task is None or self._reconnect_task.done()):
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while not self._closing:
+            try:
+                await self._connect()
+                # Events were missed while disconnected: recount and tell clients to resync
+                await self._seed_stats()
+                self._broadcast({"type": "resync"})
+                return
+            except Exception as e:
+                logger.warning(f"BI live: reconnect failed ({e}); retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+    async def _seed_stats(self) -> None:
+        """Counters from the daily rollup (one row per cenário × CID × gravidade)."""
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(
+                    BIRollupDaily.cenario, BIRollupDaily.cid_principal,
+                    BIRollupDaily.gravidade_estimada, func.sum(BIRollupDaily.total),
+                ).group_by(BIRollupDaily.cenario, BIRollupDaily.cid_principal, BIRollupDaily.gravidade_estimada)
+            )
+            rows = result.all()
+        self._cenarios = {cenario for cenario, _, _, _ in rows}
+        self._cids = {cid for _, cid, _, _ in rows}
+        self.stats = {
+            "total": sum(n for *_, n in rows),
+            "graves": sum(n for _, _, gravidade, n in rows if gravidade == "Grave"),
+            "cenarios": len(self._cenarios),
+            "cids": len(self._cids),
+        }
+
+    # ── Fan-out ──
+
+    def _on_notify(self, _connection, _pid, _channel, payload: str) -> None:
+        try:
+            records = json.loads(payload)
+        except ValueError:
+            logger.warning("BI live: ignoring malformed payload")
+            return
+        # Another worker (or this one) committed BI rows: cached stats are stale
+        BIService.invalidate_stats()
+        for record in records:
+            self._broadcast(self._apply(record))
+
+    def _apply(self, record: dict) -> dict:
+        grave = record.get("gravidade_estimada") == "Grave"
+        new_cenario = record.get("cenario") not in self._cenarios
+        new_cid = record.get("cid_principal") not in self._cids
+        self._cenarios.add(record.get("cenario"))
+        self._cids.add(record.get("cid_principal"))
+        delta = {"total": 1, "graves": int(grave), "cenarios": int(new_cenario), "cids": int(new_cid)}
+        if self.stats is not None:
+            self.stats = {key: self.stats[key] + delta[key] for key in delta}
+        return {"type": "bi_record", "record": record, "delta": delta, "stats": self.stats}
+
+    def _broadcast(self, event: dict) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Too slow to keep up: cut it loose; the client reconnects and resyncs
+                self._subscribers.discard(queue)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def is_subscribed(self, queue: asyncio.Queue) -> bool:
+        return queue in self._subscribers
+
+    async def snapshot(self) -> dict:
+        """First event of every stream: current counters + latest records."""
+        data = await BIService.get_stats_cached()
+        return {
+            "type": "snapshot",
+            "stats": self.stats or data["stats"],
+            "records": [bi_record_payload(r) for r in data["records"]],
+        }
+
+    def metrics(self) -> dict:
+        return {"enabled": ENABLED, "listening": self.listening, "subscribers": len(self._subscribers)}
+
+
+bi_live_hub = BILiveHub()
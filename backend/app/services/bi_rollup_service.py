@@ -0,0 +1,204 @@
+"""
+app/services/bi_rollup_service.py — Incremental BI Rollups
+Medical Scribe Enterprise v3.0
+Hourly / daily / weekday-hour counters upserted in the same transaction as
+every BIRecord insert; dashboards read these instead of scanning bi_records.
+
+Rebuild from bi_records (after imports, manual fixes, first deploy):
+    python -m app.services.bi_rollup_service backfill
+"""
+
+import argparse
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Date, cast, delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import (
+    AsyncSessionLocal, BIRecord, BIRollupDaily, BIRollupHeatmap, BIRollupHourly, init_db,
+)
+
+
+class BIRollupService:
+
+    # ══════════════════════════════════════════════════════════════
+    # WRITE PATH
+    # ══════════════════════════════════════════════════════════════
+
+    @staticmethod
+    async def apply(db: AsyncSession, bi_rows: list[dict]) -> None:
+        """
+        Adds `bi_rows` (BIRecord column dicts with `timestamp`) to the rollups.
+        Call before the commit that inserts them. Keys are aggregated and sorted
+        first: one upsert per table, and concurrent writers lock rows in the
+        same order (no deadlocks).
+        """
+        hourly, daily, heatmap, descs = Counter(), Counter(), Counter(), {}
+        for row in bi_rows:
+            ts = row["timestamp"]
+            key = (row["cenario"], row["cid_principal"], row["gravidade_estimada"])
+            hourly[(ts.replace(minute=0, second=0, microsecond=0), *key)] += 1
+            daily[(ts.date(), *key)] += 1
+            if row.get("hora") is not None and row.get("dia_semana"):
+                heatmap[(row["dia_semana"], row["hora"], row["cenario"], row["gravidade_estimada"])] += 1
+            descs[row["cid_principal"]] = row["cid_desc"]
+
+        for table, counts in ((BIRollupHourly, hourly), (BIRollupDaily, daily)):
+            if counts:
+                await BIRollupService._upsert(db, table, [
+                    {"bucket": bucket, "cenario": cenario, "cid_principal": cid,
+                     "gravidade_estimada": gravidade, "cid_desc": descs[cid], "total": n}
+                    for (bucket, cenario, cid, gravidade), n in sorted(counts.items())
+                ], update_desc=True)
+        if heatmap:
+            await BIRollupService._upsert(db, BIRollupHeatmap, [
+                {"dia_semana": dia, "hora": hora, "cenario": cenario, "gravidade_estimada": gravidade, "total": n}
+                for (dia, hora, cenario, gravidade), n in sorted(heatmap.items())
+            ])
+
+    @staticmethod
+    async def _upsert(db: AsyncSession, table, rows: list[dict], update_desc: bool = False) -> None:
+        stmt = pg_insert(table).values(rows)
+        updates = {"total": table.total + stmt.excluded.total}
+        if update_desc:
+            updates["cid_desc"] = stmt.excluded.cid_desc
+        keys = [c.name for c in table.__table__.primary_key.columns]
+        await db.execute(stmt.on_conflict_do_update(index_elements=keys, set_=updates))
+
+    @staticmethod
+    async def rebuild(db: AsyncSession) -> dict:
+        """
+        Recomputes every rollup from bi_records in one transaction. bi_records is
+        locked against writes meanwhile so no insert is counted twice or missed.
+        """
+        await db.execute(text("LOCK TABLE bi_records IN SHARE MODE"))
+        for table in (BIRollupHourly, BIRollupDaily, BIRollupHeatmap):
+            await db.execute(delete(table))
+
+        for table, bucket in (
+            (BIRollupHourly, func.date_trunc("hour", BIRecord.timestamp)),
+            (BIRollupDaily, cast(BIRecord.timestamp, Date)),
+        ):
+            source = (
+                select(
+                    bucket, BIRecord.cenario, BIRecord.cid_principal, BIRecord.gravidade_estimada,
+                    func.max(BIRecord.cid_desc), func.count(),
+                )
+                .where(BIRecord.timestamp.is_not(None))
+                .group_by(bucket, BIRecord.cenario, BIRecord.cid_principal, BIRecord.gravidade_estimada)
+            )
+            await db.execute(insert(table).from_select(
+                ["bucket", "cenario", "cid_principal", "gravidade_estimada", "cid_desc", "total"], source
+            ))
+
+        heatmap_source = (
+            select(BIRecord.dia_semana, BIRecord.hora, BIRecord.cenario, BIRecord.gravidade_estimada, func.count())
+            .where(BIRecord.dia_semana.is_not(None), BIRecord.hora.is_not(None))
+            .group_by(BIRecord.dia_semana, BIRecord.hora, BIRecord.cenario, BIRecord.gravidade_estimada)
+        )
+        await db.execute(insert(BIRollupHeatmap).from_select(
+            ["dia_semana", "hora", "cenario", "gravidade_estimada", "total"], heatmap_source
+        ))
+        await db.commit()
+
+        counts = {}
+        for table in (BIRollupHourly, BIRollupDaily, BIRollupHeatmap):
+            counts[table.__tablename__] = (await db.execute(select(func.count()).select_from(table))).scalar()
+        return counts
+
+    # ══════════════════════════════════════════════════════════════
+    # READ PATH
+    # ══════════════════════════════════════════════════════════════
+
+    @staticmethod
+    def _filtered(query, table, cenario: str | None, gravidade: str | None):
+        if cenario:
+            query = query.where(table.cenario == cenario)
+        if gravidade:
+            query = query.where(table.gravidade_estimada == gravidade)
+        return query
+
+    @staticmethod
+    async def timeseries(
+        db: AsyncSession,
+        granularity: str = "day",
+        days: int = 30,
+        cenario: str | None = None,
+        gravidade: str | None = None,
+    ) -> list[dict]:
+        table = BIRollupHourly if granularity == "hour" else BIRollupDaily
+        since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+        if table is BIRollupDaily:
+            since = since.date()
+
+        query = (
+            select(
+                table.bucket,
+                func.sum(table.total),
+                func.coalesce(func.sum(table.total).filter(table.gravidade_estimada == "Grave"), 0),
+            )
+            .where(table.bucket >= since)
+            .group_by(table.bucket)
+            .order_by(table.bucket)
+        )
+        result = await db.execute(BIRollupService._filtered(query, table, cenario, gravidade))
+        return [
+            {"bucket": bucket.isoformat(), "total": total, "graves": graves}
+            for bucket, total, graves in result.all()
+        ]
+
+    @staticmethod
+    async def heatmap(db: AsyncSession, cenario: str | None = None, gravidade: str | None = None) -> list[dict]:
+        query = (
+            select(BIRollupHeatmap.dia_semana, BIRollupHeatmap.hora, func.sum(BIRollupHeatmap.total))
+            .group_by(BIRollupHeatmap.dia_semana, BIRollupHeatmap.hora)
+        )
+        result = await db.execute(BIRollupService._filtered(query, BIRollupHeatmap, cenario, gravidade))
+        return [{"dia_semana": dia, "hora": hora, "total": total} for dia, hora, total in result.all()]
+
+    @staticmethod
+    async def top_cids(
+        db: AsyncSession,
+        limit: int = 10,
+        days: int = 30,
+        cenario: str | None = None,
+        gravidade: str | None = None,
+    ) -> list[dict]:
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).date()
+        total = func.sum(BIRollupDaily.total)
+        query = (
+            select(BIRollupDaily.cid_principal, func.max(BIRollupDaily.cid_desc), total)
+            .where(BIRollupDaily.bucket >= since)
+            .group_by(BIRollupDaily.cid_principal)
+            .order_by(total.desc(), BIRollupDaily.cid_principal)
+            .limit(limit)
+        )
+        result = await db.execute(BIRollupService._filtered(query, BIRollupDaily, cenario, gravidade))
+        return [{"code": code, "desc": desc, "total": n} for code, desc, n in result.all()]
+
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+async def _backfill():
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        counts = await BIRollupService.rebuild(session)
+    for table, n in counts.items():
+        print(f"✅ {table}: {n} rows")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.bi_rollup_service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("backfill", help="rebuild all rollups from bi_records")
+    parser.parse_args(argv)
+    asyncio.run(_backfill())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,34 @@
+import asyncio
+import os
+import time
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
-from app.database import BIRecord
+from app.database import AsyncSessionLocal, BIRecord
+
+# Dashboard numbers may lag other workers' inserts by at most this long
+STATS_TTL = float(os.getenv("BI_STATS_TTL", "5"))
+# Concurrent refreshes share one in-flight query instead of stampeding the DB
+STATS_COALESCE = os.getenv("BI_STATS_COALESCE", "true").lower() == "true"
+
 
 class BIService:
+    _cache: tuple[float, dict] | None = None
+    _inflight: asyncio.Task | None = None
+    _generation = 0
+
     @staticmethod
     async def get_stats(db: AsyncSession):
-        total_result = await db.execute(select(func.count(BIRecord.id)))
-        total = total_result.scalar() or 0
-
-        graves_result = await db.execute(
-            select(func.count(BIRecord.id)).where(BIRecord.gravidade_estimada == "Grave")
+        # All aggregates in one scan
+        aggregates = await db.execute(
+            select(
+                func.count(BIRecord.id),
+                func.count(BIRecord.id).filter(BIRecord.gravidade_estimada == "Grave"),
+                func.count(func.distinct(BIRecord.cenario)),
+                func.count(func.distinct(BIRecord.cid_principal)),
+            )
         )
-        graves = graves_result.scalar() or 0
-
-        cenarios_result = await db.execute(select(func.count(func.distinct(BIRecord.cenario))))
-        cenarios = cenarios_result.scalar() or 0
-
-        cids_result = await db.execute(select(func.count(func.distinct(BIRecord.cid_principal))))
-        cids = cids_result.scalar() or 0
+        total, graves, cenarios, cids = aggregates.one()
 
         records_result = await db.execute(
             select(BIRecord).order_by(BIRecord.timestamp.desc()).limit(200)
@@ -25,6 +36,41 @@ class BIService:
         records = records_result.scalars().all()
 
         return {
-            "stats": {"total": total, "graves": graves, "cenarios": cenarios, "cids": cids},
+            "stats": {"total": total or 0, "graves": graves or 0, "cenarios": cenarios or 0, "cids": cids or 0},
             "records": records
         }
+
+    @staticmethod
+    async def get_stats_cached():
+        """
+        get_stats behind an in-process TTL cache, invalidated by invalidate_stats().
+        Uses its own session so a coalesced query outlives the request that started it.
+        """
+        cached = BIService._cache
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        if not STATS_COALESCE:
+            return await BIService._load_stats()
+
+        if BIService._inflight is None or BIService._inflight.done():
+            BIService._inflight = asyncio.create_task(BIService._load_stats())
+        # shield: one cancelled client must not cancel the query the others wait on
+        return await asyncio.shield(BIService._inflight)
+
+    @staticmethod
+    async def _load_stats():
+        generation = BIService._generation
+        async with AsyncSessionLocal() as session:
+            data = await BIService.get_stats(session)
+        # An insert landed while we were querying: serve, but don't cache
+        if generation == BIService._generation:
+            BIService._cache = (time.monotonic() + STATS_TTL, data)
+        return data
+
+    @staticmethod
+    def invalidate_stats():
+        """Call after committing new BIRecords."""
+        BIService._generation += 1
+        BIService._cache = None
+        BIService._inflight = None
@@ -0,0 +1,130 @@
+"""
+app/services/cid_search_service.py — CID-10 Autocomplete
+In-memory prefix + trigram index over the CID codes known to the SOAP engine.
+Accent-insensitive; built once at import, read-only afterwards (safe to share).
+"""
+
+import bisect
+from functools import lru_cache
+
+from services.soap_engine import CID_DATABASE, CID_INDEX
+from services.text_analysis import fold
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+# Ranking tiers (lower is better)
+_EXACT_CODE, _CODE_PREFIX, _TERM_PREFIX, _WORD_PREFIX, _ALL_WORDS, _SUBSTRING = range(6)
+
+
+class _CidSearchIndex:
+    def __init__(self, entries: list[tuple[str, str, list[str]]]):
+        # entry = (code, desc, searchable folded terms)
+        self.entries: list[tuple[str, str]] = []
+        self.terms: list[list[str]] = []
+        self.codes: list[str] = []
+        prefixes: list[tuple[str, int]] = []
+        self.trigrams: dict[str, set[int]] = {}
+
+        for entry_id, (code, desc, synonyms) in enumerate(entries):
+            self.entries.append((code, desc))
+            self.codes.append(fold(code))
+            terms = list(dict.fromkeys(fold(t) for t in (desc, *synonyms)))
+            self.terms.append(terms)
+            for term in (self.codes[-1], *terms):
+                for gram in _trigrams(term):
+                    self.trigrams.setdefault(gram, set()).add(entry_id)
+                # Every word start is a prefix entry point
+                for i, char in enumerate(term):
+                    if i == 0 or (not term[i - 1].isalnum() and char.isalnum()):
+                        prefixes.append((term[i:], entry_id))
+
+        prefixes.sort()
+        self.prefix_keys = [p for p, _ in prefixes]
+        self.prefix_ids = [i for _, i in prefixes]
+
+    def _prefix_candidates(self, q: str) -> set[int]:
+        lo = bisect.bisect_left(self.prefix_keys, q)
+        hi = bisect.bisect_left(self.prefix_keys, q + "\uffff")
+        return set(self.prefix_ids[lo:hi])
+
+    def _substring_candidates(self, q: str) -> set[int]:
+        grams = sorted(_trigrams(q), key=lambda g: len(self.trigrams.get(g, ())))
+        if not grams:
+            return set()
+        candidates = set(self.trigrams.get(grams[0], ()))
+        for gram in grams[1:]:
+            if not candidates:
+                break
+            candidates &= self.trigrams.get(gram, set())
+        return candidates
+
+    def _rank(self, entry_id: int, q: str, words: list[str]) -> int | None:
+        code = self.codes[entry_id]
+        if code == q or code.replace(".", "") == q.replace(".", ""):
+            return _EXACT_CODE
+        if code.startswith(q) or code.replace(".", "").startswith(q):
+            return _CODE_PREFIX
+        terms = self.terms[entry_id]
+        if any(t.startswith(q) for t in terms):
+            return _TERM_PREFIX
+        if any(f" {q}" in f" {t}" for t in terms):
+            return _WORD_PREFIX
+        if len(words) > 1 and all(any(f" {w}" in f" {t}" for t in terms) for w in words):
+            return _ALL_WORDS
+        if any(q in t for t in (code, *terms)):
+            return _SUBSTRING
+        return None
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        q = fold(query.strip())
+        if not q:
+            return []
+
+        candidates = self._prefix_candidates(q)
+        if len(q) >= 3:
+            candidates |= self._substring_candidates(q)
+
+        # "insuf resp" → every word must start a word of the same entry
+        words = q.split()
+        if len(words) > 1:
+            candidates |= set.intersection(*(self._prefix_candidates(w) for w in words))
+
+        ranked = []
+        for entry_id in candidates:
+            tier = self._rank(entry_id, q, words)
+            if tier is not None:
+                code, desc = self.entries[entry_id]
+                ranked.append((tier, len(desc), code, desc))
+        ranked.sort()
+
+        return [{"code": code, "desc": desc} for _, _, code, desc in ranked[:limit]]
+
+
+def _collect_entries() -> list[tuple[str, str, list[str]]]:
+    """Unique (code, desc) pairs; engine keywords become synonyms."""
+    grouped: dict[tuple[str, str], list[str]] = {}
+    for keyword, info in CID_DATABASE.items():
+        grouped.setdefault((info["code"], info["desc"]), []).append(keyword)
+    if CID_INDEX is not None:
+        for idx in range(len(CID_INDEX)):
+            info = CID_INDEX.code_at(idx)
+            grouped.setdefault((info["code"], info["desc"]), [])
+    return [(code, desc, synonyms) for (code, desc), synonyms in grouped.items()]
+
+
+_INDEX = _CidSearchIndex(_collect_entries())
+
+
+class CidSearchService:
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _cached_search(query: str, limit: int) -> tuple[dict, ...]:
+        return tuple(_INDEX.search(query, limit))
+
+    @staticmethod
+    def search(query: str, limit: int = 10) -> list[dict]:
+        # Copies so callers cannot mutate cached results
+        return [dict(r) for r in CidSearchService._cached_search(query, limit)]
@@ -0,0 +1,169 @@
+"""
+app/services/cold_storage.py — Compressed Cold Columns
+Medical Scribe Enterprise v3.0
+Dictionary management and maintenance for consultation_cold (zstd blobs of
+transcript, dialog, SOAP and documents; codec in app/compression.py).
+
+    python -m app.services.cold_storage train        # train a dictionary on stored payloads
+    python -m app.services.cold_storage recompress   # rewrite rows with the newest dictionary
+    python -m app.services.cold_storage stats
+"""
+
+import argparse
+import asyncio
+import os
+
+import zstandard
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.compression import COLD_COLUMNS, cold_codec
+from app.database import AsyncSessionLocal, CompressionDictionary, ConsultationColdData, init_db
+
+DICT_SIZE = int(os.getenv("COLD_DICT_SIZE", str(112 * 1024)))
+_MIN_SAMPLES = 32
+_BATCH = 500
+
+
+class ColdStorage:
+
+    # ══════════════════════════════════════════════════════════════
+    # DICTIONARIES
+    # ══════════════════════════════════════════════════════════════
+
+    @staticmethod
+    async def load_dictionaries(db: AsyncSession | None = None) -> int | None:
+        """Registers every stored dictionary and activates the newest. Returns its ID."""
+        if db is None:
+            async with AsyncSessionLocal() as session:
+                return await ColdStorage.load_dictionaries(session)
+        result = await db.execute(
+            select(CompressionDictionary.id, CompressionDictionary.data)
+            .order_by(CompressionDictionary.created_at, CompressionDictionary.id)
+        )
+        rows = result.all()
+        for i, (dict_id, data) in enumerate(rows):
+            cold_codec.register(dict_id, data, activate=i == len(rows) - 1)
+        return cold_codec.active_dict_id
+
+    @staticmethod
+    async def ensure_dictionaries(db: AsyncSession, dict_ids) -> None:
+        """Loads dictionaries another worker trained after this one started."""
+        missing = {d for d in dict_ids if not cold_codec.knows(d)}
+        if not missing:
+            return
+        result = await db.execute(
+            select(CompressionDictionary.id, CompressionDictionary.data).where(CompressionDictionary.id.in_(missing))
+        )
+        for dict_id, data in result.all():
+            cold_codec.register(dict_id, data)
+
+    @staticmethod
+    async def train(db: AsyncSession, samples: int = 2000, size: int = DICT_SIZE) -> dict:
+        """
+        Trains a dictionary on a random sample of stored payloads (every cold
+        column of each sampled consultation is one training sample) and makes
+        it the active one. Existing rows keep their dictionary until recompressed.
+        """
+        result = await db.execute(
+            select(ConsultationColdData.dict_id, *(getattr(ConsultationColdData, c) for c in COLD_COLUMNS))
+            .order_by(func.random())
+            .limit(samples)
+        )
+        rows = result.all()
+        await ColdStorage.ensure_dictionaries(db, {row[0] for row in rows})
+        data = [
+            raw
+            for dict_id, *blobs in rows
+            for blob in blobs
+            if (raw := cold_codec.decompress(dict_id, blob))
+        ]
+        if len(data) < _MIN_SAMPLES:
+            raise ValueError(f"Amostras insuficientes para treinar o dicionário ({len(data)} < {_MIN_SAMPLES})")
+
+        zdict = zstandard.train_dictionary(size, data)
+        dict_id = zdict.dict_id()
+        db.add(CompressionDictionary(id=dict_id, data=zdict.as_bytes(), samples=len(data)))
+        await db.commit()
+        cold_codec.register(dict_id, zdict.as_bytes(), activate=True)
+        return {"dict_id": dict_id, "samples": len(data), "bytes": len(zdict.as_bytes())}
+
+    # ══════════════════════════════════════════════════════════════
+    # MAINTENANCE
+    # ══════════════════════════════════════════════════════════════
+
+    @staticmethod
+    async def recompress(db: AsyncSession) -> int:
+        """Rewrites rows compressed with an older (or no) dictionary using the active one."""
+        active = cold_codec.active_dict_id
+        if active is None:
+            return 0
+        rewritten, last_id = 0, 0
+        while True:
+            result = await db.execute(
+                select(ConsultationColdData.consultation_id, ConsultationColdData.created_at,
+                       ConsultationColdData.dict_id, *(getattr(ConsultationColdData, c) for c in COLD_COLUMNS))
+                .where(ConsultationColdData.consultation_id > last_id,
+                       ConsultationColdData.dict_id.is_distinct_from(active))
+                .order_by(ConsultationColdData.consultation_id)
+                .limit(_BATCH)
+            )
+            rows = result.all()
+            if not rows:
+                return rewritten
+            await ColdStorage.ensure_dictionaries(db, {row[2] for row in rows})
+            for consultation_id, created_at, dict_id, *blobs in rows:
+                payloads = {c: cold_codec.decode(c, dict_id, b) for c, b in zip(COLD_COLUMNS, blobs)}
+                await db.execute(
+                    update(ConsultationColdData)
+                    .where(ConsultationColdData.consultation_id == consultation_id,
+                           ConsultationColdData.created_at == created_at)
+                    .values(**cold_codec.compress_row(payloads))
+                )
+            await db.commit()
+            rewritten += len(rows)
+            last_id = rows[-1][0]
+
+    @staticmethod
+    async def stats(db: AsyncSession) -> dict:
+        sizes = [func.coalesce(func.sum(func.octet_length(getattr(ConsultationColdData, c))), 0) for c in COLD_COLUMNS]
+        result = await db.execute(select(func.count(), *sizes))
+        rows, *compressed = result.one()
+        dictionaries = (await db.execute(select(func.count()).select_from(CompressionDictionary))).scalar()
+        return {
+            "rows": rows,
+            "compressed_bytes": dict(zip(COLD_COLUMNS, compressed)),
+            "dictionaries": dictionaries,
+            "active_dict_id": cold_codec.active_dict_id,
+        }
+
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+async def _run(args):
+    await init_db()
+    async with AsyncSessionLocal() as session:
+        await ColdStorage.load_dictionaries(session)
+        if args.command == "train":
+            print(f"✅ dictionary trained: {await ColdStorage.train(session, args.samples, args.size)}")
+        elif args.command == "recompress":
+            print(f"✅ {await ColdStorage.recompress(session)} rows recompressed")
+        else:
+            print(await ColdStorage.stats(session))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.cold_storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="train and activate a new zstd dictionary")
+    train.add_argument("--samples", type=int, default=2000, help="consultations to sample")
+    train.add_argument("--size", type=int, default=DICT_SIZE, help="dictionary size in bytes")
+    sub.add_parser("recompress", help="rewrite rows with the active dictionary")
+    sub.add_parser("stats", help="row count and compressed bytes per column")
+    asyncio.run(_run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,173 @@
+import base64
+import json
+from datetime import datetime
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.database import ConsultationRecord
+from sqlalchemy import select, text, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import joinedload, load_only, undefer_group
+from app.database import ConsultationColdData, ConsultationRecord
+from app.services.archive_service import consultation_archive
+from app.services.cold_storage import ColdStorage
+
+
+# Columns the list view serializes; everything else (JSON sections, and the
+# compressed transcript / dialog / SOAP / documents) is never fetched for a list page.
+SUMMARY_COLUMNS = (
+    ConsultationRecord.id,
+    ConsultationRecord.iniciais,
+    ConsultationRecord.paciente_id,
+    ConsultationRecord.idade,
+    ConsultationRecord.cenario_atendimento,
+    ConsultationRecord.cid_principal_code,
+    ConsultationRecord.cid_principal_desc,
+    ConsultationRecord.gravidade,
+    ConsultationRecord.sinais_vitais,
+    ConsultationRecord.total_falas,
+    ConsultationRecord.created_at,
+)
+
+# Deferred column groups (see ConsultationRecord) served by the detail view
+DETAIL_GROUPS = ("soap", "universal", "clinical", "dialog", "documents")
+
+# Groups stored compressed in consultation_cold rather than in consultations
+COLD_GROUPS = {
+    "soap": ConsultationColdData.soap_json,
+    "dialog": ConsultationColdData.dialog_json,
+    "documents": ConsultationColdData.documents_json,
+    "transcript": ConsultationColdData.texto_transcrito,
+}
+
+
+def encode_cursor(created_at: datetime, consultation_id: int) -> str:
+    """Opaque keyset cursor: position of the last row of a page."""
+    raw = json.dumps([created_at.isoformat(), consultation_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, consultation_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(consultation_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor inválido") from e
+
 
 class ConsultationService:
+    @staticmethod
+    def _filtered(query, cenario: str | None, gravidade: str | None):
+        if cenario:
+            query = query.where(ConsultationRecord.cenario_atendimento == cenario)
+        if gravidade:
+            query = query.where(ConsultationRecord.gravidade == gravidade)
+        return query
+
     @staticmethod
     async def get_consultations(
         db: AsyncSession,
         limit: int = 20,
         offset: int = 0,
         cenario: str | None = None,
-        gravidade: str | None = None
+        gravidade: str | None = None,
+        cursor: str | None = None,
     ):
-        query = select(ConsultationRecord).order_by(ConsultationRecord.created_at.desc())
+        """
+        Newest first, keyset-paginated on (created_at, id), summary columns only
+        (heavy columns are not loaded — accessing them on these objects fails).
+        Returns (records, next_cursor); next_cursor is None on the last page.
+        `offset` is honoured only without a cursor (legacy clients).
+        """
+        query = select(ConsultationRecord).options(load_only(*SUMMARY_COLUMNS, raiseload=True))
+        query = ConsultationService._filtered(query, cenario, gravidade)
+        query = query.order_by(ConsultationRecord.created_at.desc(), ConsultationRecord.id.desc())
 
-        if cenario:
-            query = query.where(ConsultationRecord.cenario_atendimento == cenario)
-        if gravidade:
-            query = query.where(ConsultationRecord.gravidade == gravidade)
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(ConsultationRecord.created_at, ConsultationRecord.id) < (cursor_created_at, cursor_id),
+                # Implied by the row comparison, but only a plain bound lets the planner prune partitions
+                ConsultationRecord.created_at <= cursor_created_at,
+            )
+        elif offset:
+            query = query.offset(offset)
+
+        # One extra row tells whether another page exists
+        result = await db.execute(query.limit(limit + 1))
+        records = result.scalars().all()
 
-        query = query.offset(offset).limit(limit)
-        result = await db.execute(query)
-        return result.scalars().all()
+        next_cursor = None
+        if len(records) > limit:
+            records = records[:limit]
+            last = records[-1]
+            next_cursor = encode_cursor(last.created_at, last.id)
+        return records, next_cursor
+
+    @staticmethod
+    async def approximate_count(db: AsyncSession, cenario: str | None = None, gravidade: str | None = None) -> int:
+        """
+        Planner estimate instead of COUNT(*): constant time at any table size.
+        Unfiltered → sum of the partitions' pg_class.reltuples; filtered → EXPLAIN row estimate.
+        """
+        if not cenario and not gravidade:
+            # The partitioned parent has no reltuples of its own (-1 = never analyzed)
+            result = await db.execute(text(
+                "SELECT sum(greatest(c.reltuples, 0))::bigint FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = 'consultations'::regclass"
+            ))
+            return max(result.scalar() or 0, 0)
+
+        query = ConsultationService._filtered(select(ConsultationRecord.id), cenario, gravidade)
+        # literal_binds escapes the filter values; EXPLAIN cannot take bind parameters
+        sql = str(query.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+        result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    @staticmethod
+    def _load_groups(groups) -> list:
+        """Loader options: undefer hot groups, join just the requested cold blobs."""
+        options = [undefer_group(g) for g in groups if g not in COLD_GROUPS]
+        cold = [COLD_GROUPS[g] for g in groups if g in COLD_GROUPS]
+        if cold:
+            options.append(
+                joinedload(ConsultationRecord.cold).load_only(ConsultationColdData.dict_id, *cold, raiseload=True)
+            )
+        return options
+
+    @staticmethod
+    async def _fetch(db: AsyncSession, query, groups):
+        result = await db.execute(query.options(*ConsultationService._load_groups(groups)))
+        record = result.scalar_one_or_none()
+        if record is not None and any(g in COLD_GROUPS for g in groups) and record.cold is not None:
+            # Blobs decompress on attribute access; their dictionary must be registered
+            await ColdStorage.ensure_dictionaries(db, {record.cold.dict_id})
+        return record
+
+    @staticmethod
+    async def get_consultation_by_id(db: AsyncSession, consultation_id: int, groups=DETAIL_GROUPS):
+        """
+        Scalar columns plus the requested deferred groups; the rest stay unloaded.
+        Falls back to the Parquet archive (an ArchivedConsultation) once the row left Postgres.
+        """
+        query = select(ConsultationRecord).where(ConsultationRecord.id == consultation_id)
+        record = await ConsultationService._fetch(db, query, groups)
+        if record is None:
+            return await consultation_archive.get(consultation_id, groups)
+        return record
 
     @staticmethod
-    async def get_consultation_by_id(db: AsyncSession, consultation_id: int):
-        result = await db.execute(
-            select(ConsultationRecord).where(ConsultationRecord.id == consultation_id)
+    async def get_consultation_section(db: AsyncSession, consultation_id: int, groups: str | tuple, *columns):
+        """Just the primary key, `columns` and the given deferred group(s) — for sub-resource endpoints."""
+        groups = [groups] if isinstance(groups, str) else list(groups)
+        query = (
+            select(ConsultationRecord)
+            .where(ConsultationRecord.id == consultation_id)
+            .options(load_only(ConsultationRecord.id, *columns, raiseload=True))
         )
-        return result.scalar_one_or_none()
+        record = await ConsultationService._fetch(db, query, groups)
+        if record is None:
+            return await consultation_archive.get(consultation_id, groups)
+        return record
@@ -0,0 +1,275 @@
+"""
+app/services/export_service.py — Streaming Research Export
+Medical Scribe Enterprise v3.0
+bi_records and anonymized consultations as NDJSON / CSV / Parquet, read with a
+server-side cursor and emitted chunk by chunk: constant memory per export.
+Archived consultation months (app/services/archive_service.py) are streamed
+from their Parquet files ahead of the rows still in Postgres.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, BIRecord, ConsultationRecord
+from app.services.archive_service import ARCHIVE_JSON_COLUMNS, consultation_archive, naive_utc
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Rows fetched per server-side cursor round trip (and per Parquet row group)
+CHUNK_ROWS = 2000
+
+
+class _ExportSpec:
+    """Column list + row shaping + Parquet types for one export."""
+
+    def __init__(self, columns: list[tuple[str, str]], query_columns: list, shape: Callable[[tuple], dict]):
+        self.columns = columns  # (name, arrow type: int|str|float|timestamp|list)
+        self.query_columns = query_columns
+        self.shape = shape
+
+
+def _iso(value: datetime | None) -> str | None:
+    return value.isoformat() if value else None
+
+
+def _json(value) -> str | None:
+    return json.dumps(value, ensure_ascii=False) if value is not None else None
+
+
+BI_EXPORT = _ExportSpec(
+    columns=[
+        ("id", "int"), ("timestamp", "timestamp"), ("cenario", "str"), ("cid_principal", "str"),
+        ("cid_desc", "str"), ("gravidade_estimada", "str"), ("hora", "int"), ("dia_semana", "str"),
+        ("sinais_vitais", "str"),
+    ],
+    query_columns=[
+        BIRecord.id, BIRecord.timestamp, BIRecord.cenario, BIRecord.cid_principal, BIRecord.cid_desc,
+        BIRecord.gravidade_estimada, BIRecord.hora, BIRecord.dia_semana, BIRecord.sinais_vitais,
+    ],
+    shape=lambda r: {
+        "id": r[0], "timestamp": r[1], "cenario": r[2], "cid_principal": r[3], "cid_desc": r[4],
+        "gravidade_estimada": r[5], "hora": r[6], "dia_semana": r[7], "sinais_vitais": _json(r[8]),
+    },
+)
+
+# No initials, patient id, transcript, dialog or documents (free text may identify the patient)
+CONSULTATION_EXPORT = _ExportSpec(
+    columns=[
+        ("id", "int"), ("created_at", "timestamp"), ("idade", "int"), ("cenario_atendimento", "str"),
+        ("cid_principal_code", "str"), ("cid_principal_desc", "str"), ("gravidade", "str"),
+        ("sinais_vitais", "str"), ("medicacoes_atuais", "list"), ("alergias", "list"),
+        ("comorbidades", "list"), ("total_falas", "int"), ("falas_medico", "int"), ("falas_paciente", "int"),
+    ],
+    query_columns=[
+        ConsultationRecord.id, ConsultationRecord.created_at, ConsultationRecord.idade,
+        ConsultationRecord.cenario_atendimento, ConsultationRecord.cid_principal_code,
+        ConsultationRecord.cid_principal_desc, ConsultationRecord.gravidade, ConsultationRecord.sinais_vitais,
+        ConsultationRecord.clinical_data_json, ConsultationRecord.total_falas,
+        ConsultationRecord.falas_medico, ConsultationRecord.falas_paciente,
+    ],
+    shape=lambda r: {
+        "id": r[0], "created_at": r[1], "idade": r[2], "cenario_atendimento": r[3],
+        "cid_principal_code": r[4], "cid_principal_desc": r[5], "gravidade": r[6],
+        "sinais_vitais": _json(r[7]),
+        "medicacoes_atuais": (r[8] or {}).get("medicacoes_atuais", []),
+        "alergias": (r[8] or {}).get("alergias", []),
+        "comorbidades": (r[8] or {}).get("comorbidades", []),
+        "total_falas": r[9], "falas_medico": r[10], "falas_paciente": r[11],
+    },
+)
+
+
+# ══════════════════════════════════════════════════════════════
+# ENCODERS — rows in, bytes out, one chunk at a time
+# ══════════════════════════════════════════════════════════════
+
+class _NdjsonEncoder:
+    def __init__(self, spec: _ExportSpec):
+        self.spec = spec
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, rows: list[dict]) -> bytes:
+        return "".join(
+            json.dumps({k: _iso(v) if isinstance(v, datetime) else v for k, v in row.items()}, ensure_ascii=False)
+            + "\n"
+            for row in rows
+        ).encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _CsvEncoder:
+    def __init__(self, spec: _ExportSpec):
+        self.names = [name for name, _ in spec.columns]
+        self.lists = {name for name, kind in spec.columns if kind == "list"}
+
+    def header(self) -> bytes:
+        return self._write([self.names])
+
+    def encode(self, rows: list[dict]) -> bytes:
+        return self._write(
+            [
+                _iso(v) if isinstance(v, datetime) else "; ".join(v) if k in self.lists else v
+                for k, v in ((name, row[name]) for name in self.names)
+            ]
+            for row in rows
+        )
+
+    @staticmethod
+    def _write(rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode()
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain()."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class _ParquetEncoder:
+    """One row group per chunk; the footer is written by close()."""
+
+    def __init__(self, spec: _ExportSpec):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        types = {
+            "int": pa.int64(), "str": pa.string(), "float": pa.float64(),
+            "timestamp": pa.timestamp("us"), "list": pa.list_(pa.string()),
+        }
+        self._pa = pa
+        self.schema = pa.schema([(name, types[kind]) for name, kind in spec.columns])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+
+    def header(self) -> bytes:
+        return self.sink.drain()
+
+    def encode(self, rows: list[dict]) -> bytes:
+        self.writer.write_table(self._pa.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+_ENCODERS = {"ndjson": _NdjsonEncoder, "csv": _CsvEncoder, "parquet": _ParquetEncoder}
+
+
+# ══════════════════════════════════════════════════════════════
+# SERVICE
+# ══════════════════════════════════════════════════════════════
+
+class ExportService:
+    @staticmethod
+    def _bi_query(since: datetime | None, until: datetime | None, cenario: str | None):
+        query = select(*BI_EXPORT.query_columns).order_by(BIRecord.id)
+        if since:
+            query = query.where(BIRecord.timestamp >= since)
+        if until:
+            query = query.where(BIRecord.timestamp < until)
+        if cenario:
+            query = query.where(BIRecord.cenario == cenario)
+        return query
+
+    @staticmethod
+    def _consultation_query(since: datetime | None, until: datetime | None, cenario: str | None):
+        query = select(*CONSULTATION_EXPORT.query_columns).order_by(ConsultationRecord.id)
+        if since:
+            query = query.where(ConsultationRecord.created_at >= since)
+        if until:
+            query = query.where(ConsultationRecord.created_at < until)
+        if cenario:
+            query = query.where(ConsultationRecord.cenario_atendimento == cenario)
+        return query
+
+    @staticmethod
+    def encoder(spec: _ExportSpec, fmt: str):
+        """Built eagerly so a missing Parquet engine fails before the response starts."""
+        return _ENCODERS[fmt](spec)
+
+    @staticmethod
+    async def _archived_rows(spec: _ExportSpec, since, until, cenario) -> AsyncIterator[list[tuple]]:
+        """Archive rows shaped like `spec.query_columns` results (JSON decoded)."""
+        names = [column.key for column in spec.query_columns]
+        json_names = [name for name in names if name in ARCHIVE_JSON_COLUMNS]
+        async for rows in consultation_archive.scan(names, since, until, cenario):
+            for row in rows:
+                for name in json_names:
+                    if row[name] is not None:
+                        row[name] = json.loads(row[name])
+            yield [tuple(row[name] for name in names) for row in rows]
+
+    @staticmethod
+    async def stream(query, spec: _ExportSpec, encoder, archive_window=None) -> AsyncIterator[bytes]:
+        """
+        Runs `query` on a server-side cursor (its own session: the request's
+        session is gone once streaming starts) and yields encoded chunks;
+        archived rows in `archive_window` (since, until, cenario) come first.
+        """
+        header = encoder.header()
+        if header:
+            yield header
+        if archive_window is not None:
+            async for rows in ExportService._archived_rows(spec, *archive_window):
+                yield encoder.encode([spec.shape(row) for row in rows])
+        async with AsyncSessionLocal() as session:
+            result = await session.stream(query.execution_options(yield_per=CHUNK_ROWS))
+            async for partition in result.partitions(CHUNK_ROWS):
+                yield encoder.encode([spec.shape(row) for row in partition])
+        tail = encoder.close()
+        if tail:
+            yield tail
+
+    @staticmethod
+    def bi_records(fmt: str, since=None, until=None, cenario=None) -> AsyncIterator[bytes]:
+        # Normalized here, not in the generator: a bad bound must fail before the 200 is sent
+        since, until = naive_utc(since), naive_utc(until)
+        encoder = ExportService.encoder(BI_EXPORT, fmt)
+        return ExportService.stream(ExportService._bi_query(since, until, cenario), BI_EXPORT, encoder)
+
+    @staticmethod
+    def consultations(fmt: str, since=None, until=None, cenario=None) -> AsyncIterator[bytes]:
+        since, until = naive_utc(since), naive_utc(until)
+        encoder = ExportService.encoder(CONSULTATION_EXPORT, fmt)
+        return ExportService.stream(
+            ExportService._consultation_query(since, until, cenario), CONSULTATION_EXPORT, encoder,
+            archive_window=(since, until, cenario),
+        )
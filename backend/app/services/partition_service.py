@@ -0,0 +1,249 @@
+"""
+app/services/partition_service.py — Monthly Partitions & Retention
+Medical Scribe Enterprise v3.0
+consultations / consultation_cold (by created_at) and bi_records (by
+timestamp) are range-partitioned by calendar month (migration 0003).
+This keeps PARTITION_PREMAKE_MONTHS of partitions ready ahead of time,
+moves months past ARCHIVE_AFTER_MONTHS to Parquet (app/services/archive_service.py)
+and enforces retention by dropping whole months: no giant DELETEs, no bloat.
+
+One worker at a time does the work (transaction-level advisory lock); the
+others skip the round. Also runnable by hand / from cron:
+    python -m app.services.partition_service maintain
+    python -m app.services.partition_service list
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.database import engine, init_db
+
+logger = logging.getLogger("medical-scribe")
+
+# Partitioned table → partition key column
+PARTITIONED_TABLES = {
+    "consultations": "created_at",
+    "consultation_cold": "created_at",
+    "bi_records": "timestamp",
+}
+# consultation_cold always follows consultations (same months, same retention)
+RETENTION_SOURCE = {"consultations": "consultations", "consultation_cold": "consultations", "bi_records": "bi_records"}
+
+PREMAKE_MONTHS = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+MAINTENANCE_HOURS = float(os.getenv("PARTITION_MAINTENANCE_HOURS", "6"))
+# Months of data kept per table family; 0 keeps everything
+RETENTION_MONTHS = {
+    "consultations": int(os.getenv("CONSULTATION_RETENTION_MONTHS", "0")),
+    "bi_records": int(os.getenv("BI_RETENTION_MONTHS", "0")),
+}
+
+_LOCK_KEY = 0x6D730002
+_BOUNDS_RE = re.compile(r"FROM \('(\d{4}-\d{2}-\d{2})[^']*'\) TO \('(\d{4}-\d{2}-\d{2})[^']*'\)")
+
+
+# ══════════════════════════════════════════════════════════════
+# MONTH ARITHMETIC + DDL (also used by the migrations)
+# ══════════════════════════════════════════════════════════════
+
+def month_start(day: date | datetime) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+# ══════════════════════════════════════════════════════════════
+# SERVICE
+# ══════════════════════════════════════════════════════════════
+
+class PartitionService:
+
+    @staticmethod
+    async def partitions(conn: AsyncConnection, table: str) -> list[dict]:
+        """Monthly partitions of `table`, oldest first."""
+        result = await conn.execute(text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:table AS regclass)"
+        ), {"table": table})
+        partitions = []
+        for name, bound in result.all():
+            match = _BOUNDS_RE.search(bound or "")
+            if match:
+                partitions.append({
+                    "name": name,
+                    "start": date.fromisoformat(match.group(1)),
+                    "end": date.fromisoformat(match.group(2)),
+                })
+        return sorted(partitions, key=lambda p: p["start"])
+
+    @staticmethod
+    async def ensure(conn: AsyncConnection, ahead: int = PREMAKE_MONTHS, today: date | None = None) -> list[str]:
+        """Creates the current month's partitions and `ahead` more. Returns the ones created."""
+        current = month_start(today or _today())
+        created = []
+        for table in PARTITIONED_TABLES:
+            existing = {p["start"] for p in await PartitionService.partitions(conn, table)}
+            for n in range(ahead + 1):
+                month = add_months(current, n)
+                if month not in existing:
+                    await conn.execute(text(create_partition_sql(table, month)))
+                    created.append(partition_name(table, month))
+        return created
+
+    @staticmethod
+    async def drop_before(conn: AsyncConnection, table: str, cutoff: date) -> list[str]:
+        """Drops every partition of `table` that ends on or before `cutoff`."""
+        dropped = []
+        for partition in await PartitionService.partitions(conn, table):
+            if partition["end"] <= cutoff:
+                await conn.execute(text(f"DROP TABLE {partition['name']}"))
+                dropped.append(partition["name"])
+        return dropped
+
+    @staticmethod
+    async def apply_retention(conn: AsyncConnection, today: date | None = None) -> list[str]:
+        """Drops whole months older than each table's retention window."""
+        current = month_start(today or _today())
+        dropped = []
+        for table, source in RETENTION_SOURCE.items():
+            months = RETENTION_MONTHS[source]
+            if months > 0:
+                dropped += await PartitionService.drop_before(conn, table, add_months(current, -months))
+        return dropped
+
+    @staticmethod
+    async def maintain(today: date | None = None, archive: bool = True) -> dict:
+        """ensure() + archive + apply_retention() in one transaction, by one worker at a time."""
+        # archive_service builds on this module
+        from app.services.archive_service import ArchiveService, consultation_archive
+
+        staged, recovered, expired = [], [], []
+        async with engine.begin() as conn:
+            locked = (await conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _LOCK_KEY})).scalar()
+            if not locked:
+                return {"skipped": True}
+            created = await PartitionService.ensure(conn, today=today)
+            if archive:
+                recovered = await ArchiveService.recover_staged(conn)
+                staged = await ArchiveService.archive(conn, today=today)
+            dropped = await PartitionService.apply_retention(conn, today=today)
+        # Published only once the DROPs have committed. If the commit fails the
+        # staged months stay invisible and the next round's recover_staged()
+        # settles them against the partitions that actually exist.
+        for month in staged:
+            await asyncio.to_thread(month.publish)
+        archived = [str(month) for month in staged] + [f"{month} (recovered)" for month in recovered]
+        if archive:
+            expired = await ArchiveService.apply_retention(today=today)
+        if archived or expired:
+            await asyncio.to_thread(consultation_archive.load)
+        if created or archived or dropped or expired:
+            logger.info(
+                f"🗓️ Partitions: created={created} archived={archived} dropped={dropped} archive_expired={expired}"
+            )
+        return {"skipped": False, "created": created, "archived": archived, "dropped": dropped, "expired": expired}
+
+
+class PartitionMaintenance:
+    """Background loop running PartitionService.maintain() every MAINTENANCE_HOURS."""
+
+    def __init__(self, interval_hours: float = MAINTENANCE_HOURS):
+        self.interval = interval_hours * 3600
+        self._task: asyncio.Task | None = None
+        self.runs = 0
+        self.last_run: str | None = None
+        self.last_result: dict | None = None
+        self.last_error: str | None = None
+
+    async def start(self) -> None:
+        # Partitions inline (the current month must exist before requests
+        # arrive); archiving, which may take a while, in the first loop round
+        await self._run_once(archive=False)
+        if self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await self._run_once()
+            await asyncio.sleep(self.interval)
+
+    async def _run_once(self, archive: bool = True) -> None:
+        try:
+            self.last_result = await PartitionService.maintain(archive=archive)
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Partition maintenance failed: {e}", exc_info=True)
+        self.runs += 1
+        self.last_run = datetime.now(timezone.utc).isoformat()
+
+    def stats(self) -> dict:
+        return {
+            "runs": self.runs,
+            "last_run": self.last_run,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "premake_months": PREMAKE_MONTHS,
+            "retention_months": RETENTION_MONTHS,
+        }
+
+
+partition_maintenance = PartitionMaintenance()
+
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+async def _run(command: str):
+    await init_db()
+    if command == "maintain":
+        print(f"✅ {await PartitionService.maintain()}")
+    else:
+        async with engine.connect() as conn:
+            for table in PARTITIONED_TABLES:
+                for p in await PartitionService.partitions(conn, table):
+                    print(f"{table:<18} {p['name']:<32} {p['start']} → {p['end']}")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m app.services.partition_service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("maintain", help="create upcoming partitions and apply retention")
+    sub.add_parser("list", help="show every monthly partition")
+    asyncio.run(_run(parser.parse_args(argv).command))
+
+
+if __name__ == "__main__":
+    main()
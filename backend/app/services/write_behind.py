@@ -0,0 +1,455 @@
+"""
+app/services/write_behind.py — Write-Behind Persistence (optional)
+Medical Scribe Enterprise v3.0
+With WRITE_BEHIND=true, /api/analyze answers as soon as the result is in a
+local fsync'd append-only outbox; a background writer group-commits the
+outbox to Postgres.
+
+Guarantees:
+- Durable before acknowledged: the response is sent only after fsync.
+- No double inserts: IDs are pre-allocated from the consultations sequence;
+  the writer inserts with ON CONFLICT DO NOTHING and writes BI rows / rollups
+  only for consultations that statement actually inserted, in one transaction.
+- Crash recovery: segments are replayed on startup and deleted only once
+  every entry in them is committed. A failed append is cut off (truncate,
+  then a fresh segment) so nothing acknowledged ever sits behind a torn record.
+- Poison rows don't block the outbox: a batch Postgres rejects for its data
+  (constraint/length violation, missing month partition) is retried row by
+  row and rows that still fail go to the slot's dead-letter.ndjson.
+
+On-disk format: OUTBOX_DIR/slot-N/segment-XXXXXXXX.log, each record is
+<u32 length><u32 crc32><json>. Every worker process claims one slot with an
+exclusive flock; unclaimed slots left by a previous, larger deployment are
+adopted and drained at startup.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from app.compression import COLD_COLUMNS, cold_codec
+from app.database import AsyncSessionLocal, BIRecord, ConsultationColdData, ConsultationRecord
+from app.services.bi_live_service import BILiveHub
+from app.services.bi_rollup_service import BIRollupService
+from app.services.bi_service import BIService
+
+logger = logging.getLogger("medical-scribe")
+
+ENABLED = os.getenv("WRITE_BEHIND", "false").lower() == "true"
+OUTBOX_DIR = Path(os.getenv("OUTBOX_DIR", Path(__file__).resolve().parents[2] / "data" / "outbox"))
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH", "200"))
+FLUSH_INTERVAL = float(os.getenv("OUTBOX_FLUSH_MS", "50")) / 1000
+SEGMENT_BYTES = int(float(os.getenv("OUTBOX_SEGMENT_MB", "16")) * 1024 * 1024)
+ID_BLOCK = int(os.getenv("OUTBOX_ID_BLOCK", "50"))
+
+_RECORD_HEADER = struct.Struct("<II")
+_DATETIME_KEYS = ("created_at", "updated_at", "timestamp")
+
+# Errors caused by the row itself: retrying the same row can never succeed.
+# Anything else (connection lost, DB restarting) is retried with backoff.
+_PERMANENT_ERRORS = (IntegrityError, DataError)
+
+
+# ══════════════════════════════════════════════════════════════
+# ENTRY ENCODING
+# ══════════════════════════════════════════════════════════════
+
+def _dump_row(row: dict) -> dict:
+    return {k: v.isoformat() if k in _DATETIME_KEYS and isinstance(v, datetime) else v for k, v in row.items()}
+
+
+def _load_row(row: dict) -> dict:
+    return {k: datetime.fromisoformat(v) if k in _DATETIME_KEYS and isinstance(v, str) else v for k, v in row.items()}
+
+
+def _encode(entry: dict) -> bytes:
+    payload = json.dumps(
+        {"consultation": _dump_row(entry["consultation"]), "cold": entry["cold"], "bi": _dump_row(entry["bi"])},
+        ensure_ascii=False, separators=(",", ":"),
+    ).encode()
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(path: Path) -> list[dict]:
+    """Every intact record; a torn tail (crash mid-append, never acknowledged) is ignored."""
+    data = path.read_bytes()
+    entries, pos = [], 0
+    while pos + _RECORD_HEADER.size <= len(data):
+        length, crc = _RECORD_HEADER.unpack_from(data, pos)
+        payload = data[pos + _RECORD_HEADER.size:pos + _RECORD_HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            logger.warning(f"Outbox: torn record at {path.name}:{pos}, ignoring the rest of the segment")
+            break
+        raw = json.loads(payload)
+        consultation = _load_row(raw["consultation"])
+        # Segments written before the cold side table carry those columns inline
+        cold = raw.get("cold") or {c: consultation.pop(c, None) for c in COLD_COLUMNS}
+        entries.append({"consultation": consultation, "cold": cold, "bi": _load_row(raw["bi"])})
+        pos += _RECORD_HEADER.size + length
+    return entries
+
+
+# ══════════════════════════════════════════════════════════════
+# OUTBOX
+# ══════════════════════════════════════════════════════════════
+
+class _Segment:
+    def __init__(self, path: Path):
+        self.path = path
+        self.outstanding = 0  # entries appended but not yet committed to Postgres
+        self.sealed = False   # no more appends; delete once outstanding hits 0
+
+
+class WriteBehindOutbox:
+
+    def __init__(self, directory: Path = OUTBOX_DIR):
+        self.root = directory
+        self.slot: Path | None = None
+        self._lock_fd: int | None = None
+        self._file = None
+        self._active: _Segment | None = None
+        self._segments: list[_Segment] = []
+        self._pending: list[tuple[dict, _Segment]] = []   # durable, not yet in Postgres
+        self._appends: list[tuple[bytes, dict, asyncio.Future]] = []
+        self._append_event: asyncio.Event | None = None
+        self._flush_event: asyncio.Event | None = None
+        self._ids: list[int] = []
+        self._id_lock: asyncio.Lock | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._closing = False
+        self.committed = 0
+        self.skipped_duplicates = 0
+        self.failures = 0
+        self.dead_lettered = 0
+        self.last_error: str | None = None
+        self.fsyncs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return ENABLED
+
+    # ── Lifecycle ──
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        self._append_event = asyncio.Event()
+        self._flush_event = asyncio.Event()
+        self._id_lock = asyncio.Lock()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self.slot = self._claim_slot()
+        await self._recover(self.slot, adopt=False)
+        for slot in sorted(self.root.glob("slot-*")):
+            if slot != self.slot:
+                await self._adopt(slot)
+
+        self._open_segment()
+        self._tasks = [
+            asyncio.create_task(self._append_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+        logger.info(f"🗃️ Write-behind outbox ready: {self.slot} ({len(self._pending)} entries replayed)")
+
+    async def stop(self) -> None:
+        if not self.enabled or not self._tasks:
+            return
+        self._closing = True
+        self._append_event.set()
+        self._flush_event.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            await self._flush_pending()
+        except Exception as e:
+            logger.warning(f"Outbox: final flush failed ({e}); entries stay on disk for replay")
+        if self._file is not None:
+            self._file.close()
+            self._active.sealed = True
+            self._reap()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+
+    def _claim_slot(self) -> Path:
+        n = 0
+        while True:
+            slot = self.root / f"slot-{n}"
+            slot.mkdir(exist_ok=True)
+            fd = os.open(slot / "lock", os.O_CREAT | os.O_RDWR)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                n += 1
+                continue
+            self._lock_fd = fd
+            return slot
+
+    async def _recover(self, slot: Path, adopt: bool) -> None:
+        for path in sorted(slot.glob("segment-*.log")):
+            entries = read_segment(path)
+            segment = _Segment(path)
+            segment.sealed = True
+            segment.outstanding = len(entries)
+            if adopt:
+                # Drain now: nobody else will ever append to or replay this slot
+                for i in range(0, len(entries), BATCH_SIZE):
+                    await self._commit_isolating([(e, segment) for e in entries[i:i + BATCH_SIZE]])
+                path.unlink()
+                continue
+            self._segments.append(segment)
+            self._pending.extend((entry, segment) for entry in entries)
+            if not entries:
+                path.unlink()
+                self._segments.remove(segment)
+
+    async def _adopt(self, slot: Path) -> None:
+        fd = os.open(slot / "lock", os.O_CREAT | os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return  # another live worker owns it
+            if any(slot.glob("segment-*.log")):
+                logger.info(f"Outbox: adopting orphaned {slot.name}")
+                await self._recover(slot, adopt=True)
+        finally:
+            os.close(fd)
+
+    def _open_segment(self) -> None:
+        existing = sorted(self.slot.glob("segment-*.log"))
+        number = int(existing[-1].stem.split("-")[1]) + 1 if existing else 0
+        path = self.slot / f"segment-{number:08d}.log"
+        self._file = open(path, "ab")
+        self._active = _Segment(path)
+        self._segments.append(self._active)
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._active.sealed = True
+        self._open_segment()
+        self._reap()
+
+    def _reap(self) -> None:
+        for segment in list(self._segments):
+            if segment.sealed and segment.outstanding == 0:
+                segment.path.unlink(missing_ok=True)
+                self._segments.remove(segment)
+
+    # ── Request side ──
+
+    async def allocate_id(self) -> int:
+        """Next consultations.id, reserved from the sequence in blocks of ID_BLOCK."""
+        async with self._id_lock:
+            if not self._ids:
+                async with AsyncSessionLocal() as session:
+                    result = await session.execute(
+                        select(func.nextval(func.pg_get_serial_sequence("consultations", "id")))
+                        .select_from(func.generate_series(1, ID_BLOCK))
+                    )
+                    self._ids = sorted(result.scalars().all(), reverse=True)
+            return self._ids.pop()
+
+    async def submit(self, consultation_row: dict, cold_payloads: dict, bi_row: dict) -> int:
+        """Appends one analysis to the outbox; returns its consultation id once fsync'd."""
+        consultation_id = await self.allocate_id()
+        now = bi_row["timestamp"]
+        entry = {
+            "consultation": {**consultation_row, "id": consultation_id, "created_at": now, "updated_at": now},
+            "cold": cold_payloads,
+            "bi": bi_row,
+        }
+        future = asyncio.get_running_loop().create_future()
+        self._appends.append((_encode(entry), entry, future))
+        self._append_event.set()
+        await future
+        return consultation_id
+
+    # ── Background: file group commit ──
+
+    async def _append_loop(self) -> None:
+        while not self._closing or self._appends:
+            await self._append_event.wait()
+            self._append_event.clear()
+            if not self._appends:
+                continue
+            batch, self._appends = self._appends, []
+            good_offset = self._file.tell()
+            try:
+                # Every append queued meanwhile shares this single write + fsync
+                await asyncio.to_thread(self._write_and_sync, b"".join(data for data, _, _ in batch))
+            except Exception as e:
+                logger.error(f"Outbox: append failed ({e}); cutting {self._active.path.name} at {good_offset}")
+                await asyncio.to_thread(self._cut_tail, good_offset)
+                # Later appends never land behind a torn record (replay stops there)
+                self._active.sealed = True
+                self._open_segment()
+                self._reap()
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            for _, entry, future in batch:
+                self._active.outstanding += 1
+                self._pending.append((entry, self._active))
+                future.set_result(None)
+            if self._file.tell() >= SEGMENT_BYTES:
+                self._rotate()
+            if len(self._pending) >= BATCH_SIZE:
+                self._flush_event.set()
+
+    def _write_and_sync(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.fsyncs += 1
+
+    def _cut_tail(self, good_offset: int) -> None:
+        """After a failed write: drop whatever part of it reached the active segment."""
+        path = self._active.path
+        try:
+            self._file.close()
+        except OSError:
+            pass  # buffered bytes of the failed write; cut off below anyway
+        try:
+            with open(path, "r+b") as f:
+                f.truncate(good_offset)
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError as e:
+            logger.error(f"Outbox: could not truncate {path.name} ({e}); entries before {good_offset} still replay")
+
+    # ── Background: Postgres group commit ──
+
+    async def _flush_loop(self) -> None:
+        backoff = FLUSH_INTERVAL
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self._flush_pending()
+                backoff = FLUSH_INTERVAL
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                backoff = min(max(backoff * 2, 0.5), 30.0)
+                logger.error(f"Outbox: group commit failed ({e}); retrying in {backoff:.1f}s")
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            batch = self._pending[:BATCH_SIZE]
+            await self._commit_isolating(batch)
+            del self._pending[:len(batch)]
+            for _, segment in batch:
+                segment.outstanding -= 1
+            self._reap()
+
+    async def _commit_isolating(self, batch: list[tuple[dict, _Segment]]) -> None:
+        """
+        Commits `batch`; if Postgres rejects it for its data, retries row by
+        row and dead-letters the rows that still fail. Transient errors
+        propagate so the whole batch is retried later (re-inserting rows that
+        did commit is a no-op thanks to ON CONFLICT DO NOTHING).
+        """
+        try:
+            await self._commit(batch)
+            return
+        except _PERMANENT_ERRORS as e:
+            if len(batch) == 1:
+                await self._dead_letter(batch[0][0], e)
+                return
+            logger.warning(f"Outbox: batch of {len(batch)} rejected ({e}); retrying row by row")
+        for item in batch:
+            try:
+                await self._commit([item])
+            except _PERMANENT_ERRORS as e:
+                await self._dead_letter(item[0], e)
+
+    async def _dead_letter(self, entry: dict, error: Exception) -> None:
+        line = json.dumps(
+            {
+                "failed_at": datetime.now().isoformat(),
+                "error": str(error),
+                "consultation": _dump_row(entry["consultation"]),
+                "cold": entry["cold"],
+                "bi": _dump_row(entry["bi"]),
+            },
+            ensure_ascii=False, separators=(",", ":"),
+        ) + "\n"
+        await asyncio.to_thread(self._append_dead_letter, line.encode())
+        self.dead_lettered += 1
+        self.last_error = str(error)
+        logger.error(
+            f"Outbox: consultation {entry['consultation']['id']} dead-lettered to "
+            f"{self.slot.name}/dead-letter.ndjson ({error})"
+        )
+
+    def _append_dead_letter(self, data: bytes) -> None:
+        with open(self.slot / "dead-letter.ndjson", "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def _commit(self, batch: list[tuple[dict, _Segment]]) -> None:
+        rows = [entry["consultation"] for entry, _ in batch]
+        async with AsyncSessionLocal() as session:
+            inserted = set((await session.scalars(
+                pg_insert(ConsultationRecord)
+                .on_conflict_do_nothing(index_elements=["id", "created_at"])
+                .returning(ConsultationRecord.id),
+                rows,
+            )).all())
+            # Replayed entries that already made it in are skipped entirely
+            fresh = [entry for entry, _ in batch if entry["consultation"]["id"] in inserted]
+            bi_rows = [entry["bi"] for entry in fresh]
+            if fresh:
+                await session.execute(insert(ConsultationColdData), [
+                    {
+                        "consultation_id": entry["consultation"]["id"],
+                        "created_at": entry["consultation"]["created_at"],
+                        **cold_codec.compress_row(entry["cold"]),
+                    }
+                    for entry in fresh
+                ])
+                await session.execute(insert(BIRecord), bi_rows)
+                await BIRollupService.apply(session, bi_rows)
+                await BILiveHub.notify(session, bi_rows)
+            await session.commit()
+        if bi_rows:
+            BIService.invalidate_stats()
+        self.committed += len(inserted)
+        self.skipped_duplicates += len(batch) - len(inserted)
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "slot": self.slot.name if self.slot else None,
+            "pending": len(self._pending),
+            "appending": len(self._appends),
+            "segments": len(self._segments),
+            "committed": self.committed,
+            "skipped_duplicates": self.skipped_duplicates,
+            "fsyncs": self.fsyncs,
+            "failures": self.failures,
+            "dead_lettered": self.dead_lettered,
+            "last_error": self.last_error,
+            "reserved_ids": len(self._ids),
+        }
+
+
+write_behind = WriteBehindOutbox()
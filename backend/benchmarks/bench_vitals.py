@@ -0,0 +1,97 @@
+"""
+benchmarks/bench_vitals.py — Vital-Sign Extraction Microbenchmark
+Medical Scribe Enterprise v3.0
+Legacy six-search extractor vs the single combined-alternation pass.
+
+Run from backend/:  python -m benchmarks.bench_vitals
+"""
+
+import re
+import timeit
+
+from services.soap_engine import extract_vital_signs, extract_vital_sign_readings
+
+
+def legacy_extract_vital_signs(text: str) -> dict:
+    """Pre-fusion implementation (one re.search per vital), kept for comparison."""
+    sinais: dict = {"pa": None, "fc": None, "temperatura": None, "sato2": None, "fr": None}
+
+    pa_match = re.search(
+        r"(?:pa|pressão\s*arterial)[:\s]+?(\d{2,3})\s*[x/]\s*(\d{2,3})", text, re.IGNORECASE
+    ) or re.search(
+        r"pressão\s+(\d{2,3})\s*(?:por|x|/)\s*(\d{2,3})", text, re.IGNORECASE
+    )
+    if pa_match:
+        sinais["pa"] = {
+            "sistolica": int(pa_match.group(1)),
+            "diastolica": int(pa_match.group(2)),
+            "raw": pa_match.group(0).strip(),
+        }
+
+    fc_match = re.search(
+        r"(?:fc|frequência\s*cardíaca|pulso)[:\s]+?(\d{2,3})\s*(?:bpm)?", text, re.IGNORECASE
+    )
+    if fc_match:
+        sinais["fc"] = {"valor": int(fc_match.group(1)), "raw": fc_match.group(0).strip()}
+
+    temp_match = re.search(
+        r"(?:temperatura|temp|tax)[:\s]+?(\d{2}[.,]?\d?)\s*°?\s*c?", text, re.IGNORECASE
+    )
+    if temp_match:
+        valor = float(temp_match.group(1).replace(",", "."))
+        sinais["temperatura"] = {"valor": valor, "raw": temp_match.group(0).strip()}
+
+    sat_match = re.search(
+        r"(?:sat(?:ura[çc][aã]o)?|spo2|sato2)[:\s]+?(\d{2,3})\s*%?", text, re.IGNORECASE
+    )
+    if sat_match:
+        sinais["sato2"] = {"valor": int(sat_match.group(1)), "raw": sat_match.group(0).strip()}
+
+    fr_match = re.search(
+        r"(?:fr|frequência\s*respiratória)[:\s]+?(\d{1,2})\s*(?:irpm|rpm)?", text, re.IGNORECASE
+    )
+    if fr_match:
+        sinais["fr"] = {"valor": int(fr_match.group(1)), "raw": fr_match.group(0).strip()}
+
+    return sinais
+
+
+_FILLER = "Paciente refere cansaço e dor difusa desde ontem, sem outras queixas. "
+_VITALS = "PA 130x85, FC 92 bpm, temperatura 37,8, SpO2 95%, FR 20 irpm. "
+
+CASES = {
+    # Vitals near the start: legacy searches stop early
+    "vitals_first_10kb": _VITALS + _FILLER * 140,
+    # Vitals at the end: every legacy search scans the whole text
+    "vitals_last_10kb": _FILLER * 140 + _VITALS,
+    # No vitals at all: worst case for legacy (six full scans + PA fallback)
+    "no_vitals_100kb": _FILLER * 1400,
+    # ICU style: vitals repeated every few lines
+    "icu_repeated_100kb": (_FILLER * 3 + _VITALS) * 350,
+}
+
+
+def run(number: int = 50) -> list[dict]:
+    rows = []
+    for name, text in CASES.items():
+        assert legacy_extract_vital_signs(text) == extract_vital_signs(text), name
+        legacy = min(timeit.repeat(lambda: legacy_extract_vital_signs(text), number=number, repeat=3)) / number
+        fused = min(timeit.repeat(lambda: extract_vital_signs(text), number=number, repeat=3)) / number
+        rows.append({
+            "case": name,
+            "kb": len(text) / 1024,
+            "legacy_ms": legacy * 1e3,
+            "fused_ms": fused * 1e3,
+            "speedup": legacy / fused if fused else float("inf"),
+            "readings": len(extract_vital_sign_readings(text)),
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"{'case':<22}{'KB':>8}{'legacy ms':>12}{'fused ms':>12}{'speedup':>10}{'readings':>10}")
+    for r in run():
+        print(
+            f"{r['case']:<22}{r['kb']:>8.1f}{r['legacy_ms']:>12.3f}{r['fused_ms']:>12.3f}"
+            f"{r['speedup']:>9.2f}x{r['readings']:>10}"
+        )
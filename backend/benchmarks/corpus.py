@@ -0,0 +1,187 @@
+"""
+benchmarks/corpus.py — Synthetic pt-BR Consultation Corpus
+Medical Scribe Enterprise v3.0
+Seeded generator of realistic transcripts (PS / UTI / Consultório), 1 KB → 1 MB,
+plus a DATASUS-sized CID-10 catalogue for benchmarking the compiled index.
+Same seed + size + scenario → byte-identical text.
+"""
+
+import random
+
+SCENARIOS = ("PS", "UTI", "Consultório")
+
+SIZES = {
+    "1kb": 1024,
+    "10kb": 10 * 1024,
+    "100kb": 100 * 1024,
+    "1mb": 1024 * 1024,
+}
+
+
+# ══════════════════════════════════════════════════════════════
+# PHRASE BANKS
+# ══════════════════════════════════════════════════════════════
+
+_COMPLAINTS = {
+    "PS": [
+        "dor no peito", "falta de ar", "dor abdominal", "febre alta", "dor de cabeça",
+        "vômito", "tontura", "fraqueza no braço direito", "desmaio", "sangramento",
+    ],
+    "UTI": [
+        "dispneia", "rebaixamento de consciência", "hipotensão", "febre", "taquicardia",
+        "dessaturação", "oligúria", "agitação",
+    ],
+    "Consultório": [
+        "dor lombar", "tosse", "cansaço", "insônia", "ansiedade", "dor de garganta",
+        "azia", "dor nas costas", "alergia", "dor de ouvido",
+    ],
+}
+
+_DIAGNOSES = {
+    "PS": [
+        "síndrome coronariana aguda", "avc isquêmico", "pneumonia", "sepse", "crise hipertensiva",
+        "infecção urinária", "gastrite", "angina instável", "politrauma",
+    ],
+    "UTI": [
+        "choque séptico", "sdra", "insuficiência respiratória aguda", "cetoacidose diabética",
+        "tromboembolismo pulmonar", "edema cerebral", "civd", "rabdomiólise",
+    ],
+    "Consultório": [
+        "hipertensão", "diabetes tipo 2", "asma", "rinite", "lombalgia", "enxaqueca",
+        "gastrite", "depressão", "sinusite",
+    ],
+}
+
+_MEDS = [
+    "dipirona", "paracetamol", "losartana", "metformina", "omeprazol", "amoxicilina",
+    "enoxaparina", "furosemida", "insulina", "salbutamol", "prednisona", "sertralina",
+    "clopidogrel", "aspirina", "ceftriaxona", "noradrenalina",
+]
+
+_COMORBIDITIES = ["hipertensão", "diabetes", "asma", "dpoc", "obesidade", "dislipidemia", "hipotireoidismo"]
+
+_PATIENT_TEMPLATES = [
+    "Doutor, estou sentindo {complaint} faz {days} dias",
+    "Comecei com {complaint} desde {when}",
+    "Minha dor piorou hoje de manhã e está doendo muito",
+    "Tenho {comorb} e tomo {med} {dose} mg todo dia",
+    "Sinto-me muito cansado, não consigo dormir direito",
+    "Estou com {complaint} e um incômodo que não passa",
+    "Meu mal-estar começou depois do almoço",
+    "Já tomei {med} mas não melhorou",
+    "Sou alérgico a {allergen}, fico com coceira no corpo",
+    "A queixa principal é {complaint}",
+]
+
+_DOCTOR_TEMPLATES = [
+    "Vamos examinar o senhor agora",
+    "Exame físico: ausculta pulmonar com murmúrio vesicular presente",
+    "Palpação abdominal sem dor, sem massas palpáveis",
+    "Sinais vitais: PA {pas}x{pad}, FC {fc} bpm, FR {fr} irpm, SpO2 {sat}%, temperatura {temp}",
+    "Minha hipótese é {diagnosis}",
+    "Prescrevo {med} {dose} mg de 8 em 8 horas",
+    "Solicito hemograma, PCR e função renal",
+    "Oriento retorno em caso de piora",
+    "Conduta: manter observação e reavaliar em 2 horas",
+    "Diagnóstico provável de {diagnosis}, plano de tratamento conforme protocolo",
+    "Vou pedir um eletrocardiograma",
+]
+
+_ICU_ROUND_TEMPLATES = [
+    "Reavaliação: PA {pas}x{pad}, FC {fc}, SatO2 {sat}%, Tax {temp}",
+    "Paciente em ventilação mecânica, sedado, RASS menos 3",
+    "Balanço hídrico positivo de {bh} ml nas últimas 24 horas",
+    "Mantendo noradrenalina em dose baixa, lactato em queda",
+]
+
+_ALLERGENS = ["dipirona", "penicilina", "sulfa", "frutos do mar", "látex", "ibuprofeno"]
+_WHEN = ["ontem", "anteontem", "segunda-feira", "a semana passada", "o fim de semana"]
+
+
+# ══════════════════════════════════════════════════════════════
+# GENERATOR
+# ══════════════════════════════════════════════════════════════
+
+def _fill(rng: random.Random, template: str, scenario: str) -> str:
+    critical = scenario != "Consultório"
+    return template.format(
+        complaint=rng.choice(_COMPLAINTS[scenario]),
+        diagnosis=rng.choice(_DIAGNOSES[scenario]),
+        comorb=rng.choice(_COMORBIDITIES),
+        med=rng.choice(_MEDS),
+        dose=rng.choice([10, 20, 25, 40, 50, 500, 750, 850]),
+        days=rng.randint(1, 15),
+        when=rng.choice(_WHEN),
+        allergen=rng.choice(_ALLERGENS),
+        pas=rng.randint(70, 190) if critical else rng.randint(100, 160),
+        pad=rng.randint(40, 110) if critical else rng.randint(60, 100),
+        fc=rng.randint(45, 150) if critical else rng.randint(55, 100),
+        fr=rng.randint(10, 35),
+        sat=rng.randint(82, 100),
+        temp=f"{rng.uniform(35.0, 40.5):.1f}".replace(".", ","),
+        bh=rng.randint(200, 2500),
+    )
+
+
+def generate_transcript(size: int, scenario: str = "PS", seed: int = 42) -> str:
+    """One consultation transcript of ~`size` characters (never shorter)."""
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    rng = random.Random(f"{seed}:{scenario}:{size}")
+    lines = []
+    length = 0
+    while length < size:
+        if scenario == "UTI" and rng.random() < 0.3:
+            template = rng.choice(_ICU_ROUND_TEMPLATES)
+        elif rng.random() < 0.5:
+            template = rng.choice(_PATIENT_TEMPLATES)
+        else:
+            template = rng.choice(_DOCTOR_TEMPLATES)
+        line = _fill(rng, template, scenario) + rng.choice([". ", ".\n", ". "])
+        lines.append(line)
+        length += len(line)
+    return "".join(lines)
+
+
+def generate_corpus(sizes=None, scenarios=SCENARIOS, seed: int = 42) -> dict[tuple[str, str], str]:
+    """{(size_label, scenario): transcript} for every combination."""
+    sizes = sizes or SIZES
+    return {
+        (label, scenario): generate_transcript(size, scenario, seed)
+        for label, size in sizes.items()
+        for scenario in scenarios
+    }
+
+
+# ══════════════════════════════════════════════════════════════
+# CID-10 CATALOGUE
+# ══════════════════════════════════════════════════════════════
+
+_SITES = [
+    "do pulmão", "do rim", "do fígado", "do estômago", "do coração", "da pele", "do joelho",
+    "da coluna lombar", "do ouvido médio", "da tireoide", "do cólon", "da bexiga", "do encéfalo",
+]
+_QUALIFIERS = [
+    "aguda", "crônica", "não especificada", "com complicações", "sem complicações", "recidivante",
+    "de origem infecciosa", "secundária", "congênita", "induzida por drogas", "em gestante",
+]
+_CONDITIONS = [
+    "neoplasia maligna", "neoplasia benigna", "inflamação", "infecção", "lesão", "fratura",
+    "insuficiência", "hemorragia", "obstrução", "displasia", "abscesso", "úlcera", "cisto",
+]
+
+
+def generate_catalogue(n_codes: int = 12000, seed: int = 42) -> list[tuple[str, str, list[str]]]:
+    """
+    (code, desc, synonyms) rows shaped like the DATASUS subcategory table
+    (~12k codes, each with an abbreviated description) for services.cid_index.
+    """
+    rng = random.Random(f"{seed}:catalogue:{n_codes}")
+    rows = []
+    for i in range(n_codes):
+        code = f"{chr(ord('A') + i // 1000 % 26)}{i % 1000 // 10:02d}.{i % 10}"
+        condition, site, qualifier = rng.choice(_CONDITIONS), rng.choice(_SITES), rng.choice(_QUALIFIERS)
+        desc = f"{condition.capitalize()} {site} {qualifier} ({i})"
+        rows.append((code, desc, [f"{condition} {site} {i}"]))
+    return rows
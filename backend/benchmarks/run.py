@@ -0,0 +1,251 @@
+"""
+benchmarks/run.py — Engine Benchmark Suite
+Medical Scribe Enterprise v3.0
+Per-stage throughput, peak allocations and scaling curves over the synthetic
+corpus, with stored baselines to catch regressions.
+
+Run from backend/:
+    python -m benchmarks.run                              # full matrix, 1 KB → 1 MB
+    python -m benchmarks.run --sizes 1kb,10kb --save-baseline local
+    python -m benchmarks.run --compare local --threshold 0.25   # exit 1 on regression
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+from benchmarks.corpus import SCENARIOS, SIZES, generate_catalogue, generate_transcript
+from core.security import process_patient_input
+from services import cid_index, soap_engine
+from services.documents import generate_all
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+_PATIENT = {"iniciais": "J.O.S.", "idade": 54}
+
+
+# ══════════════════════════════════════════════════════════════
+# STAGES
+# ══════════════════════════════════════════════════════════════
+
+_INDEX: cid_index.CidIndex | None = None
+
+
+def _catalogue_index() -> cid_index.CidIndex:
+    """CID index over the synthetic DATASUS-sized catalogue, built once per run to a temp file."""
+    global _INDEX
+    if _INDEX is None:
+        path = Path(tempfile.mkdtemp(prefix="bench-cid-")) / "cid10.idx"
+        cid_index.build_index(generate_catalogue(), path)
+        _INDEX = cid_index.CidIndex(path)
+    return _INDEX
+
+
+def _with_index(fn):
+    """Runs `fn` with the engine using the catalogue index, whatever load_default() found."""
+    index = _catalogue_index()
+
+    def run():
+        previous, soap_engine.CID_INDEX = soap_engine.CID_INDEX, index
+        try:
+            return fn()
+        finally:
+            soap_engine.CID_INDEX = previous
+
+    return run
+
+
+def _stages(text: str, scenario: str) -> dict:
+    """
+    Stage name → zero-arg callable. Downstream inputs are precomputed so each
+    stage is isolated. "+cid_index" stages run against a compiled catalogue
+    index; the others use whatever index the engine loaded (usually none).
+    """
+    dialog = soap_engine.diarize(text)
+    clinical = soap_engine.extract_clinical_data(text)
+    soap_result = soap_engine.process(text)
+    raw_input = {
+        "nome_completo": "João Oliveira Silva",
+        "idade": 54,
+        "cenario_atendimento": scenario,
+        "texto_transcrito": text,
+    }
+    return {
+        "diarize": lambda: soap_engine.diarize(text),
+        "extract_vital_signs": lambda: soap_engine.extract_vital_signs(text),
+        "extract_clinical_data": lambda: soap_engine.extract_clinical_data(text),
+        "build_soap": lambda: soap_engine.build_soap(dialog, clinical),
+        "generate_all": lambda: generate_all(soap_result, _PATIENT),
+        "process_patient_input": lambda: process_patient_input(raw_input),
+        "process": lambda: soap_engine.process(text),
+        "extract_clinical_data+cid_index": _with_index(lambda: soap_engine.extract_clinical_data(text)),
+        "process+cid_index": _with_index(lambda: soap_engine.process(text)),
+    }
+
+
+def _time(fn, min_seconds: float, max_runs: int) -> list[float]:
+    fn()  # warm-up
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < max_runs and (len(samples) < 3 or time.perf_counter() - start < min_seconds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def _peak_alloc(fn) -> int:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run(sizes: dict[str, int], scenarios, seed: int, min_seconds: float, max_runs: int) -> dict:
+    results = []
+    for scenario in scenarios:
+        for label, size in sizes.items():
+            text = generate_transcript(size, scenario, seed)
+            for stage, fn in _stages(text, scenario).items():
+                samples = _time(fn, min_seconds, max_runs)
+                median = statistics.median(samples)
+                results.append({
+                    "stage": stage,
+                    "scenario": scenario,
+                    "size": label,
+                    "bytes": len(text.encode()),
+                    "runs": len(samples),
+                    "median_ms": median * 1e3,
+                    "min_ms": min(samples) * 1e3,
+                    "mb_per_s": len(text.encode()) / median / 1e6 if median else math.inf,
+                    "peak_alloc_kb": _peak_alloc(fn) / 1024,
+                })
+    return {
+        "created_at": datetime.now().isoformat(),
+        "seed": seed,
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+        "scaling": _scaling(results),
+    }
+
+
+def _scaling(results: list[dict]) -> list[dict]:
+    """
+    Log-log slope of time vs input size per (stage, scenario):
+    ~1.0 is linear, ~2.0 is quadratic.
+    """
+    curves = {}
+    for r in results:
+        curves.setdefault((r["stage"], r["scenario"]), []).append((r["bytes"], r["median_ms"]))
+
+    out = []
+    for (stage, scenario), points in curves.items():
+        points = [(math.log(b), math.log(ms)) for b, ms in points if ms > 0]
+        if len(points) < 2:
+            continue
+        mean_x = statistics.fmean(x for x, _ in points)
+        mean_y = statistics.fmean(y for _, y in points)
+        var_x = sum((x - mean_x) ** 2 for x, _ in points)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x if var_x else 0.0
+        out.append({"stage": stage, "scenario": scenario, "exponent": round(slope, 3)})
+    return out
+
+
+# ══════════════════════════════════════════════════════════════
+# BASELINES
+# ══════════════════════════════════════════════════════════════
+
+def _key(r: dict) -> tuple:
+    return r["stage"], r["scenario"], r["size"]
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[dict]:
+    """Rows whose median time grew by more than `threshold` (0.25 = +25%)."""
+    base = {_key(r): r for r in baseline["results"]}
+    regressions = []
+    for r in current["results"]:
+        b = base.get(_key(r))
+        if not b or not b["median_ms"]:
+            continue
+        ratio = r["median_ms"] / b["median_ms"]
+        if ratio > 1 + threshold:
+            regressions.append({**r, "baseline_ms": b["median_ms"], "ratio": round(ratio, 2)})
+    return regressions
+
+
+def _print_report(report: dict):
+    print(f"{'stage':<34}{'scenario':<13}{'size':>6}{'median ms':>12}{'MB/s':>9}{'peak KB':>11}")
+    for r in report["results"]:
+        print(
+            f"{r['stage']:<34}{r['scenario']:<13}{r['size']:>6}{r['median_ms']:>12.3f}"
+            f"{r['mb_per_s']:>9.2f}{r['peak_alloc_kb']:>11.1f}"
+        )
+    if report["scaling"]:
+        print("\nScaling exponent (1.0 = linear):")
+        for s in report["scaling"]:
+            flag = "  ⚠️ superlinear" if s["exponent"] > 1.3 else ""
+            print(f"  {s['stage']:<34}{s['scenario']:<13}{s['exponent']:>6.2f}{flag}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run")
+    parser.add_argument("--sizes", default=",".join(SIZES), help=f"subset of {','.join(SIZES)}")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--min-seconds", type=float, default=0.2, help="time budget per measurement")
+    parser.add_argument("--max-runs", type=int, default=50)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--json", type=Path, help="also write the full report here")
+    args = parser.parse_args(argv)
+
+    sizes = {label: SIZES[label] for label in args.sizes.split(",")}
+    scenarios = args.scenarios.split(",")
+    report = run(sizes, scenarios, args.seed, args.min_seconds, args.max_runs)
+    _print_report(report)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.save_baseline:
+        BASELINE_DIR.mkdir(exist_ok=True)
+        path = BASELINE_DIR / f"{args.save_baseline}.json"
+        path.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+        print(f"\nBaseline saved → {path}")
+
+    if args.compare:
+        baseline = json.loads((BASELINE_DIR / f"{args.compare}.json").read_text())
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) vs '{args.compare}' (>{args.threshold:.0%}):")
+            for r in regressions:
+                print(
+                    f"  {r['stage']:<34}{r['scenario']:<13}{r['size']:>6}  "
+                    f"{r['baseline_ms']:.3f} → {r['median_ms']:.3f} ms ({r['ratio']}x)"
+                )
+            return 1
+        print(f"\n✅ No regressions vs '{args.compare}'")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
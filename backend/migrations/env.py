@@ -0,0 +1,73 @@
+"""
+migrations/env.py — Alembic Environment
+Medical Scribe Enterprise v3.0
+Runs on the connection app.database.init_db() hands over (already inside
+its advisory-locked transaction), or on its own connection from
+DATABASE_URL when invoked through the alembic CLI.
+"""
+
+import asyncio
+import re
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import Base, engine
+
+config = context.config
+target_metadata = Base.metadata
+
+# Monthly partitions (consultations_p2026_01, …) belong to partition_service
+_PARTITION_RE = re.compile(r"_p\d{4}_\d{2}$")
+
+
+def include_name(name, type_, parent_names) -> bool:
+    if type_ == "table" and name:
+        return not _PARTITION_RE.search(name)
+    return True
+
+
+def _run_migrations(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_name=include_name,
+        compare_type=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_migrations(connection)
+        return
+
+    if config.config_file_name is not None:
+        fileConfig(config.config_file_name)
+
+    async def _main():
+        async with engine.connect() as conn:
+            await conn.run_sync(_run_migrations)
+            await conn.commit()
+        await engine.dispose()
+
+    asyncio.run(_main())
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
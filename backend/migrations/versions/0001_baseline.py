@@ -0,0 +1,142 @@
+"""baseline: schema previously created by Base.metadata.create_all
+
+Every statement is IF NOT EXISTS, so this both builds a fresh database and
+adopts one that create_all made (filling in tables and indexes added by
+later releases).
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "consultations",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("paciente_id", sa.String(20), nullable=False),
+        sa.Column("idade", sa.Integer(), nullable=False),
+        sa.Column("cenario_atendimento", sa.String(30), nullable=False),
+        sa.Column("cid_principal_code", sa.String(10), nullable=False),
+        sa.Column("cid_principal_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("json_universal", sa.JSON(), nullable=True),
+        sa.Column("clinical_data_json", sa.JSON(), nullable=True),
+        sa.Column("total_falas", sa.Integer(), nullable=False),
+        sa.Column("falas_medico", sa.Integer(), nullable=False),
+        sa.Column("falas_paciente", sa.Integer(), nullable=False),
+        sa.Column("lgpd_conformidade", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_consultations_paciente_id", "consultations", ["paciente_id"], if_not_exists=True)
+    op.create_index(
+        "ix_consultations_cid_principal_code", "consultations", ["cid_principal_code"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_consultations_created_at_id_summary", "consultations", ["created_at", "id"],
+        postgresql_include=[
+            "iniciais", "paciente_id", "idade", "cenario_atendimento", "cid_principal_code",
+            "cid_principal_desc", "gravidade", "sinais_vitais", "total_falas",
+        ],
+        if_not_exists=True,
+    )
+    op.create_index(
+        "ix_consultations_cenario_created_at_id", "consultations",
+        ["cenario_atendimento", "created_at", "id"], if_not_exists=True,
+    )
+    op.create_index(
+        "ix_consultations_gravidade_created_at_id", "consultations",
+        ["gravidade", "created_at", "id"], if_not_exists=True,
+    )
+
+    op.create_table(
+        "consultation_cold",
+        sa.Column("consultation_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("dict_id", sa.BigInteger(), nullable=True),
+        sa.Column("texto_transcrito", sa.LargeBinary(), nullable=True),
+        sa.Column("dialog_json", sa.LargeBinary(), nullable=True),
+        sa.Column("soap_json", sa.LargeBinary(), nullable=True),
+        sa.Column("documents_json", sa.LargeBinary(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_table(
+        "compression_dictionaries",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("data", sa.LargeBinary(), nullable=False),
+        sa.Column("samples", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        "bi_records",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("cenario", sa.String(30), nullable=False),
+        sa.Column("cid_principal", sa.String(10), nullable=False),
+        sa.Column("cid_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade_estimada", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("hora", sa.Integer(), nullable=True),
+        sa.Column("dia_semana", sa.String(20), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_bi_records_cenario", "bi_records", ["cenario"], if_not_exists=True)
+    op.create_index("ix_bi_records_cid_principal", "bi_records", ["cid_principal"], if_not_exists=True)
+
+    for name, bucket_type in (("bi_rollup_hourly", sa.DateTime()), ("bi_rollup_daily", sa.Date())):
+        op.create_table(
+            name,
+            sa.Column("bucket", bucket_type, primary_key=True),
+            sa.Column("cenario", sa.String(30), primary_key=True),
+            sa.Column("cid_principal", sa.String(10), primary_key=True),
+            sa.Column("gravidade_estimada", sa.String(20), primary_key=True),
+            sa.Column("cid_desc", sa.String(200), nullable=False),
+            sa.Column("total", sa.Integer(), nullable=False),
+            if_not_exists=True,
+        )
+    op.create_table(
+        "bi_rollup_heatmap",
+        sa.Column("dia_semana", sa.String(20), primary_key=True),
+        sa.Column("hora", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("cenario", sa.String(30), primary_key=True),
+        sa.Column("gravidade_estimada", sa.String(20), primary_key=True),
+        sa.Column("total", sa.Integer(), nullable=False),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        "documents",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("consultation_id", sa.Integer(), nullable=False),
+        sa.Column("doc_type", sa.String(30), nullable=False),
+        sa.Column("title", sa.String(100), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("validated", sa.Boolean(), nullable=False),
+        sa.Column("validated_at", sa.DateTime(), nullable=True),
+        sa.Column("validated_by", sa.String(100), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        if_not_exists=True,
+    )
+    op.create_index("ix_documents_consultation_id", "documents", ["consultation_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name in (
+        "documents", "bi_rollup_heatmap", "bi_rollup_daily", "bi_rollup_hourly", "bi_records",
+        "compression_dictionaries", "consultation_cold", "consultations",
+    ):
+        op.drop_table(name)
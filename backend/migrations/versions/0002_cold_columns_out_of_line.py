@@ -0,0 +1,64 @@
+"""move transcript / dialog / SOAP / documents out of consultations
+
+Databases created before consultation_cold still hold these inline. Rows
+are compressed into consultation_cold (newest dictionary, if any) and the
+inline columns dropped. No-op on databases that never had them.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from app.compression import COLD_COLUMNS, cold_codec
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+_BATCH = 500
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = {c["name"] for c in sa.inspect(bind).get_columns("consultations")}
+    inline = [c for c in COLD_COLUMNS if c in existing]
+    if not inline:
+        return
+
+    dictionaries = bind.execute(sa.text(
+        "SELECT id, data FROM compression_dictionaries ORDER BY created_at, id"
+    )).all()
+    for i, (dict_id, data) in enumerate(dictionaries):
+        cold_codec.register(dict_id, data, activate=i == len(dictionaries) - 1)
+
+    cold = sa.table(
+        "consultation_cold",
+        sa.column("consultation_id", sa.Integer()),
+        sa.column("dict_id", sa.BigInteger()),
+        *(sa.column(c, sa.LargeBinary()) for c in COLD_COLUMNS),
+    )
+    query = sa.text(
+        f"SELECT id, {', '.join(inline)} FROM consultations WHERE id > :last ORDER BY id LIMIT :n"
+    ).columns(sa.column("id", sa.Integer()), *(
+        sa.column(c, sa.Text() if c == "texto_transcrito" else sa.JSON()) for c in inline
+    ))
+    last_id = 0
+    while rows := bind.execute(query, {"last": last_id, "n": _BATCH}).all():
+        bind.execute(insert(cold).on_conflict_do_nothing(), [
+            {"consultation_id": row[0], **cold_codec.compress_row(dict(zip(inline, row[1:])))}
+            for row in rows
+        ])
+        last_id = rows[-1][0]
+
+    for column in inline:
+        op.drop_column("consultations", column)
+
+
+def downgrade() -> None:
+    # Data stays in consultation_cold; nothing to restore inline
+    pass
@@ -0,0 +1,295 @@
+"""monthly range partitioning: consultations, consultation_cold, bi_records
+
+Each table is rebuilt as PARTITION BY RANGE on its timestamp, with one
+partition per month covering existing data plus PARTITION_PREMAKE_MONTHS
+ahead; rows are copied over and the old table dropped. The primary keys
+become (id, <partition key>), as Postgres requires. id sequences are kept,
+so ids keep counting from where they were.
+
+Runs in one transaction: on very large tables, schedule a maintenance window.
+Rows are copied by column name. Databases that create_all built before 0001
+may hold NULL counters / flags / updated_at (filled from the model defaults)
+or a NULL created_at / timestamp, which has no partition: the upgrade refuses
+to start until those rows are fixed.
+The downgrade copies the rows back into plain tables the same way. Months
+already moved to the Parquet archive (app/services/archive_service.py) are
+not brought back into Postgres.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.services.partition_service import PREMAKE_MONTHS, add_months, create_partition_sql, month_start
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+_CONSULTATION_COLUMNS = (
+    "id", "iniciais", "paciente_id", "idade", "cenario_atendimento", "cid_principal_code",
+    "cid_principal_desc", "gravidade", "sinais_vitais", "json_universal", "clinical_data_json",
+    "total_falas", "falas_medico", "falas_paciente", "lgpd_conformidade", "created_at", "updated_at",
+)
+# Nullable in create_all databases; NULLs become what the model would have written
+_CONSULTATION_DEFAULTS = {
+    "total_falas": "0", "falas_medico": "0", "falas_paciente": "0",
+    "lgpd_conformidade": "true", "updated_at": "created_at",
+}
+_BI_COLUMNS = (
+    "id", "iniciais", "cenario", "cid_principal", "cid_desc", "gravidade_estimada",
+    "sinais_vitais", "hora", "dia_semana", "timestamp",
+)
+
+
+def _months(bind, table: str, column: str) -> list:
+    low, high = bind.execute(sa.text(f'SELECT min("{column}"), max("{column}") FROM {table}')).one()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    first = month_start(min(low or now, now))
+    last = add_months(month_start(max(high or now, now)), PREMAKE_MONTHS)
+    months, month = [], first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def _require_partition_key(bind, table: str, column: str) -> None:
+    nulls = bind.execute(sa.text(f'SELECT count(*) FROM {table} WHERE "{column}" IS NULL')).scalar()
+    if nulls:
+        raise RuntimeError(
+            f'{table}: {nulls} row(s) with NULL "{column}" have no monthly partition; '
+            f"set {column} on them (or delete them) and rerun the migration"
+        )
+
+
+def _copy_sql(table: str, source: str, columns: tuple, defaults: dict | None = None) -> str:
+    """INSERT … SELECT by column name; `defaults` maps column → SQL used when it is NULL."""
+    defaults = defaults or {}
+    targets = ", ".join(f'"{c}"' for c in columns)
+    values = ", ".join(f'COALESCE("{c}", {defaults[c]})' if c in defaults else f'"{c}"' for c in columns)
+    return f"INSERT INTO {table} ({targets}) SELECT {values} FROM {source}"
+
+
+def _retire(bind, table: str, serial: bool = True) -> tuple[str, str | None]:
+    """Renames `table` out of the way, freeing its index/constraint names; keeps its id sequence."""
+    old = f"{table}_unpartitioned"
+    sequence = None
+    if serial:
+        sequence = bind.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    indexes = bind.execute(sa.text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname <> :pkey"
+    ), {"table": table, "pkey": f"{table}_pkey"}).scalars().all()
+    for index in indexes:
+        op.execute(f"DROP INDEX {index}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    return old, sequence
+
+
+def _id_column(sequence: str | None) -> sa.Column:
+    default = sa.text(f"nextval('{sequence}'::regclass)") if sequence else None
+    return sa.Column("id", sa.Integer(), nullable=False, server_default=default, autoincrement=False)
+
+
+def _finish(bind, table: str, column: str, old: str, sequence: str | None, copy_sql: str) -> None:
+    for month in _months(bind, old, column):
+        op.execute(create_partition_sql(table, month))
+    op.execute(copy_sql)
+    op.drop_table(old)
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+
+def _unretire(old: str, table: str, sequence: str | None) -> None:
+    """Drops the partitioned table (partitions included) and hands its sequence back to `table`."""
+    op.drop_table(old)
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    _require_partition_key(bind, "consultations", "created_at")
+    _require_partition_key(bind, "bi_records", "timestamp")
+
+    # ── consultations ──
+    old, sequence = _retire(bind, "consultations")
+    op.create_table(
+        "consultations",
+        _id_column(sequence),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("paciente_id", sa.String(20), nullable=False),
+        sa.Column("idade", sa.Integer(), nullable=False),
+        sa.Column("cenario_atendimento", sa.String(30), nullable=False),
+        sa.Column("cid_principal_code", sa.String(10), nullable=False),
+        sa.Column("cid_principal_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("json_universal", sa.JSON(), nullable=True),
+        sa.Column("clinical_data_json", sa.JSON(), nullable=True),
+        sa.Column("total_falas", sa.Integer(), nullable=False),
+        sa.Column("falas_medico", sa.Integer(), nullable=False),
+        sa.Column("falas_paciente", sa.Integer(), nullable=False),
+        sa.Column("lgpd_conformidade", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "created_at", name="consultations_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.create_index("ix_consultations_paciente_id", "consultations", ["paciente_id"])
+    op.create_index("ix_consultations_cid_principal_code", "consultations", ["cid_principal_code"])
+    op.create_index(
+        "ix_consultations_created_at_id_summary", "consultations", ["created_at", "id"],
+        postgresql_include=[
+            "iniciais", "paciente_id", "idade", "cenario_atendimento", "cid_principal_code",
+            "cid_principal_desc", "gravidade", "sinais_vitais", "total_falas",
+        ],
+    )
+    op.create_index(
+        "ix_consultations_cenario_created_at_id", "consultations", ["cenario_atendimento", "created_at", "id"]
+    )
+    op.create_index("ix_consultations_gravidade_created_at_id", "consultations", ["gravidade", "created_at", "id"])
+    _finish(
+        bind, "consultations", "created_at", old, sequence,
+        _copy_sql("consultations", old, _CONSULTATION_COLUMNS, _CONSULTATION_DEFAULTS),
+    )
+
+    # ── consultation_cold (gains created_at, copied from its consultation) ──
+    old, _ = _retire(bind, "consultation_cold", serial=False)
+    op.create_table(
+        "consultation_cold",
+        sa.Column("consultation_id", sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("dict_id", sa.BigInteger(), nullable=True),
+        sa.Column("texto_transcrito", sa.LargeBinary(), nullable=True),
+        sa.Column("dialog_json", sa.LargeBinary(), nullable=True),
+        sa.Column("soap_json", sa.LargeBinary(), nullable=True),
+        sa.Column("documents_json", sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint("consultation_id", "created_at", name="consultation_cold_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    for month in _months(bind, "consultations", "created_at"):
+        op.execute(create_partition_sql("consultation_cold", month))
+    # Orphans (no consultation) have no month to live in and nothing reads them
+    op.execute(
+        f"INSERT INTO consultation_cold "
+        f"(consultation_id, created_at, dict_id, texto_transcrito, dialog_json, soap_json, documents_json) "
+        f"SELECT o.consultation_id, c.created_at, o.dict_id, o.texto_transcrito, o.dialog_json, "
+        f"o.soap_json, o.documents_json FROM {old} o JOIN consultations c ON c.id = o.consultation_id"
+    )
+    op.drop_table(old)
+
+    # ── bi_records ──
+    old, sequence = _retire(bind, "bi_records")
+    op.create_table(
+        "bi_records",
+        _id_column(sequence),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("cenario", sa.String(30), nullable=False),
+        sa.Column("cid_principal", sa.String(10), nullable=False),
+        sa.Column("cid_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade_estimada", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("hora", sa.Integer(), nullable=True),
+        sa.Column("dia_semana", sa.String(20), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id", "timestamp", name="bi_records_pkey"),
+        postgresql_partition_by="RANGE (timestamp)",
+    )
+    op.create_index("ix_bi_records_cenario", "bi_records", ["cenario"])
+    op.create_index("ix_bi_records_cid_principal", "bi_records", ["cid_principal"])
+    op.create_index("ix_bi_records_timestamp", "bi_records", ["timestamp"])
+    _finish(bind, "bi_records", "timestamp", old, sequence, _copy_sql("bi_records", old, _BI_COLUMNS))
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+
+    # ── consultations ──
+    old, sequence = _retire(bind, "consultations")
+    op.create_table(
+        "consultations",
+        _id_column(sequence),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("paciente_id", sa.String(20), nullable=False),
+        sa.Column("idade", sa.Integer(), nullable=False),
+        sa.Column("cenario_atendimento", sa.String(30), nullable=False),
+        sa.Column("cid_principal_code", sa.String(10), nullable=False),
+        sa.Column("cid_principal_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("json_universal", sa.JSON(), nullable=True),
+        sa.Column("clinical_data_json", sa.JSON(), nullable=True),
+        sa.Column("total_falas", sa.Integer(), nullable=False),
+        sa.Column("falas_medico", sa.Integer(), nullable=False),
+        sa.Column("falas_paciente", sa.Integer(), nullable=False),
+        sa.Column("lgpd_conformidade", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name="consultations_pkey"),
+    )
+    op.create_index("ix_consultations_paciente_id", "consultations", ["paciente_id"])
+    op.create_index("ix_consultations_cid_principal_code", "consultations", ["cid_principal_code"])
+    op.create_index(
+        "ix_consultations_created_at_id_summary", "consultations", ["created_at", "id"],
+        postgresql_include=[
+            "iniciais", "paciente_id", "idade", "cenario_atendimento", "cid_principal_code",
+            "cid_principal_desc", "gravidade", "sinais_vitais", "total_falas",
+        ],
+    )
+    op.create_index(
+        "ix_consultations_cenario_created_at_id", "consultations", ["cenario_atendimento", "created_at", "id"]
+    )
+    op.create_index("ix_consultations_gravidade_created_at_id", "consultations", ["gravidade", "created_at", "id"])
+    op.execute(_copy_sql("consultations", old, _CONSULTATION_COLUMNS))
+    _unretire(old, "consultations", sequence)
+
+    # ── consultation_cold (loses created_at again) ──
+    old, _ = _retire(bind, "consultation_cold", serial=False)
+    op.create_table(
+        "consultation_cold",
+        sa.Column("consultation_id", sa.Integer(), nullable=False, autoincrement=False),
+        sa.Column("dict_id", sa.BigInteger(), nullable=True),
+        sa.Column("texto_transcrito", sa.LargeBinary(), nullable=True),
+        sa.Column("dialog_json", sa.LargeBinary(), nullable=True),
+        sa.Column("soap_json", sa.LargeBinary(), nullable=True),
+        sa.Column("documents_json", sa.LargeBinary(), nullable=True),
+        sa.PrimaryKeyConstraint("consultation_id", name="consultation_cold_pkey"),
+    )
+    op.execute(
+        f"INSERT INTO consultation_cold "
+        f"(consultation_id, dict_id, texto_transcrito, dialog_json, soap_json, documents_json) "
+        f"SELECT consultation_id, dict_id, texto_transcrito, dialog_json, soap_json, documents_json FROM {old}"
+    )
+    op.drop_table(old)
+
+    # ── bi_records ──
+    old, sequence = _retire(bind, "bi_records")
+    op.create_table(
+        "bi_records",
+        _id_column(sequence),
+        sa.Column("iniciais", sa.String(20), nullable=False),
+        sa.Column("cenario", sa.String(30), nullable=False),
+        sa.Column("cid_principal", sa.String(10), nullable=False),
+        sa.Column("cid_desc", sa.String(200), nullable=False),
+        sa.Column("gravidade_estimada", sa.String(20), nullable=False),
+        sa.Column("sinais_vitais", sa.JSON(), nullable=True),
+        sa.Column("hora", sa.Integer(), nullable=True),
+        sa.Column("dia_semana", sa.String(20), nullable=True),
+        sa.Column("timestamp", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name="bi_records_pkey"),
+    )
+    op.create_index("ix_bi_records_cenario", "bi_records", ["cenario"])
+    op.create_index("ix_bi_records_cid_principal", "bi_records", ["cid_principal"])
+    op.execute(_copy_sql("bi_records", old, _BI_COLUMNS))
+    _unretire(old, "bi_records", sequence)
+
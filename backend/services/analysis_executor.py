@@ -0,0 +1,178 @@
+"""
+services/analysis_executor.py — CPU Executor for Request Handlers
+Medical Scribe Enterprise v3.0
+Runs SOAP extraction off the event loop (thread or warm process pool) behind
+a concurrency limit, so one long transcript never stalls health checks or
+DB-bound endpoints on the same uvicorn worker.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from services import soap_engine
+from services.result_cache import cached_process, store_process, transcript_key
+
+logger = logging.getLogger("medical-scribe")
+
+MODES = ("thread", "process")
+
+
+class ExecutorBusy(Exception):
+    """Raised when the wait queue is full; the caller should answer 503."""
+
+
+# ══════════════════════════════════════════════════════════════
+# EXECUTOR
+# ══════════════════════════════════════════════════════════════
+
+class AnalysisExecutor:
+    """
+    Bounded async front-end over a thread or process pool.
+
+    At most `max_concurrency` jobs run at once; further callers wait on a
+    semaphore (that wait is the queue depth reported by stats()). When
+    `max_queue` > 0 and that many callers are already waiting, new jobs are
+    rejected with ExecutorBusy instead of piling up.
+
+    "thread" shares the process' result cache and costs nothing to submit,
+    but extraction holds the GIL. "process" scales across cores at the price of
+    pickling the transcript; workers are spawned and warmed in start().
+    """
+
+    def __init__(self, mode: str = "thread", workers: int | None = None,
+                 max_concurrency: int | None = None, max_queue: int = 0):
+        if mode not in MODES:
+            raise ValueError(f"Unknown executor mode: {mode} (expected one of {MODES})")
+        self.mode = mode
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self.max_queue = max_queue
+        self._pool: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.running = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._timed = 0  # every run that reached the pool, cancelled ones included
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+
+    @classmethod
+    def from_env(cls) -> "AnalysisExecutor":
+        workers = int(os.getenv("ANALYSIS_WORKERS", "0")) or None
+        return cls(
+            mode=os.getenv("ANALYSIS_EXECUTOR", "thread"),
+            workers=workers,
+            max_concurrency=int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "0")) or None,
+            max_queue=int(os.getenv("ANALYSIS_MAX_QUEUE", "0")),
+        )
+
+    # ── Lifecycle ──
+
+    def _ensure_pool(self) -> Executor:
+        if self._pool is None:
+            if self.mode == "process":
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=soap_engine.warm_up)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="analysis")
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._pool
+
+    async def start(self) -> None:
+        """Create the pool and, in process mode, spawn + warm every worker up front."""
+        pool = self._ensure_pool()
+        if self.mode == "process":
+            loop = asyncio.get_running_loop()
+            # Each no-op occupies one worker, forcing the pool to spawn all of them now
+            await asyncio.gather(*(loop.run_in_executor(pool, time.sleep, 0.05) for _ in range(self.workers)))
+        logger.info(
+            f"⚙️ Analysis executor ready: mode={self.mode}, workers={self.workers}, "
+            f"max_concurrency={self.max_concurrency}, max_queue={self.max_queue or '∞'}"
+        )
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._semaphore = None
+
+    # ── Submission ──
+
+    async def run(self, fn, *args, **kwargs):
+        """Await fn(*args, **kwargs) on the pool, honouring the concurrency limit."""
+        pool = self._ensure_pool()
+        semaphore = self._semaphore
+
+        if self.max_queue and semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise ExecutorBusy(f"Fila de análise cheia ({self.queued} aguardando)")
+
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        self.peak_queued = max(self.peak_queued, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self._wait_seconds += started_at - enqueued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+        except Exception:
+            self.failed += 1
+            raise
+        else:
+            self.completed += 1
+            return result
+        finally:
+            self.running -= 1
+            self._timed += 1
+            self._run_seconds += time.perf_counter() - started_at
+            semaphore.release()
+
+    def stats(self) -> dict:
+        timed = self._timed
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self._wait_seconds / timed * 1e3, 3) if timed else 0.0,
+            "avg_run_ms": round(self._run_seconds / timed * 1e3, 3) if timed else 0.0,
+        }
+
+
+analysis_executor = AnalysisExecutor.from_env()
+
+
+# ══════════════════════════════════════════════════════════════
+# OFFLOADED PIPELINE
+# ══════════════════════════════════════════════════════════════
+
+async def soap_process(raw_text: str, key: str | None = None) -> dict:
+    """
+    Cached soap_engine.process for async handlers: cache lookups stay in this
+    process (so hits are shared across pool workers); only misses go to the
+    executor.
+    """
+    key = key or transcript_key(raw_text)
+    result = cached_process(key)
+    if result is None:
+        result = await analysis_executor.run(soap_engine.process, raw_text)
+        store_process(key, result)
+    return result
@@ -0,0 +1,84 @@
+"""
+services/bulk.py — Bulk SOAP Processing
+Medical Scribe Enterprise v3.0
+process_many(): backfills / re-analysis over a process pool, streaming results
+back in input order with a bounded number of transcripts in flight.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator
+
+from services import soap_engine
+
+
+# ══════════════════════════════════════════════════════════════
+# WORKER SIDE
+# ══════════════════════════════════════════════════════════════
+
+def _process_chunk(texts: list[str]) -> list[dict]:
+    results = []
+    for text in texts:
+        try:
+            results.append(soap_engine.process(text))
+        except Exception as e:
+            # One bad transcript must not abort a multi-GB backfill
+            results.append({"success": False, "error": f"Erro no processamento: {e}"})
+    return results
+
+
+# ══════════════════════════════════════════════════════════════
+# DRIVER
+# ══════════════════════════════════════════════════════════════
+
+def process_many(
+    texts: Iterable[str],
+    workers: int | None = None,
+    chunksize: int = 16,
+    prefetch: int = 2,
+) -> Iterator[dict]:
+    """
+    Yields soap_engine.process(text) for every text, in input order; "dialog"
+    is encoded spans, see dialog_spans.materialize() for the text form.
+
+    The input is consumed lazily and at most workers × prefetch chunks
+    (× chunksize transcripts) are in flight, so memory stays bounded no matter
+    how large the input is. workers=1 runs inline without a pool.
+    """
+    workers = workers or os.cpu_count() or 1
+    if chunksize < 1 or prefetch < 1:
+        raise ValueError("chunksize and prefetch must be >= 1")
+
+    source = iter(texts)
+
+    def next_chunk() -> list[str]:
+        return list(islice(source, chunksize))
+
+    if workers == 1:
+        while chunk := next_chunk():
+            yield from _process_chunk(chunk)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=soap_engine.warm_up) as pool:
+        in_flight = deque()
+        max_in_flight = workers * prefetch
+
+        def refill():
+            while len(in_flight) < max_in_flight:
+                chunk = next_chunk()
+                if not chunk:
+                    return
+                in_flight.append(pool.submit(_process_chunk, chunk))
+
+        try:
+            refill()
+            while in_flight:
+                results = in_flight.popleft().result()
+                refill()
+                yield from results
+        finally:
+            # Consumer stopped early: drop queued chunks instead of finishing them
+            for future in in_flight:
+                future.cancel()
@@ -0,0 +1,108 @@
+"""
+services/cid_database.py — Inline CID-10 keyword table
+Medical Scribe Enterprise v3.0
+Kept apart from soap_engine so the index builder can read it without
+importing the engine (which maps the existing index at import time).
+"""
+
+
+# ══════════════════════════════════════════════════════════════
+# CID-10 DATABASE (same ~95 entries from soap-engine.js)
+# ══════════════════════════════════════════════════════════════
+
+CID_DATABASE: dict[str, dict[str, str]] = {
+    # ── Emergência: Sepse ──
+    "sepse grave": {"code": "A41.9", "desc": "Sepse grave"},
+    "choque séptico": {"code": "R65.1", "desc": "Choque séptico"},
+    "sirs": {"code": "R65.1", "desc": "Síndrome da resposta inflamatória sistêmica"},
+    "bacteremia": {"code": "A49.9", "desc": "Bacteremia"},
+    "sepse": {"code": "A41", "desc": "Septicemia"},
+
+    # ── Emergência: IAM / SCA ──
+    "iamcsst": {"code": "I21.0", "desc": "IAM com supra de ST (IAMCSST)"},
+    "iamssst": {"code": "I21.4", "desc": "IAM sem supra de ST (IAMSSST)"},
+    "síndrome coronariana aguda": {"code": "I24.9", "desc": "Síndrome coronariana aguda"},
+    "síndrome coronariana": {"code": "I24.9", "desc": "Síndrome coronariana aguda"},
+    "angina instável": {"code": "I20.0", "desc": "Angina instável"},
+    "iam": {"code": "I21", "desc": "Infarto agudo do miocárdio"},
+    "infarto": {"code": "I21", "desc": "Infarto agudo do miocárdio"},
+
+    # ── Emergência: AVC ──
+    "avc isquêmico": {"code": "I63", "desc": "AVC isquêmico"},
+    "avc hemorrágico": {"code": "I61", "desc": "AVC hemorrágico"},
+    "ataque isquêmico transitório": {"code": "G45", "desc": "Ataque isquêmico transitório (AIT)"},
+    "ait": {"code": "G45", "desc": "Ataque isquêmico transitório (AIT)"},
+    "avc": {"code": "I64", "desc": "Acidente vascular cerebral"},
+    "derrame": {"code": "I64", "desc": "Acidente vascular cerebral"},
+
+    # ── Emergência: Choque ──
+    "choque hipovolêmico": {"code": "R57.1", "desc": "Choque hipovolêmico"},
+    "choque cardiogênico": {"code": "R57.0", "desc": "Choque cardiogênico"},
+    "choque anafilático": {"code": "T78.2", "desc": "Choque anafilático"},
+    "choque distributivo": {"code": "R57.8", "desc": "Choque distributivo"},
+
+    # ── Terapia Intensiva (UTI) ──
+    "sdra": {"code": "J80", "desc": "Síndrome do desconforto respiratório agudo"},
+    "insuficiência respiratória aguda": {"code": "J96.0", "desc": "Insuficiência respiratória aguda"},
+    "insuficiência respiratória": {"code": "J96", "desc": "Insuficiência respiratória"},
+    "parada cardiorrespiratória": {"code": "I46", "desc": "Parada cardiorrespiratória"},
+    "pcr": {"code": "I46", "desc": "Parada cardiorrespiratória"},
+    "ventilação mecânica": {"code": "Z99.1", "desc": "Dependência de ventilação mecânica"},
+    "rabdomiólise": {"code": "M62.8", "desc": "Rabdomiólise"},
+    "civd": {"code": "D65", "desc": "Coagulação intravascular disseminada"},
+    "politrauma": {"code": "T07", "desc": "Politraumatismo"},
+    "edema cerebral": {"code": "G93.6", "desc": "Edema cerebral"},
+    "status epilepticus": {"code": "G41", "desc": "Estado de mal epiléptico"},
+    "cetoacidose diabética": {"code": "E10.1", "desc": "Cetoacidose diabética"},
+    "crise hipertensiva": {"code": "I16", "desc": "Crise hipertensiva"},
+    "tamponamento cardíaco": {"code": "I31.4", "desc": "Tamponamento cardíaco"},
+    "tromboembolismo pulmonar": {"code": "I26", "desc": "Tromboembolismo pulmonar"},
+    "tep": {"code": "I26", "desc": "Tromboembolismo pulmonar"},
+
+    # ── Condições comuns ──
+    "hipertensão": {"code": "I10", "desc": "Hipertensão essencial (primária)"},
+    "pressão alta": {"code": "I10", "desc": "Hipertensão essencial (primária)"},
+    "diabetes tipo 2": {"code": "E11", "desc": "Diabetes mellitus tipo 2"},
+    "diabetes tipo 1": {"code": "E10", "desc": "Diabetes mellitus tipo 1"},
+    "diabetes": {"code": "E11", "desc": "Diabetes mellitus tipo 2"},
+    "asma": {"code": "J45", "desc": "Asma"},
+    "pneumonia": {"code": "J18", "desc": "Pneumonia"},
+    "covid": {"code": "U07.1", "desc": "COVID-19"},
+    "gripe": {"code": "J11", "desc": "Influenza"},
+    "infecção urinária": {"code": "N39.0", "desc": "Infecção do trato urinário"},
+    "itu": {"code": "N39.0", "desc": "Infecção do trato urinário"},
+    "cefaleia": {"code": "R51", "desc": "Cefaleia"},
+    "dor de cabeça": {"code": "R51", "desc": "Cefaleia"},
+    "enxaqueca": {"code": "G43", "desc": "Enxaqueca"},
+    "lombalgia": {"code": "M54.5", "desc": "Lombalgia"},
+    "dor lombar": {"code": "M54.5", "desc": "Lombalgia"},
+    "dor nas costas": {"code": "M54.5", "desc": "Lombalgia"},
+    "gastrite": {"code": "K29", "desc": "Gastrite"},
+    "dor abdominal": {"code": "R10", "desc": "Dor abdominal"},
+    "dor no peito": {"code": "R07", "desc": "Dor torácica"},
+    "dor torácica": {"code": "R07", "desc": "Dor torácica"},
+    "febre": {"code": "R50", "desc": "Febre de origem desconhecida"},
+    "tosse": {"code": "R05", "desc": "Tosse"},
+    "dispneia": {"code": "R06.0", "desc": "Dispneia"},
+    "falta de ar": {"code": "R06.0", "desc": "Dispneia"},
+    "ansiedade": {"code": "F41", "desc": "Transtornos ansiosos"},
+    "depressão": {"code": "F32", "desc": "Episódio depressivo"},
+    "insônia": {"code": "G47.0", "desc": "Insônia"},
+    "alergia": {"code": "T78.4", "desc": "Alergia não especificada"},
+    "rinite": {"code": "J30", "desc": "Rinite alérgica"},
+    "sinusite": {"code": "J32", "desc": "Sinusite crônica"},
+    "otite": {"code": "H66", "desc": "Otite média"},
+    "dor de ouvido": {"code": "H66", "desc": "Otite média"},
+    "faringite": {"code": "J02", "desc": "Faringite aguda"},
+    "dor de garganta": {"code": "J02", "desc": "Faringite aguda"},
+    "dengue": {"code": "A90", "desc": "Dengue"},
+    "diarreia": {"code": "A09", "desc": "Diarreia e gastroenterite"},
+    "vômito": {"code": "R11", "desc": "Náusea e vômitos"},
+    "fratura": {"code": "T14.2", "desc": "Fratura de região do corpo não especificada"},
+    "entorse": {"code": "T14.3", "desc": "Luxação, entorse de região não especificada"},
+    "icc": {"code": "I50", "desc": "Insuficiência cardíaca"},
+    "insuficiência cardíaca": {"code": "I50", "desc": "Insuficiência cardíaca"},
+    "dpoc": {"code": "J44", "desc": "Doença pulmonar obstrutiva crônica"},
+    "insuficiência renal": {"code": "N18", "desc": "Doença renal crônica"},
+    "irc": {"code": "N18", "desc": "Doença renal crônica"},
+}
@@ -0,0 +1,417 @@
+"""
+services/cid_index.py — Compact CID-10 Index
+Medical Scribe Enterprise v3.0
+Compiles the CID-10 catalogue into a read-only binary file (sorted code table
++ Aho-Corasick keyword trie) that every uvicorn worker memory-maps.
+
+Build:  python -m services.cid_index build [--catalogue data/cid10.csv] [--out data/cid10.idx]
+"""
+
+import argparse
+import bisect
+import csv
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from pathlib import Path
+
+
+# ══════════════════════════════════════════════════════════════
+# FILE LAYOUT
+# ══════════════════════════════════════════════════════════════
+#
+#   header   | magic, version, counts and section offsets
+#   nodes    | 6 columns × n_nodes u32: first_edge, n_edges, fail, kw, dict_link,
+#              best (lowest keyword id on the node's output chain)
+#   edges    | 2 columns × n_edges u32: char, target          sorted per node
+#   codes    | n_codes  × (code 8s, desc_off I, desc_len H)      sorted by code
+#   keywords | n_kw     × (code_idx I, desc_off I, desc_len H, length H)
+#              ordered by priority (lower id wins); desc_len 0 → code's desc
+#   strings  | UTF-8 blob
+#
+# Node and edge columns sit right after the 48-byte header, 4-byte aligned,
+# so the reader maps them as zero-copy u32 memoryviews.
+
+MAGIC = b"CID10IX1"
+VERSION = 3  # v2: keywords are accent-folded; v3: columnar nodes/edges + best
+
+_HEADER = struct.Struct("<8sHHIIIIIIIII")
+_CODE = struct.Struct("<8sIH")
+_KEYWORD = struct.Struct("<IIHH")
+_NODE_COLUMNS = 6
+_EDGE_COLUMNS = 2
+
+# Memoized automaton transitions per worker (state, char) → state; cleared when full
+_DELTA_CACHE = 1 << 18
+
+_NONE = 0xFFFFFFFF
+
+logger = logging.getLogger("medical-scribe")
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_CATALOGUE = BACKEND_ROOT / "data" / "cid10.csv"
+DEFAULT_INDEX = BACKEND_ROOT / "data" / "cid10.idx"
+
+
+# ══════════════════════════════════════════════════════════════
+# BUILD
+# ══════════════════════════════════════════════════════════════
+
+def _format_code(raw: str) -> str:
+    """DATASUS subcategories come without the dot: "A009" → "A00.9"."""
+    raw = raw.strip().upper()
+    if len(raw) == 4 and "." not in raw:
+        return f"{raw[:3]}.{raw[3]}"
+    return raw
+
+
+def read_catalogue(path: Path, encoding: str = "utf-8") -> list[tuple[str, str, list[str]]]:
+    """
+    Reads a ';'-separated catalogue. Accepted headers:
+    - code;desc;synonyms   (synonyms separated by "|")
+    - DATASUS CID-10-SUBCATEGORIAS / CATEGORIAS (SUBCAT|CAT, DESCRICAO, DESCRABREV)
+    """
+    entries = []
+    with open(path, "r", encoding=encoding, newline="") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            code = row.get("code") or row.get("SUBCAT") or row.get("CAT") or ""
+            desc = (row.get("desc") or row.get("DESCRICAO") or "").strip()
+            if not code or not desc:
+                continue
+            synonyms = [s.strip() for s in (row.get("synonyms") or "").split("|") if s.strip()]
+            abbrev = (row.get("DESCRABREV") or "").strip()
+            if abbrev and abbrev != desc:
+                synonyms.append(abbrev)
+            entries.append((_format_code(code), desc, synonyms))
+    return entries
+
+
+def build_index(catalogue: list[tuple[str, str, list[str]]], out_path: Path) -> dict:
+    """
+    Writes the binary index. The engine's inline CID_DATABASE keywords come
+    first so their priority (and the current engine output) is preserved;
+    catalogue descriptions and synonyms follow in file order.
+    """
+    from services.cid_database import CID_DATABASE
+    from services.text_analysis import fold
+
+    codes: dict[str, str] = {}
+    for code, desc, _ in catalogue:
+        codes.setdefault(code, desc)
+    for info in CID_DATABASE.values():
+        codes.setdefault(info["code"], info["desc"])
+
+    # keyword → (code, desc override or None); first occurrence wins
+    keywords: dict[str, tuple[str, str | None]] = {}
+    for keyword, info in CID_DATABASE.items():
+        override = info["desc"] if info["desc"] != codes[info["code"]] else None
+        keywords.setdefault(fold(keyword), (info["code"], override))
+    for code, desc, synonyms in catalogue:
+        for term in (desc, *synonyms):
+            keywords.setdefault(fold(term), (code, None))
+
+    # ── Strings ──
+    blob = bytearray()
+    offsets: dict[str, tuple[int, int]] = {}
+
+    def intern(s: str) -> tuple[int, int]:
+        if s not in offsets:
+            data = s.encode("utf-8")[:0xFFFF]
+            offsets[s] = (len(blob), len(data))
+            blob.extend(data)
+        return offsets[s]
+
+    sorted_codes = sorted(codes)
+    code_idx = {code: i for i, code in enumerate(sorted_codes)}
+    code_rows = [(code.encode("ascii")[:8], *intern(codes[code])) for code in sorted_codes]
+
+    kw_list = list(keywords)
+    kw_rows = []
+    for keyword in kw_list:
+        code, override = keywords[keyword]
+        off, length = intern(override) if override else (0, 0)
+        kw_rows.append((code_idx[code], off, length, len(keyword)))
+
+    # ── Trie + failure links ──
+    goto: list[dict[str, int]] = [{}]
+    node_kw = [_NONE]
+    for kw_id, keyword in enumerate(kw_list):
+        state = 0
+        for char in keyword:
+            nxt = goto[state].get(char)
+            if nxt is None:
+                nxt = len(goto)
+                goto[state][char] = nxt
+                goto.append({})
+                node_kw.append(_NONE)
+            state = nxt
+        node_kw[state] = kw_id
+
+    fail = [0] * len(goto)
+    dict_link = [0] * len(goto)
+    order = [0]
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        order.append(state)
+        for char, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and char not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(char, 0)
+            target = fail[nxt]
+            dict_link[nxt] = target if node_kw[target] != _NONE else dict_link[target]
+
+    # Lowest keyword id reachable through the output chain (BFS order: links first)
+    best = [_NONE] * len(goto)
+    for state in order:
+        best[state] = min(node_kw[state], best[dict_link[state]]) if state else node_kw[0]
+
+    nodes = [array("I") for _ in range(_NODE_COLUMNS)]
+    edge_chars, edge_targets = array("I"), array("I")
+    for state, edges in enumerate(goto):
+        for column, value in zip(nodes, (len(edge_chars), len(edges), fail[state], node_kw[state],
+                                         dict_link[state], best[state])):
+            column.append(value)
+        for char, target in sorted(edges.items(), key=lambda e: ord(e[0])):
+            edge_chars.append(ord(char))
+            edge_targets.append(target)
+    if sys.byteorder != "little":
+        for column in (*nodes, edge_chars, edge_targets):
+            column.byteswap()
+
+    # ── Serialize ──
+    n_nodes, n_edges = len(goto), len(edge_chars)
+    off_nodes = _HEADER.size
+    off_edges = off_nodes + 4 * _NODE_COLUMNS * n_nodes
+    off_codes = off_edges + 4 * _EDGE_COLUMNS * n_edges
+    off_keywords = off_codes + _CODE.size * len(code_rows)
+    off_strings = off_keywords + _KEYWORD.size * len(kw_rows)
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(
+            MAGIC, VERSION, 0, len(code_rows), len(kw_rows), n_nodes, n_edges,
+            off_codes, off_keywords, off_nodes, off_edges, off_strings,
+        ))
+        for column in (*nodes, edge_chars, edge_targets):
+            column.tofile(f)
+        for row in code_rows:
+            f.write(_CODE.pack(*row))
+        for row in kw_rows:
+            f.write(_KEYWORD.pack(*row))
+        f.write(blob)
+    # Atomic swap: running workers keep their old mapping until restart
+    os.replace(tmp_path, out_path)
+
+    return {
+        "codes": len(code_rows),
+        "keywords": len(kw_rows),
+        "nodes": n_nodes,
+        "bytes": off_strings + len(blob),
+    }
+
+
+# ══════════════════════════════════════════════════════════════
+# READ (memory-mapped)
+# ══════════════════════════════════════════════════════════════
+
+class CidIndex:
+    """Read-only view over a memory-mapped index file."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._mm) < _HEADER.size:
+            self._mm.close()
+            raise ValueError(f"Invalid CID index file: {path} (truncated header)")
+        (magic, version, _, self.n_codes, self.n_keywords, self.n_nodes, self.n_edges,
+         self._off_codes, self._off_keywords, self._off_nodes, self._off_edges,
+         self._off_strings) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self._mm.close()
+            raise ValueError(f"Invalid CID index file: {path}")
+        if version != VERSION:
+            self._mm.close()
+            raise ValueError(f"Stale CID index file: {path} (v{version}, expected v{VERSION})")
+
+        if sys.byteorder != "little":
+            self._mm.close()
+            raise ValueError(f"CID index needs a little-endian host: {path}")
+
+        self.path = Path(path)
+        # Zero-copy u32 columns over the mapping (shared by forked workers)
+        nodes = memoryview(self._mm)[self._off_nodes:self._off_edges].cast("I")
+        n = self.n_nodes
+        (self._first_edge, self._n_edges, self._fail, self._kw, self._dict_link,
+         self._best) = (nodes[i * n:(i + 1) * n] for i in range(_NODE_COLUMNS))
+        edges = memoryview(self._mm)[self._off_edges:self._off_codes].cast("I")
+        self._edge_chars, self._edge_targets = edges[:self.n_edges], edges[self.n_edges:]
+        # Full transitions (failure links resolved), filled as the text needs them
+        self._delta: dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self.n_codes
+
+    def close(self):
+        for view in (self._first_edge, self._n_edges, self._fail, self._kw, self._dict_link, self._best,
+                     self._edge_chars, self._edge_targets):
+            view.release()
+        self._mm.close()
+
+    # ── Low-level accessors ──
+
+    def _string(self, off: int, length: int) -> str:
+        start = self._off_strings + off
+        return self._mm[start:start + length].decode("utf-8")
+
+    def _code_row(self, idx: int) -> tuple[str, int, int]:
+        code, off, length = _CODE.unpack_from(self._mm, self._off_codes + idx * _CODE.size)
+        return code.rstrip(b"\0").decode("ascii"), off, length
+
+    def _step(self, state: int, cp: int) -> int | None:
+        """Goto edge of `state` on `cp` (binary search in the node's sorted edge slice)."""
+        first = self._first_edge[state]
+        last = first + self._n_edges[state]
+        i = bisect.bisect_left(self._edge_chars, cp, first, last)
+        if i < last and self._edge_chars[i] == cp:
+            return self._edge_targets[i]
+        return None
+
+    def _next(self, state: int, cp: int) -> int:
+        """Automaton transition with failure links followed; memoized in _delta."""
+        key = state * 0x110000 + cp
+        target = self._delta.get(key)
+        if target is None:
+            s = state
+            target = self._step(s, cp)
+            while target is None and s:
+                s = self._fail[s]
+                target = self._step(s, cp)
+            target = target or 0
+            if len(self._delta) >= _DELTA_CACHE:
+                self._delta.clear()
+            self._delta[key] = target
+        return target
+
+    # ── Public API ──
+
+    def code_at(self, idx: int) -> dict:
+        code, off, length = self._code_row(idx)
+        return {"code": code, "desc": self._string(off, length)}
+
+    def lookup(self, code: str) -> dict | None:
+        """Binary search on the sorted code table."""
+        code = code.strip().upper()
+        idx = bisect.bisect_left(range(self.n_codes), code, key=lambda i: self._code_row(i)[0])
+        if idx < self.n_codes and self._code_row(idx)[0] == code:
+            return self.code_at(idx)
+        return None
+
+    def keyword_info(self, kw_id: int) -> dict:
+        code_idx, off, length, _ = _KEYWORD.unpack_from(self._mm, self._off_keywords + kw_id * _KEYWORD.size)
+        info = self.code_at(code_idx)
+        if length:
+            info["desc"] = self._string(off, length)
+        return info
+
+    def iter_matches(self, folded: str):
+        """Yield (start, end, keyword_id) for every keyword in an already-folded text."""
+        _, matches = self.advance(folded)
+        return iter(matches)
+
+    def advance(self, folded: str, state: int = 0, offset: int = 0) -> tuple[int, list[tuple[int, int, int]]]:
+        """Streaming scan from `state` (see KeywordMatcher.feed). Returns (new_state, matches)."""
+        delta, step, best, kw_of, link_of = self._delta, self._next, self._best, self._kw, self._dict_link
+        matches = []
+        for pos, char in enumerate(folded, offset + 1):
+            key = state * 0x110000 + ord(char)
+            state = delta.get(key)
+            if state is None:
+                state = step(key // 0x110000, key % 0x110000)
+            if best[state] == _NONE:
+                continue  # nothing ends here (the common case)
+            node = state
+            while True:
+                kw = kw_of[node]
+                if kw != _NONE:
+                    length = _KEYWORD.unpack_from(self._mm, self._off_keywords + kw * _KEYWORD.size)[3]
+                    matches.append((pos - length, pos, kw))
+                node = link_of[node]
+                if not node:
+                    break
+        return state, matches
+
+    def resolve(self, folded: str) -> dict | None:
+        """Highest-priority CID whose keyword appears in the text (same rule as the inline dict)."""
+        delta, step, best_of = self._delta, self._next, self._best
+        state, best = 0, _NONE
+        for char in folded:
+            key = state * 0x110000 + ord(char)
+            state = delta.get(key)
+            if state is None:
+                state = step(key // 0x110000, key % 0x110000)
+            if best_of[state] < best:
+                best = best_of[state]
+        return self.keyword_info(best) if best != _NONE else None
+
+
+def load_default() -> CidIndex | None:
+    """
+    Maps CID_INDEX_PATH (or data/cid10.idx). None → engine uses the inline dict.
+    A stale or unreadable file is logged and skipped rather than failing the
+    import: the app keeps serving, and `build` can replace it. So is an index
+    built without a catalogue: it holds only the inline keywords, and the
+    inline matcher finds the same CID for less.
+    """
+    from services.cid_database import CID_DATABASE
+    from services.text_analysis import fold
+
+    path = Path(os.getenv("CID_INDEX_PATH", str(DEFAULT_INDEX)))
+    if not path.exists():
+        return None
+    try:
+        index = CidIndex(path)
+    except (OSError, ValueError) as exc:
+        logger.warning(f"CID index ignored, using inline CID_DATABASE: {exc} — rebuild with `python -m services.cid_index build`")
+        return None
+    if index.n_keywords <= len({fold(keyword) for keyword in CID_DATABASE}):
+        logger.info(f"CID index {path} has no catalogue entries; using inline CID_DATABASE")
+        index.close()
+        return None
+    return index
+
+
+# ══════════════════════════════════════════════════════════════
+# CLI
+# ══════════════════════════════════════════════════════════════
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m services.cid_index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Compile the CID-10 catalogue into a binary index")
+    build.add_argument("--catalogue", type=Path, default=None)
+    build.add_argument("--encoding", default="utf-8", help="DATASUS files are latin-1")
+    build.add_argument("--out", type=Path, default=DEFAULT_INDEX)
+    args = parser.parse_args(argv)
+
+    catalogue_path = args.catalogue or (DEFAULT_CATALOGUE if DEFAULT_CATALOGUE.exists() else None)
+    catalogue = read_catalogue(catalogue_path, args.encoding) if catalogue_path else []
+    stats = build_index(catalogue, args.out)
+    print(
+        f"CID index → {args.out}: {stats['codes']} codes, {stats['keywords']} keywords, "
+        f"{stats['nodes']} trie nodes, {stats['bytes']} bytes"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
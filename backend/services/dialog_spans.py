@@ -0,0 +1,119 @@
+"""
+services/dialog_spans.py — Offset-Based Dialog
+Medical Scribe Enterprise v3.0
+The diarized dialog as (speaker, start, end) spans into the transcript
+instead of a copy of every sentence. Spans live in parallel typed arrays
+and travel/store as columnar JSON; text is cut out of the transcript only
+when a client asks for it.
+
+Encoded form (gaps and lengths keep the numbers small):
+    {"v": 1, "speakers": ["medico", "paciente"],
+     "speaker": [0, 1, ...], "gap": [0, 2, ...], "len": [41, 63, ...]}
+where start[i] = end[i-1] + gap[i] (end[-1] = 0) and end[i] = start[i] + len[i].
+Offsets index normalize(transcript), not the transcript as received: the
+engine processes that form, so clients and stored rows can keep the raw text.
+"""
+
+from array import array
+from typing import Iterable, Iterator
+
+FORMAT_VERSION = 1
+SPEAKERS = ("medico", "paciente")
+
+
+def normalize(text: str) -> str:
+    """The text spans point into: CRLF → LF, surrounding whitespace stripped."""
+    return text.replace("\r\n", "\n").strip()
+
+
+class DialogSpans:
+    """Array-backed spans; one byte of speaker code + two uint32 offsets per line."""
+
+    __slots__ = ("speaker_names", "speakers", "starts", "ends")
+
+    def __init__(self, speaker_names: Iterable[str] = SPEAKERS):
+        self.speaker_names = list(speaker_names)
+        self.speakers = array("B")
+        self.starts = array("I")
+        self.ends = array("I")
+
+    @classmethod
+    def from_tags(cls, tags) -> "DialogSpans":
+        """From soap_engine LineTags (anything with .speaker, .start, .end)."""
+        spans = cls()
+        for tag in tags:
+            spans.append(tag.speaker, tag.start, tag.end)
+        return spans
+
+    def append(self, speaker: str, start: int, end: int) -> None:
+        try:
+            code = self.speaker_names.index(speaker)
+        except ValueError:
+            code = len(self.speaker_names)
+            self.speaker_names.append(speaker)
+        self.speakers.append(code)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.speakers)
+
+    def __iter__(self) -> Iterator[tuple[str, int, int]]:
+        names = self.speaker_names
+        for code, start, end in zip(self.speakers, self.starts, self.ends):
+            yield names[code], start, end
+
+    def count(self, speaker: str) -> int:
+        if speaker not in self.speaker_names:
+            return 0
+        return self.speakers.count(self.speaker_names.index(speaker))
+
+    # ── Materialization ──
+
+    def materialize(self, text: str) -> list[dict]:
+        """[{"speaker", "text"}] — the shape diarize() returns — cut from `text`."""
+        return [{"speaker": speaker, "text": text[start:end]} for speaker, start, end in self]
+
+    # ── Columnar JSON ──
+
+    def encode(self) -> dict:
+        gaps, lengths, previous_end = [], [], 0
+        for start, end in zip(self.starts, self.ends):
+            gaps.append(start - previous_end)
+            lengths.append(end - start)
+            previous_end = end
+        return {
+            "v": FORMAT_VERSION,
+            "speakers": list(self.speaker_names),
+            "speaker": self.speakers.tolist(),
+            "gap": gaps,
+            "len": lengths,
+        }
+
+    @classmethod
+    def decode(cls, data: dict) -> "DialogSpans":
+        if data.get("v") != FORMAT_VERSION:
+            raise ValueError(f"Formato de diálogo desconhecido: {data.get('v')!r}")
+        spans = cls(data["speakers"])
+        spans.speakers = array("B", data["speaker"])
+        position = 0
+        for gap, length in zip(data["gap"], data["len"]):
+            position += gap
+            spans.starts.append(position)
+            position += length
+            spans.ends.append(position)
+        return spans
+
+
+def is_encoded(dialog) -> bool:
+    """Stored dialogs from before spans are plain [{"speaker", "text"}] lists."""
+    return isinstance(dialog, dict) and "speaker" in dialog
+
+
+def materialize(dialog, text: str | None) -> list[dict]:
+    """Text dialog from either stored form; `text` is the transcript as received."""
+    if dialog is None:
+        return []
+    if not is_encoded(dialog):
+        return dialog
+    return DialogSpans.decode(dialog).materialize(normalize(text or ""))
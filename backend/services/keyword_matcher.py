@@ -0,0 +1,93 @@
+"""
+services/keyword_matcher.py — Multi-Keyword Matcher
+Medical Scribe Enterprise v3.0
+Aho-Corasick automaton: finds every dictionary keyword in one linear pass
+"""
+
+from collections import deque
+
+
+# ══════════════════════════════════════════════════════════════
+# AUTOMATON
+# ══════════════════════════════════════════════════════════════
+
+class KeywordMatcher:
+    """
+    Compiled Aho-Corasick automaton over a fixed keyword set.
+    Build once (at import), then scan any text in O(len(text) + hits),
+    regardless of how many keywords the dictionaries hold.
+    Matching is plain substring matching, same as `keyword in text`.
+    """
+
+    __slots__ = ("keywords", "_goto", "_fail", "_out")
+
+    def __init__(self, keywords):
+        # Deduplicate but keep first-seen order (ids are stable)
+        self.keywords: tuple[str, ...] = tuple(dict.fromkeys(k for k in keywords if k))
+
+        goto: list[dict[str, int]] = [{}]
+        out: list[tuple[int, ...]] = [()]
+
+        # ── Trie ──
+        for kw_id, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][char] = nxt
+                    goto.append({})
+                    out.append(())
+                state = nxt
+            out[state] = out[state] + (kw_id,)
+
+        # ── Failure links (BFS), outputs merged along the fail chain ──
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(char, 0)
+                out[nxt] = out[nxt] + out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = out
+
+    def iter_matches(self, text: str):
+        """Yield (start, end, keyword) for every occurrence, overlapping included."""
+        _, matches = self.feed(text)
+        return iter(matches)
+
+    def feed(self, text: str, state: int = 0, offset: int = 0) -> tuple[int, list[tuple[int, int, str]]]:
+        """
+        Streaming scan: continue from `state` (returned by the previous call)
+        with `text` starting at absolute `offset`. Keywords that straddle two
+        chunks are still found. Returns (new_state, matches).
+        """
+        goto, fail, out, keywords = self._goto, self._fail, self._out, self.keywords
+        matches = []
+        for pos, char in enumerate(text, offset + 1):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for kw_id in out[state]:
+                keyword = keywords[kw_id]
+                matches.append((pos - len(keyword), pos, keyword))
+        return state, matches
+
+    def find_all(self, text: str) -> list[tuple[int, int, str]]:
+        """All occurrences as (start, end, keyword), ordered by end position."""
+        return list(self.iter_matches(text))
+
+    def first_positions(self, text: str) -> dict[str, int]:
+        """Keyword → start offset of its first occurrence (same as str.find)."""
+        first: dict[str, int] = {}
+        for start, _end, keyword in self.iter_matches(text):
+            # Matches arrive in end order, so the first hit per keyword is the leftmost
+            first.setdefault(keyword, start)
+        return first
@@ -0,0 +1,192 @@
+"""
+services/result_cache.py — Content-Addressed Analysis Cache
+Medical Scribe Enterprise v3.0
+Bounded LRU (entries + bytes) with TTL for soap_engine.process and
+documents.generate_all. Keyed by sha256(normalized transcript + rules version).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from services import soap_engine
+from services.dialog_spans import normalize
+from services.documents import generate_all
+
+
+# ══════════════════════════════════════════════════════════════
+# KEYS
+# ══════════════════════════════════════════════════════════════
+
+def _rules_version() -> str:
+    """Changes whenever a dictionary, pattern or the CID index changes."""
+    h = hashlib.sha256(soap_engine.ENGINE_VERSION.encode())
+    for table in (
+        soap_engine.CID_DATABASE, soap_engine.MED_PATTERNS, soap_engine.ALLERGY_KEYWORDS,
+        soap_engine.COMORBIDITY_PATTERNS, soap_engine.SEVERE_KEYWORDS, soap_engine.MODERATE_KEYWORDS,
+    ):
+        h.update(json.dumps(table, ensure_ascii=False, sort_keys=True).encode())
+    for pattern in (
+        soap_engine.VITALS_PATTERN, soap_engine.EXAM_PATTERN, soap_engine.PLAN_PATTERN,
+        *soap_engine.DOCTOR_PATTERNS, *soap_engine.PATIENT_PATTERNS,
+    ):
+        h.update(pattern.pattern.encode())
+    if soap_engine.CID_INDEX is not None:
+        stat = soap_engine.CID_INDEX.path.stat()
+        h.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return h.hexdigest()[:16]
+
+
+RULES_VERSION = _rules_version()
+
+
+def normalize_transcript(raw_text: str) -> str:
+    """
+    Output-preserving normalization: the engine strips every line, ignores
+    CR before LF and places dialog spans in dialog_spans.normalize() text, so
+    these variants always produce the same result.
+    """
+    return normalize(raw_text)
+
+
+def transcript_key(raw_text: str) -> str:
+    normalized = normalize_transcript(raw_text)
+    return hashlib.sha256(f"{RULES_VERSION}\0{normalized}".encode()).hexdigest()
+
+
+# ══════════════════════════════════════════════════════════════
+# CACHE
+# ══════════════════════════════════════════════════════════════
+
+class ResultCache:
+    """
+    Thread-safe LRU of JSON-serialized results. Values are stored as bytes:
+    size accounting is exact and every hit returns a fresh, mutable copy.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            payload = entry[1]
+        return json.loads(payload)
+
+    def put(self, key: str, value) -> None:
+        if not self.enabled:
+            return
+        payload = json.dumps(value, ensure_ascii=False).encode()
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl_seconds, payload)
+            self._bytes += len(payload)
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+            # Opportunistically purge expired entries from the cold end
+            now = time.monotonic()
+            while self._data:
+                oldest = next(iter(self._data))
+                if self._data[oldest][0] >= now:
+                    break
+                self._drop(oldest)
+
+    def _drop(self, key: str) -> None:
+        _, payload = self._data.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "rules_version": RULES_VERSION,
+            }
+
+
+analysis_cache = ResultCache(
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024),
+    ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", "600")),
+)
+
+
+# ══════════════════════════════════════════════════════════════
+# CACHED PIPELINE
+# ══════════════════════════════════════════════════════════════
+
+def cached_process(key: str) -> dict | None:
+    """Cached soap_engine.process result for `key` (fresh processado_em), or None."""
+    if not analysis_cache.enabled:
+        return None
+    result = analysis_cache.get(f"soap:{key}")
+    if result is not None:
+        result["metadata"]["processado_em"] = datetime.now().isoformat()
+    return result
+
+
+def store_process(key: str, result: dict) -> None:
+    if result.get("success"):
+        analysis_cache.put(f"soap:{key}", result)
+
+
+def generate_documents(soap_result: dict, patient_data: dict, key: str | None = None) -> dict:
+    """
+    documents.generate_all with caching. Documents depend on the transcript and
+    on the patient's initials/age only; timestamps are refreshed on every call.
+    """
+    if not analysis_cache.enabled or key is None:
+        return generate_all(soap_result, patient_data)
+
+    doc_key = f"docs:{key}:{patient_data.get('iniciais')}:{patient_data.get('idade')}"
+    documents = analysis_cache.get(doc_key)
+    if documents is None:
+        documents = generate_all(soap_result, patient_data)
+        analysis_cache.put(doc_key, documents)
+        return documents
+
+    now = datetime.now().isoformat()
+    for doc in documents.values():
+        doc["timestamp"] = now
+    return documents
@@ -5,110 +5,25 @@ Direct translation of soap-engine.js
 CID_DATABASE, extractVitalSigns, diarize, extractClinicalData, buildSOAP, process
 """
 
+import bisect
 import re
 from datetime import datetime
+from typing import NamedTuple
 
+from services import cid_index
+from services.cid_database import CID_DATABASE
+from services.dialog_spans import DialogSpans, normalize
+from services.keyword_matcher import KeywordMatcher
+from services.text_analysis import TextAnalysis, fold
 
-# ══════════════════════════════════════════════════════════════
-# CID-10 DATABASE (same ~95 entries from soap-engine.js)
-# ══════════════════════════════════════════════════════════════
 
-CID_DATABASE: dict[str, dict[str, str]] = {
-    # ── Emergência: Sepse ──
-    "sepse grave": {"code": "A41.9", "desc": "Sepse grave"},
-    "choque séptico": {"code": "R65.1", "desc": "Choque séptico"},
-    "sirs": {"code": "R65.1", "desc": "Síndrome da resposta inflamatória sistêmica"},
-    "bacteremia": {"code": "A49.9", "desc": "Bacteremia"},
-    "sepse": {"code": "A41", "desc": "Septicemia"},
-
-    # ── Emergência: IAM / SCA ──
-    "iamcsst": {"code": "I21.0", "desc": "IAM com supra de ST (IAMCSST)"},
-    "iamssst": {"code": "I21.4", "desc": "IAM sem supra de ST (IAMSSST)"},
-    "síndrome coronariana aguda": {"code": "I24.9", "desc": "Síndrome coronariana aguda"},
-    "síndrome coronariana": {"code": "I24.9", "desc": "Síndrome coronariana aguda"},
-    "angina instável": {"code": "I20.0", "desc": "Angina instável"},
-    "iam": {"code": "I21", "desc": "Infarto agudo do miocárdio"},
-    "infarto": {"code": "I21", "desc": "Infarto agudo do miocárdio"},
-
-    # ── Emergência: AVC ──
-    "avc isquêmico": {"code": "I63", "desc": "AVC isquêmico"},
-    "avc hemorrágico": {"code": "I61", "desc": "AVC hemorrágico"},
-    "ataque isquêmico transitório": {"code": "G45", "desc": "Ataque isquêmico transitório (AIT)"},
-    "ait": {"code": "G45", "desc": "Ataque isquêmico transitório (AIT)"},
-    "avc": {"code": "I64", "desc": "Acidente vascular cerebral"},
-    "derrame": {"code": "I64", "desc": "Acidente vascular cerebral"},
-
-    # ── Emergência: Choque ──
-    "choque hipovolêmico": {"code": "R57.1", "desc": "Choque hipovolêmico"},
-    "choque cardiogênico": {"code": "R57.0", "desc": "Choque cardiogênico"},
-    "choque anafilático": {"code": "T78.2", "desc": "Choque anafilático"},
-    "choque distributivo": {"code": "R57.8", "desc": "Choque distributivo"},
-
-    # ── Terapia Intensiva (UTI) ──
-    "sdra": {"code": "J80", "desc": "Síndrome do desconforto respiratório agudo"},
-    "insuficiência respiratória aguda": {"code": "J96.0", "desc": "Insuficiência respiratória aguda"},
-    "insuficiência respiratória": {"code": "J96", "desc": "Insuficiência respiratória"},
-    "parada cardiorrespiratória": {"code": "I46", "desc": "Parada cardiorrespiratória"},
-    "pcr": {"code": "I46", "desc": "Parada cardiorrespiratória"},
-    "ventilação mecânica": {"code": "Z99.1", "desc": "Dependência de ventilação mecânica"},
-    "rabdomiólise": {"code": "M62.8", "desc": "Rabdomiólise"},
-    "civd": {"code": "D65", "desc": "Coagulação intravascular disseminada"},
-    "politrauma": {"code": "T07", "desc": "Politraumatismo"},
-    "edema cerebral": {"code": "G93.6", "desc": "Edema cerebral"},
-    "status epilepticus": {"code": "G41", "desc": "Estado de mal epiléptico"},
-    "cetoacidose diabética": {"code": "E10.1", "desc": "Cetoacidose diabética"},
-    "crise hipertensiva": {"code": "I16", "desc": "Crise hipertensiva"},
-    "tamponamento cardíaco": {"code": "I31.4", "desc": "Tamponamento cardíaco"},
-    "tromboembolismo pulmonar": {"code": "I26", "desc": "Tromboembolismo pulmonar"},
-    "tep": {"code": "I26", "desc": "Tromboembolismo pulmonar"},
-
-    # ── Condições comuns ──
-    "hipertensão": {"code": "I10", "desc": "Hipertensão essencial (primária)"},
-    "pressão alta": {"code": "I10", "desc": "Hipertensão essencial (primária)"},
-    "diabetes tipo 2": {"code": "E11", "desc": "Diabetes mellitus tipo 2"},
-    "diabetes tipo 1": {"code": "E10", "desc": "Diabetes mellitus tipo 1"},
-    "diabetes": {"code": "E11", "desc": "Diabetes mellitus tipo 2"},
-    "asma": {"code": "J45", "desc": "Asma"},
-    "pneumonia": {"code": "J18", "desc": "Pneumonia"},
-    "covid": {"code": "U07.1", "desc": "COVID-19"},
-    "gripe": {"code": "J11", "desc": "Influenza"},
-    "infecção urinária": {"code": "N39.0", "desc": "Infecção do trato urinário"},
-    "itu": {"code": "N39.0", "desc": "Infecção do trato urinário"},
-    "cefaleia": {"code": "R51", "desc": "Cefaleia"},
-    "dor de cabeça": {"code": "R51", "desc": "Cefaleia"},
-    "enxaqueca": {"code": "G43", "desc": "Enxaqueca"},
-    "lombalgia": {"code": "M54.5", "desc": "Lombalgia"},
-    "dor lombar": {"code": "M54.5", "desc": "Lombalgia"},
-    "dor nas costas": {"code": "M54.5", "desc": "Lombalgia"},
-    "gastrite": {"code": "K29", "desc": "Gastrite"},
-    "dor abdominal": {"code": "R10", "desc": "Dor abdominal"},
-    "dor no peito": {"code": "R07", "desc": "Dor torácica"},
-    "dor torácica": {"code": "R07", "desc": "Dor torácica"},
-    "febre": {"code": "R50", "desc": "Febre de origem desconhecida"},
-    "tosse": {"code": "R05", "desc": "Tosse"},
-    "dispneia": {"code": "R06.0", "desc": "Dispneia"},
-    "falta de ar": {"code": "R06.0", "desc": "Dispneia"},
-    "ansiedade": {"code": "F41", "desc": "Transtornos ansiosos"},
-    "depressão": {"code": "F32", "desc": "Episódio depressivo"},
-    "insônia": {"code": "G47.0", "desc": "Insônia"},
-    "alergia": {"code": "T78.4", "desc": "Alergia não especificada"},
-    "rinite": {"code": "J30", "desc": "Rinite alérgica"},
-    "sinusite": {"code": "J32", "desc": "Sinusite crônica"},
-    "otite": {"code": "H66", "desc": "Otite média"},
-    "dor de ouvido": {"code": "H66", "desc": "Otite média"},
-    "faringite": {"code": "J02", "desc": "Faringite aguda"},
-    "dor de garganta": {"code": "J02", "desc": "Faringite aguda"},
-    "dengue": {"code": "A90", "desc": "Dengue"},
-    "diarreia": {"code": "A09", "desc": "Diarreia e gastroenterite"},
-    "vômito": {"code": "R11", "desc": "Náusea e vômitos"},
-    "fratura": {"code": "T14.2", "desc": "Fratura de região do corpo não especificada"},
-    "entorse": {"code": "T14.3", "desc": "Luxação, entorse de região não especificada"},
-    "icc": {"code": "I50", "desc": "Insuficiência cardíaca"},
-    "insuficiência cardíaca": {"code": "I50", "desc": "Insuficiência cardíaca"},
-    "dpoc": {"code": "J44", "desc": "Doença pulmonar obstrutiva crônica"},
-    "insuficiência renal": {"code": "N18", "desc": "Doença renal crônica"},
-    "irc": {"code": "N18", "desc": "Doença renal crônica"},
-}
+# Bump whenever extraction logic changes (part of the result-cache key)
+ENGINE_VERSION = "3.1.0"
+
+
+# Full catalogue (memory-mapped, shared by forked workers) when built;
+# otherwise the inline CID_DATABASE is used.
+CID_INDEX = cid_index.load_default()
 
 
 # ══════════════════════════════════════════════════════════════
@@ -129,182 +44,346 @@ MED_PATTERNS: list[str] = [
 # Allergy keywords (same 5 from JS)
 ALLERGY_KEYWORDS: list[str] = ["alergia", "alérgico", "alérgica", "alergias", "intolerância"]
 
+# Comorbidities
+COMORBIDITY_PATTERNS: list[str] = [
+    "hipertensão", "diabetes", "asma", "dpoc", "icc", "insuficiência renal",
+    "insuficiência cardíaca", "hiv", "hepatite", "obesidade", "dislipidemia",
+    "hipotireoidismo", "hipertireoidismo", "epilepsia", "arritmia",
+]
+
+# Severity keywords (same as JS)
+SEVERE_KEYWORDS: list[str] = [
+    "iam", "infarto", "avc", "derrame", "sepse", "pcr", "choque",
+    "rebaixamento", "coma", "hemorragia", "politrauma", "sdra", "civd",
+    "choque séptico", "choque cardiogênico", "tamponamento", "tep",
+    "parada cardiorrespiratória", "status epilepticus", "cetoacidose",
+]
+MODERATE_KEYWORDS: list[str] = [
+    "febre alta", "dispneia", "falta de ar", "taquicardia",
+    "hipotensão", "desidratação", "pneumonia", "fratura",
+    "crise hipertensiva", "angina instável", "insuficiência respiratória",
+    "rabdomiólise", "edema cerebral",
+]
+
+# One automaton over every dictionary above — a single pass per transcript.
+# Keywords are accent-folded, so "pressao alta" and "pressão alta" both match.
+_FOLDED_KEYWORDS: dict[str, str] = {
+    k: fold(k)
+    for k in (
+        *CID_DATABASE, *MED_PATTERNS, *ALLERGY_KEYWORDS,
+        *COMORBIDITY_PATTERNS, *SEVERE_KEYWORDS, *MODERATE_KEYWORDS,
+    )
+}
+CLINICAL_MATCHER = KeywordMatcher(_FOLDED_KEYWORDS.values())
+
 
 # ══════════════════════════════════════════════════════════════
 # FUNCTIONS — direct translation from soap-engine.js
 # ══════════════════════════════════════════════════════════════
 
-def extract_vital_signs(text: str) -> dict:
+# One alternation, one scan. Branch order matters only where two branches can
+# start at the same offset (PA before the "pressão 12 por 8" fallback).
+# The (?=[pfts]) guard lets sre skip straight to possible keyword starts; the
+# pattern runs case-sensitively over the folded text (lowercase, no accents).
+_VITALS_REGEX = (
+    r"(?=[pfts])(?:"
+    # PA: "PA 120x80", "PA 120/80", "PA:120x80"
+    r"(?P<pa>(?:pa|pressao\s*arterial)[:\s]+?(?P<pa_s>\d{2,3})\s*[x/]\s*(?P<pa_d>\d{2,3}))"
+    # PA fallback: "pressão 12 por 8"
+    r"|(?P<pa_alt>pressao\s+(?P<pa_alt_s>\d{2,3})\s*(?:por|x|/)\s*(?P<pa_alt_d>\d{2,3}))"
+    # FC: "FC 88", "frequência cardíaca 88", "pulso 88", "FC:88bpm"
+    r"|(?P<fc>(?:fc|frequencia\s*cardiaca|pulso)[:\s]+?(?P<fc_v>\d{2,3})\s*(?:bpm)?)"
+    # Temperatura: "temperatura 37.5", "temp 38", "T 37.8°C", "Tax 38.2"
+    r"|(?P<temperatura>(?:temperatura|temp|tax)[:\s]+?(?P<temperatura_v>\d{2}[.,]?\d?)\s*°?\s*c?)"
+    # SatO2: "sat 96", "spo2 98", "saturação 94%", "SpO2:92%"
+    r"|(?P<sato2>(?:sat(?:uracao)?|spo2|sato2)[:\s]+?(?P<sato2_v>\d{2,3})\s*%?)"
+    # FR: "FR 18", "frequência respiratória 20", "FR:24irpm"
+    r"|(?P<fr>(?:fr|frequencia\s*respiratoria)[:\s]+?(?P<fr_v>\d{1,2})\s*(?:irpm|rpm)?)"
+    r")"
+)
+VITALS_PATTERN = re.compile(_VITALS_REGEX)
+
+
+def _vital_reading(match: re.Match, text: str, offset: int = 0) -> dict:
+    # The branch groups enclose their value groups, so the branch closes last
+    branch = match.lastgroup
+    start, end = match.span()
+    reading = {"raw": text[start:end].strip(), "start": offset + start, "end": offset + end}
+
+    if branch == "pa" or branch == "pa_alt":
+        return {
+            "sinal": "pa",
+            "fallback": branch == "pa_alt",
+            "sistolica": int(match.group(f"{branch}_s")),
+            "diastolica": int(match.group(f"{branch}_d")),
+            **reading,
+        }
+
+    value = match.group(f"{branch}_v")
+    return {
+        "sinal": branch,
+        "valor": float(value.replace(",", ".")) if branch == "temperatura" else int(value),
+        **reading,
+    }
+
+
+# Plain-str callers get the text folded window by window, so a scan that stops
+# early (every vital found) never pays for folding the whole transcript.
+_VITALS_WINDOW = 512
+# More non-blank characters than any single attempt of VITALS_PATTERN can
+# consume (the longest branch, "frequencia respiratoria 24 irpm", needs 28)
+_VITALS_REACH = 64
+_BLANKS_RE = re.compile(r"[\s:]+")
+
+
+def iter_vital_sign_readings(text: str | TextAnalysis):
+    """Lazily yield vital-sign readings in text order (see extract_vital_sign_readings)."""
+    if isinstance(text, TextAnalysis):
+        for match in VITALS_PATTERN.finditer(text.folded):
+            yield _vital_reading(match, text.raw)
+        return
+
+    pos, size = 0, _VITALS_WINDOW
+    while pos < len(text):
+        end = min(pos + size, len(text))
+        raw = text[pos:end]
+        folded = fold(raw)
+        safe = len(folded)
+        if end < len(text):
+            # Attempts starting before `safe` cannot see past the window, so
+            # their outcome is the same as on the whole text
+            safe = max(0, len(folded) - 2 * _VITALS_REACH)
+            tail = folded[safe:]
+            if not safe or len(tail) - sum(map(len, _BLANKS_RE.findall(tail))) <= _VITALS_REACH:
+                size *= 2  # mostly blank tail: widen the window and retry
+                continue
+        resume = safe
+        for match in VITALS_PATTERN.finditer(folded):
+            if match.start() >= safe:
+                break
+            yield _vital_reading(match, raw, pos)
+            resume = max(safe, match.end())
+        pos += resume
+        size *= 2
+
+
+def extract_vital_sign_readings(text: str | TextAnalysis) -> list[dict]:
+    """
+    Every vital-sign reading in the text, in order, with character offsets.
+    ICU transcripts repeat vitals many times — this keeps all of them.
+    """
+    return list(iter_vital_sign_readings(text))
+
+
+def extract_vital_signs(text: str | TextAnalysis) -> dict:
     """
     Extract vital signs from text using regex patterns.
     Direct translation of extractVitalSigns() from soap-engine.js.
-    Same 5 regex patterns: PA, FC, Temp, SatO2, FR.
+    Same 5 regex patterns: PA, FC, Temp, SatO2, FR — first reading of each wins.
     """
+    return _summarize_vitals(iter_vital_sign_readings(text))
+
+
+def _summarize_vitals(readings) -> dict:
+    """First reading of each vital (stops consuming once all five are known)."""
     sinais: dict = {"pa": None, "fc": None, "temperatura": None, "sato2": None, "fr": None}
+    pa_fallback = None
+
+    missing = {"pa", "fc", "temperatura", "sato2", "fr"}
+
+    for reading in readings:
+        sinal = reading["sinal"]
+        if sinal == "pa":
+            entry = {"sistolica": reading["sistolica"], "diastolica": reading["diastolica"], "raw": reading["raw"]}
+            if not reading["fallback"]:
+                if sinais["pa"] is None:
+                    sinais["pa"] = entry
+            elif pa_fallback is None:
+                pa_fallback = entry
+        elif sinais[sinal] is None:
+            sinais[sinal] = {"valor": reading["valor"], "raw": reading["raw"]}
+
+        if sinais[sinal] is not None:
+            missing.discard(sinal)
+            if not missing:
+                break
+
+    # "PA 120x80" anywhere beats an earlier "pressão 12 por 8"
+    if sinais["pa"] is None:
+        sinais["pa"] = pa_fallback
 
-    # PA: "PA 120x80", "PA 120/80", "pressão 12 por 8", "PA:120x80"
-    pa_match = re.search(
-        r"(?:pa|pressão\s*arterial)[:\s]+?(\d{2,3})\s*[x/]\s*(\d{2,3})", text, re.IGNORECASE
-    ) or re.search(
-        r"pressão\s+(\d{2,3})\s*(?:por|x|/)\s*(\d{2,3})", text, re.IGNORECASE
-    )
-    if pa_match:
-        sinais["pa"] = {
-            "sistolica": int(pa_match.group(1)),
-            "diastolica": int(pa_match.group(2)),
-            "raw": pa_match.group(0).strip(),
-        }
+    return sinais
 
-    # FC: "FC 88", "frequência cardíaca 88", "pulso 88", "FC:88bpm"
-    fc_match = re.search(
-        r"(?:fc|frequência\s*cardíaca|pulso)[:\s]+?(\d{2,3})\s*(?:bpm)?", text, re.IGNORECASE
-    )
-    if fc_match:
-        sinais["fc"] = {"valor": int(fc_match.group(1)), "raw": fc_match.group(0).strip()}
 
-    # Temperatura: "temperatura 37.5", "temp 38", "T 37.8°C", "Tax 38.2"
-    temp_match = re.search(
-        r"(?:temperatura|temp|tax)[:\s]+?(\d{2}[.,]?\d?)\s*°?\s*c?", text, re.IGNORECASE
-    )
-    if temp_match:
-        valor = float(temp_match.group(1).replace(",", "."))
-        sinais["temperatura"] = {"valor": valor, "raw": temp_match.group(0).strip()}
+# ══════════════════════════════════════════════════════════════
+# LINE CLASSIFIER — compiled once, one pass per line
+# ══════════════════════════════════════════════════════════════
 
-    # SatO2: "sat 96", "spo2 98", "saturação 94%", "SpO2:92%"
-    sat_match = re.search(
-        r"(?:sat(?:ura[çc][aã]o)?|spo2|sato2)[:\s]+?(\d{2,3})\s*%?", text, re.IGNORECASE
+# All patterns run on the folded line (lowercase, no accents). Words that
+# only stood apart from others by their accent ("dói", "há") are anchored
+# with \b so the folded form does not match inside "dois" or "tenha".
+
+# Patterns that suggest doctor speech (same 8 from JS)
+DOCTOR_PATTERNS: tuple[re.Pattern, ...] = (
+    re.compile(r"^(doutor|dra?\.?|medico)"),
+    re.compile(r"vamos (examinar|verificar|avaliar|prescrever)"),
+    re.compile(r"minha (hipotese|avaliacao|conduta)"),
+    re.compile(r"(prescrevo|solicito|recomendo|indico|oriento)"),
+    re.compile(r"(exame fisico|ausculta|palpacao|inspecao)"),
+    re.compile(r"(pa |fc |fr |spo2|sat |temperatura|sinais vitais)"),
+    re.compile(r"(diagnostico|prognostico|conduta|plano)"),
+    re.compile(r"^(vou |preciso |solicitar|pedir)"),
+)
+
+# Patterns that suggest patient speech (same 8 from JS)
+PATIENT_PATTERNS: tuple[re.Pattern, ...] = (
+    re.compile(r"^(paciente|pac\.?)"),
+    re.compile(r"(estou sentindo|sinto|tenho sentido|comecei)"),
+    re.compile(r"(\bdoi\b|doendo|doer|incomodo)"),
+    re.compile(r"(faz .+ dias|\bha .+ dias|desde)"),
+    re.compile(r"(meu|minha) (dor|febre|tosse|mal[\s-]?estar)"),
+    re.compile(r"(tomo|uso|tomando|usando) .+(mg|ml|comprimido)"),
+    re.compile(r"(me sinto|sinto[\s-]?me|estou)"),
+    re.compile(r"(queixa|queixo|reclamo)"),
+)
+
+# SOAP routing of doctor lines (Objetivo / Plano)
+EXAM_PATTERN = re.compile(r"exame|ausculta|palpacao|inspecao|vital")
+PLAN_PATTERN = re.compile(r"prescrevo|solicito|recomendo|indico|oriento|conduta|plano")
+
+
+class LineTag(NamedTuple):
+    """Everything the pipeline needs to know about one transcript line."""
+    text: str
+    speaker: str
+    doc_score: int
+    pat_score: int
+    is_exam: bool
+    is_plan: bool
+    # Offsets of `text` in the transcript
+    start: int = 0
+    end: int = 0
+
+
+def classify_line(line: str, folded: str | None = None, start: int = 0) -> LineTag:
+    """Speaker score + exam/plan flags for one (already stripped) line."""
+    if folded is None:
+        folded = fold(line)
+    doc_score = sum(1 for p in DOCTOR_PATTERNS if p.search(folded))
+    pat_score = sum(1 for p in PATIENT_PATTERNS if p.search(folded))
+
+    if doc_score > pat_score:
+        speaker = "medico"
+    elif pat_score > doc_score:
+        speaker = "paciente"
+    else:
+        speaker = "paciente" if len(line) > 60 else "medico"
+
+    return _tag(line, speaker, doc_score, pat_score, folded, start)
+
+
+def _tag(
+    line: str, speaker: str, doc_score: int = 0, pat_score: int = 0, folded: str | None = None, start: int = 0,
+) -> LineTag:
+    # Exam/plan routing only applies to doctor lines
+    is_doctor = speaker == "medico"
+    if is_doctor and folded is None:
+        folded = fold(line)
+    return LineTag(
+        text=line,
+        speaker=speaker,
+        doc_score=doc_score,
+        pat_score=pat_score,
+        is_exam=is_doctor and EXAM_PATTERN.search(folded) is not None,
+        is_plan=is_doctor and PLAN_PATTERN.search(folded) is not None,
+        start=start,
+        end=start + len(line),
     )
-    if sat_match:
-        sinais["sato2"] = {"valor": int(sat_match.group(1)), "raw": sat_match.group(0).strip()}
 
-    # FR: "FR 18", "frequência respiratória 20", "FR:24irpm"
-    fr_match = re.search(
-        r"(?:fr|frequência\s*respiratória)[:\s]+?(\d{1,2})\s*(?:irpm|rpm)?", text, re.IGNORECASE
-    )
-    if fr_match:
-        sinais["fr"] = {"valor": int(fr_match.group(1)), "raw": fr_match.group(0).strip()}
 
-    return sinais
+def classify_lines(raw_text: str | TextAnalysis, base: int = 0) -> list[LineTag]:
+    """
+    Tag every sentence of the transcript (single pass, shared sentence spans).
+    Offsets are shifted by `base` when `raw_text` is a slice of a longer text.
+    """
+    analysis = TextAnalysis.of(raw_text)
+    raw, folded = analysis.raw, analysis.folded
+    return [
+        classify_line(raw[start:end], folded[start:end], base + start) for start, end in analysis.sentences
+    ]
 
 
-def diarize(raw_text: str) -> list[dict]:
+def diarize(raw_text: str | TextAnalysis) -> list[dict]:
     """
     Simulated Diarization: separates Doctor vs Patient speech.
     Direct translation of diarize() from soap-engine.js.
     Same 8 doctor + 8 patient regex patterns.
     """
-    lines = [line.strip() for line in re.split(r"[.\n]+", raw_text) if len(line.strip()) > 5]
-    dialog = []
-
-    # Patterns that suggest doctor speech (same 8 from JS)
-    doctor_patterns = [
-        re.compile(r"^(doutor|dra?\.?|médico)", re.IGNORECASE),
-        re.compile(r"vamos (examinar|verificar|avaliar|prescrever)", re.IGNORECASE),
-        re.compile(r"minha (hipótese|avaliação|conduta)", re.IGNORECASE),
-        re.compile(r"(prescrevo|solicito|recomendo|indico|oriento)", re.IGNORECASE),
-        re.compile(r"(exame físico|ausculta|palpação|inspeção)", re.IGNORECASE),
-        re.compile(r"(pa |fc |fr |spo2|sat |temperatura|sinais vitais)", re.IGNORECASE),
-        re.compile(r"(diagnóstico|prognóstico|conduta|plano)", re.IGNORECASE),
-        re.compile(r"^(vou |preciso |solicitar|pedir)", re.IGNORECASE),
-    ]
-
-    # Patterns that suggest patient speech (same 8 from JS)
-    patient_patterns = [
-        re.compile(r"^(paciente|pac\.?)", re.IGNORECASE),
-        re.compile(r"(estou sentindo|sinto|tenho sentido|comecei)", re.IGNORECASE),
-        re.compile(r"(dói|doendo|doer|incômodo)", re.IGNORECASE),
-        re.compile(r"(faz .+ dias|há .+ dias|desde)", re.IGNORECASE),
-        re.compile(r"(meu|minha) (dor|febre|tosse|mal[\s-]?estar)", re.IGNORECASE),
-        re.compile(r"(tomo|uso|tomando|usando) .+(mg|ml|comprimido)", re.IGNORECASE),
-        re.compile(r"(me sinto|sinto[\s-]?me|estou)", re.IGNORECASE),
-        re.compile(r"(queixa|queixo|reclamo)", re.IGNORECASE),
-    ]
+    return [{"speaker": t.speaker, "text": t.text} for t in classify_lines(raw_text)]
 
-    for line in lines:
-        doc_score = sum(1 for p in doctor_patterns if p.search(line))
-        pat_score = sum(1 for p in patient_patterns if p.search(line))
 
-        if doc_score > pat_score:
-            speaker = "medico"
-        elif pat_score > doc_score:
-            speaker = "paciente"
-        else:
-            speaker = "paciente" if len(line) > 60 else "medico"
+def diarize_spans(raw_text: str | TextAnalysis) -> DialogSpans:
+    """diarize() as offsets into `raw_text`, without copying the sentences."""
+    return DialogSpans.from_tags(classify_lines(raw_text))
 
-        dialog.append({"speaker": speaker, "text": line})
 
-    return dialog
+_ALLERGY_RE = re.compile(r"(?:alergia|alergic[oa]|alergias|intolerancia)\s+(?:a\s+|ao?\s+)?([^,.\n]+)")
 
 
-def extract_clinical_data(text: str) -> dict:
+def extract_clinical_data(text: str | TextAnalysis) -> dict:
     """
     Extract clinical data from text.
     Direct translation of extractClinicalData() from soap-engine.js.
     """
-    lower = text.lower()
+    analysis = TextAnalysis.of(text)
+    folded_hits = CLINICAL_MATCHER.first_positions(analysis.folded)
+    indexed_cid = CID_INDEX.resolve(analysis.folded) if CID_INDEX is not None else None
+    return _clinical_data(folded_hits, indexed_cid, extract_vital_signs(analysis), analysis.raw, analysis.folded)
 
-    # Extract CID
-    cid_principal = None
-    for keyword, cid_info in CID_DATABASE.items():
-        if keyword in lower:
-            cid_principal = cid_info
-            break
 
-    # Extract vital signs
-    sinais_vitais = extract_vital_signs(text)
+def _clinical_data(folded_hits: dict[str, int], indexed_cid: dict | None, sinais_vitais: dict, raw, folded) -> dict:
+    """
+    Clinical data from dictionary hits (folded keyword → first offset).
+    `raw` / `folded` only need len() and slicing: a str or a SoapSession buffer.
+    """
+    # Keyed by the original (accented) dictionary keyword
+    hits = {k: folded_hits[f] for k, f in _FOLDED_KEYWORDS.items() if f in folded_hits}
+
+    # Extract CID (first dictionary entry present, dictionary order)
+    cid_principal = indexed_cid
+    if CID_INDEX is None:
+        for keyword, cid_info in CID_DATABASE.items():
+            if keyword in hits:
+                cid_principal = cid_info
+                break
 
     # Extract medications
-    medicacoes = []
-    for med in MED_PATTERNS:
-        if med in lower:
-            medicacoes.append(med[0].upper() + med[1:])
+    medicacoes = [med[0].upper() + med[1:] for med in MED_PATTERNS if med in hits]
 
     # Extract allergies (CAIXA ALTA per requirement)
     alergias = []
     for keyword in ALLERGY_KEYWORDS:
-        idx = lower.find(keyword)
+        idx = hits.get(keyword, -1)
         if idx != -1:
-            surrounding = text[max(0, idx - 5):min(len(text), idx + 60)]
-            match = re.search(
-                r"(?:alergia|alérgic[oa]|alergias|intolerância)\s+(?:a\s+|ao?\s+)?([^,.\n]+)",
-                surrounding,
-                re.IGNORECASE,
-            )
+            # Match on the folded window, report the original text
+            window_start = max(0, idx - 5)
+            window = folded[window_start:min(len(folded), idx + 60)]
+            match = _ALLERGY_RE.search(window)
             if match:
-                alergias.append(match.group(1).strip().upper())
+                start, end = match.span(1)
+                alergias.append(raw[window_start + start:window_start + end].strip().upper())
 
     if not alergias:
         alergias.append("NADA (NEGA ALERGIAS CONHECIDAS - NKDA)")
 
     # Extract comorbidities
-    comorbidades = []
-    comorb_patterns = [
-        "hipertensão", "diabetes", "asma", "dpoc", "icc", "insuficiência renal",
-        "insuficiência cardíaca", "hiv", "hepatite", "obesidade", "dislipidemia",
-        "hipotireoidismo", "hipertireoidismo", "epilepsia", "arritmia",
-    ]
-    for comorb in comorb_patterns:
-        if comorb in lower:
-            comorbidades.append(comorb[0].upper() + comorb[1:])
+    comorbidades = [c[0].upper() + c[1:] for c in COMORBIDITY_PATTERNS if c in hits]
 
-    # Estimate severity (same keywords as JS)
+    # Estimate severity
     gravidade = "Leve"
-    severe_keywords = [
-        "iam", "infarto", "avc", "derrame", "sepse", "pcr", "choque",
-        "rebaixamento", "coma", "hemorragia", "politrauma", "sdra", "civd",
-        "choque séptico", "choque cardiogênico", "tamponamento", "tep",
-        "parada cardiorrespiratória", "status epilepticus", "cetoacidose",
-    ]
-    moderate_keywords = [
-        "febre alta", "dispneia", "falta de ar", "taquicardia",
-        "hipotensão", "desidratação", "pneumonia", "fratura",
-        "crise hipertensiva", "angina instável", "insuficiência respiratória",
-        "rabdomiólise", "edema cerebral",
-    ]
-
-    if any(k in lower for k in severe_keywords):
+    if any(k in hits for k in SEVERE_KEYWORDS):
         gravidade = "Grave"
-    elif any(k in lower for k in moderate_keywords):
+    elif any(k in hits for k in MODERATE_KEYWORDS):
         gravidade = "Moderada"
 
     return {
@@ -317,13 +396,16 @@ def extract_clinical_data(text: str) -> dict:
     }
 
 
-def build_soap(dialog: list[dict], clinical_data: dict) -> dict:
+def build_soap(dialog: list[dict] | None, clinical_data: dict, tags: list[LineTag] | None = None) -> dict:
     """
     Build SOAP structure from diarized dialog.
     Direct translation of buildSOAP() from soap-engine.js.
+    `tags` (from classify_lines) skips re-scanning the doctor lines.
     """
-    patient_lines = [d["text"] for d in dialog if d["speaker"] == "paciente"]
-    doctor_lines = [d["text"] for d in dialog if d["speaker"] == "medico"]
+    if tags is None:
+        tags = [_tag(d["text"], d["speaker"]) for d in dialog]
+
+    patient_lines = [t.text for t in tags if t.speaker == "paciente"]
     sv = clinical_data["sinais_vitais"]
 
     # Build Objetivo content
@@ -340,7 +422,7 @@ def build_soap(dialog: list[dict], clinical_data: dict) -> dict:
         vitals_parts.append(f"Temp {sv['temperatura']['valor']}°C")
 
     vitals_str = f"Sinais vitais: {', '.join(vitals_parts)}. " if vitals_parts else ""
-    exam_lines = [l for l in doctor_lines if re.search(r"exame|ausculta|palpação|inspeção|vital", l, re.IGNORECASE)]
+    exam_lines = [t.text for t in tags if t.is_exam]
     exam_str = ". ".join(exam_lines) if exam_lines else "Exame físico registrado durante consulta."
 
     cid = clinical_data["cid_principal"]
@@ -371,10 +453,8 @@ def build_soap(dialog: list[dict], clinical_data: dict) -> dict:
         "plano": {
             "title": "Plano (P)",
             "icon": "📋",
-            "content": ". ".join(
-                l for l in doctor_lines
-                if re.search(r"prescrevo|solicito|recomendo|indico|oriento|conduta|plano", l, re.IGNORECASE)
-            ) or "Conduta a ser definida pelo médico assistente.",
+            "content": ". ".join(t.text for t in tags if t.is_plan)
+            or "Conduta a ser definida pelo médico assistente.",
             "prescricoes": clinical_data["medicacoes_atuais"],
             "exames_solicitados": [],
             "orientacoes": "Retorno conforme agendamento.",
@@ -387,17 +467,36 @@ def process(raw_text: str) -> dict:
     """
     Main processing function.
     Direct translation of process() from soap-engine.js.
-    Returns complete SOAP + clinical data + jsonUniversal.
+    Returns complete SOAP + clinical data + jsonUniversal. "dialog" is encoded
+    spans (a dict, no longer the [{"speaker", "text"}] list diarize() returns)
+    into dialog_spans.normalize(raw_text); dialog_spans.materialize(result["dialog"],
+    raw_text) gives the list back.
     """
-    if not raw_text or len(raw_text.strip()) < 10:
+    raw_text = normalize(raw_text or "")
+    if len(raw_text) < 10:
         return {
             "success": False,
             "error": "Texto insuficiente para processamento. Mínimo de 10 caracteres.",
         }
 
-    dialog = diarize(raw_text)
-    clinical_data = extract_clinical_data(raw_text)
-    soap = build_soap(dialog, clinical_data)
+    analysis = TextAnalysis(raw_text)
+    return _assemble(classify_lines(analysis), extract_clinical_data(analysis))
+
+
+def warm_up() -> None:
+    """
+    Process-pool initializer (services/bulk.py, services/analysis_executor.py).
+    Importing this module compiles the dictionaries, automaton and patterns
+    (and maps the CID index); one throwaway run warms the remaining lazy paths
+    before real work arrives.
+    """
+    process("Paciente refere dor de cabeça. PA 120x80, FC 80. Prescrevo dipirona.")
+
+
+def _assemble(tags: list[LineTag], clinical_data: dict) -> dict:
+    # Spans into the processed text; dialog_spans.materialize() turns them into text
+    dialog = DialogSpans.from_tags(tags)
+    soap = build_soap(None, clinical_data, tags)
 
     json_universal = {
         "HDA_Tecnica": soap["subjetivo"]["hda"],
@@ -408,14 +507,173 @@ def process(raw_text: str) -> dict:
 
     return {
         "success": True,
-        "dialog": dialog,
+        "dialog": dialog.encode(),
         "soap": soap,
         "clinicalData": clinical_data,
         "jsonUniversal": json_universal,
         "metadata": {
             "total_falas": len(dialog),
-            "falas_medico": sum(1 for d in dialog if d["speaker"] == "medico"),
-            "falas_paciente": sum(1 for d in dialog if d["speaker"] == "paciente"),
+            "falas_medico": dialog.count("medico"),
+            "falas_paciente": dialog.count("paciente"),
             "processado_em": datetime.now().isoformat(),
         },
     }
+
+
+# ══════════════════════════════════════════════════════════════
+# STREAMING — incremental SOAP for live consultations
+# ══════════════════════════════════════════════════════════════
+
+class _TextBuffer:
+    """Append-only text kept as chunks; supports len() and [start:end] slicing."""
+
+    def __init__(self):
+        self._chunks: list[str] = []
+        self._starts: list[int] = []
+        self._length = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, chunk: str):
+        if chunk:
+            self._starts.append(self._length)
+            self._chunks.append(chunk)
+            self._length += len(chunk)
+
+    def __getitem__(self, key: slice) -> str:
+        start, end, _ = key.indices(self._length)
+        if start >= end:
+            return ""
+        i = bisect.bisect_right(self._starts, start) - 1
+        parts = []
+        while i < len(self._chunks) and self._starts[i] < end:
+            chunk_start = self._starts[i]
+            parts.append(self._chunks[i][max(0, start - chunk_start):end - chunk_start])
+            i += 1
+        return "".join(parts)
+
+    def __str__(self) -> str:
+        return "".join(self._chunks)
+
+
+class SoapSession:
+    """
+    Stateful SOAP engine for a consultation in progress.
+    feed() costs O(len(chunk) + unfinished sentence), never O(total transcript);
+    snapshot() returns the same structure as process() on the text so far.
+    """
+
+    # A vital reading ending this close to the end of the text may still grow
+    # ("temp 37" → "temp 37.5"); settle it only once enough text follows.
+    _VITALS_MARGIN = 64
+
+    def __init__(self):
+        self._raw = _TextBuffer()
+        self._folded = _TextBuffer()
+
+        # Dialog: completed sentences are classified once; the tail stays open
+        self._tags: list[LineTag] = []
+        self._line_from = 0
+
+        # Dictionaries: automaton state carries across chunk boundaries
+        self._matcher_state = 0
+        self._hits: dict[str, int] = {}
+        self._cid_state = 0
+        self._cid_best: int | None = None
+
+        # Vitals: settled readings + scan cursor
+        self._readings: list[dict] = []
+        self._vitals_from = 0
+
+        # Span of non-whitespace content (process() rejects < 10 stripped chars)
+        self._content_start = -1
+        self._content_end = -1
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    @property
+    def text(self) -> str:
+        return str(self._raw)
+
+    @property
+    def vital_sign_readings(self) -> list[dict]:
+        """Every vital-sign reading so far, with offsets."""
+        return self._readings + self._pending_readings()
+
+    @property
+    def cid_candidates(self) -> list[dict]:
+        """CID entries whose keywords appeared so far, in priority order."""
+        if CID_INDEX is not None:
+            return [CID_INDEX.keyword_info(self._cid_best)] if self._cid_best is not None else []
+        candidates = {}
+        for keyword, info in CID_DATABASE.items():
+            if _FOLDED_KEYWORDS[keyword] in self._hits:
+                candidates.setdefault(info["code"], info)
+        return list(candidates.values())
+
+    def feed(self, chunk: str) -> "SoapSession":
+        if not chunk:
+            return self
+        offset = len(self._raw)
+        folded_chunk = fold(chunk)
+        self._raw.append(chunk)
+        self._folded.append(folded_chunk)
+
+        stripped = chunk.strip()
+        if stripped:
+            if self._content_start == -1:
+                self._content_start = offset + len(chunk) - len(chunk.lstrip())
+            self._content_end = offset + len(chunk.rstrip())
+
+        # ── Keywords ──
+        self._matcher_state, matches = CLINICAL_MATCHER.feed(folded_chunk, self._matcher_state, offset)
+        for start, _end, keyword in matches:
+            self._hits.setdefault(keyword, start)
+        if CID_INDEX is not None:
+            self._cid_state, cid_matches = CID_INDEX.advance(folded_chunk, self._cid_state, offset)
+            for _, _, kw in cid_matches:
+                if self._cid_best is None or kw < self._cid_best:
+                    self._cid_best = kw
+
+        # ── Completed sentences ──
+        region = self._raw[self._line_from:]
+        last_sep = max(region.rfind("."), region.rfind("\n"))
+        if last_sep != -1:
+            self._tags.extend(classify_lines(region[:last_sep + 1], self._line_from))
+            self._line_from += last_sep + 1
+
+        # ── Vitals ──
+        settled_until = len(self._raw) - self._VITALS_MARGIN
+        if settled_until > self._vitals_from:
+            base = self._vitals_from
+            folded_region = self._folded[base:]
+            raw_region = self._raw[base:]
+            for match in VITALS_PATTERN.finditer(folded_region):
+                if base + match.end() > settled_until:
+                    break
+                self._readings.append(_vital_reading(match, raw_region, base))
+                self._vitals_from = base + match.end()
+            else:
+                # Nothing pending: no reading can start this far back any more
+                self._vitals_from = max(self._vitals_from, settled_until)
+
+        return self
+
+    def _pending_readings(self) -> list[dict]:
+        base = self._vitals_from
+        raw_region = self._raw[base:]
+        return [_vital_reading(m, raw_region, base) for m in VITALS_PATTERN.finditer(self._folded[base:])]
+
+    def snapshot(self) -> dict:
+        """Current SOAP result (same contract as process(), spans into self.text)."""
+        if self._content_end - self._content_start < 10:
+            # Same "texto insuficiente" answer as process()
+            return process(self.text)
+
+        tags = self._tags + classify_lines(self._raw[self._line_from:], self._line_from)
+        indexed_cid = CID_INDEX.keyword_info(self._cid_best) if self._cid_best is not None else None
+        sinais_vitais = _summarize_vitals(self._readings + self._pending_readings())
+        clinical_data = _clinical_data(self._hits, indexed_cid, sinais_vitais, self._raw, self._folded)
+        return _assemble(tags, clinical_data)
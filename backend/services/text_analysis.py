@@ -0,0 +1,125 @@
+"""
+services/text_analysis.py — Shared Transcript Analysis
+Medical Scribe Enterprise v3.0
+Built once per request; every SOAP extractor reads from it instead of
+re-lowercasing, re-splitting and re-scanning the raw transcript.
+"""
+
+import re
+import unicodedata
+from functools import cached_property
+
+
+# ══════════════════════════════════════════════════════════════
+# ACCENT FOLDING (offset-preserving)
+# ══════════════════════════════════════════════════════════════
+
+class _FoldTable(dict):
+    """str.translate table filled on demand: one entry per distinct character."""
+
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        lowered = char.lower()
+        if len(lowered) != 1:
+            lowered = char
+        stripped = "".join(c for c in unicodedata.normalize("NFKD", lowered) if not unicodedata.combining(c))
+        # Keep 1 char → 1 char so offsets stay valid across raw / lower / folded
+        folded = stripped if len(stripped) == 1 else lowered
+        self[codepoint] = folded
+        return folded
+
+
+class _LowerTable(dict):
+    def __missing__(self, codepoint: int) -> str:
+        char = chr(codepoint)
+        lowered = char.lower()
+        result = lowered if len(lowered) == 1 else char
+        self[codepoint] = result
+        return result
+
+
+_FOLD_TABLE = _FoldTable()
+_LOWER_TABLE = _LowerTable()
+_NON_ASCII_RE = re.compile(r"[^\x00-\x7f]")
+
+
+def _fold_lowered(lowered: str) -> str:
+    # Transcripts use a handful of distinct accented chars: one C-level
+    # str.replace per distinct char beats a per-char translate() callback.
+    for char in set(_NON_ASCII_RE.findall(lowered)):
+        folded = _FOLD_TABLE[ord(char)]
+        if folded != char:
+            lowered = lowered.replace(char, folded)
+    return lowered
+
+
+def fold(text: str) -> str:
+    """Lowercase + strip accents, same length as the input: "Pressão" → "pressao"."""
+    if text.isascii():
+        return text.lower()
+    return _fold_lowered(_lower(text))
+
+
+def _lower(text: str) -> str:
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # Rare characters ("İ") expand under lower(); keep them as-is instead
+    return text.translate(_LOWER_TABLE)
+
+
+# ══════════════════════════════════════════════════════════════
+# ANALYSIS
+# ══════════════════════════════════════════════════════════════
+
+_SENTENCE_RE = re.compile(r"[^.\n]+")
+_TOKEN_RE = re.compile(r"\w+")
+
+
+class TextAnalysis:
+    """
+    One transcript, normalized once. `raw`, `lower` and `folded` have the same
+    length, so any offset found in one is valid in the others.
+    """
+
+    def __init__(self, raw: str):
+        self.raw = raw
+
+    @classmethod
+    def of(cls, text: "str | TextAnalysis") -> "TextAnalysis":
+        return text if isinstance(text, TextAnalysis) else cls(text)
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    @cached_property
+    def lower(self) -> str:
+        return _lower(self.raw)
+
+    @cached_property
+    def folded(self) -> str:
+        """Lowercase, accent-free copy: the text all dictionaries and patterns match against."""
+        if self.raw.isascii():
+            return self.lower
+        return _fold_lowered(self.lower)
+
+    @cached_property
+    def sentences(self) -> list[tuple[int, int]]:
+        """
+        (start, end) of every stripped line/sentence longer than 5 chars —
+        same split as the diarizer: on '.' and newlines.
+        """
+        spans = []
+        raw = self.raw
+        for match in _SENTENCE_RE.finditer(raw):
+            segment = match.group(0)
+            stripped = segment.strip()
+            if len(stripped) > 5:
+                start = match.start() + (len(segment) - len(segment.lstrip()))
+                spans.append((start, start + len(stripped)))
+        return spans
+
+    @cached_property
+    def tokens(self) -> list[tuple[int, int]]:
+        """(start, end) of every word token."""
+        return [m.span() for m in _TOKEN_RE.finditer(self.folded)]